@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from code.compiler import compile, Options
+
+COUNT = 100000000
+
+# The operand is either a constant, which the code generators reduce to
+# shifts, LEA or a magic multiply, or the same value read at run time,
+# which keeps IMUL and IDIV.
+LOOP = '''local d = read()
+local i = 0
+local x = 0
+while i < {count} do
+    x = x + {expression}
+    i = i + 1
+end
+print(x)
+'''
+
+OPERATIONS = [
+    ('/', 7),
+    ('/', 8),
+    ('/', -3),
+    ('/', 1000),
+    ('*', 10),
+    ('*', 9),
+    ('*', 7),
+]
+
+def runtime(assembly, directory, operand, repeat=3):
+    source = os.path.join(directory, 'program.asm')
+    executable = os.path.join(directory, 'program')
+    with open(source, 'w') as file:
+        file.write(assembly)
+    subprocess.run(['nasm', '-f', 'elf', '-o', executable + '.o', source], check=True)
+    subprocess.run(['gcc', '-m32', '-no-pie', '-o', executable, executable + '.o'], check=True)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([executable], check=True, input=f'{operand}\n'.encode(), stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# Nanoseconds per operation, over the same loop adding i alone.
+def per_operation(expression, operand, options, directory, empty):
+    assembly = compile(LOOP.format(count=COUNT, expression=expression), options)
+    return (runtime(assembly, directory, operand) - empty) / COUNT * 1e9
+
+if __name__ == '__main__':
+    if not (shutil.which('nasm') and shutil.which('gcc')):
+        print('nasm or gcc not found', file=sys.stderr)
+        sys.exit(1)
+    with tempfile.TemporaryDirectory() as directory:
+        for flags, options in (('-O', Options(optimize=True)), ('--ir -O', Options(optimize=True, ir=True))):
+            empty = runtime(compile(LOOP.format(count=COUNT, expression='i'), options), directory, 1)
+            print(flags)
+            for operator, operand in OPERATIONS:
+                variable = per_operation(f'i {operator} d', operand, options, directory, empty)
+                constant = per_operation(f'i {operator} {operand}', operand, options, directory, empty)
+                print(f'    i {operator} {operand:<5}  variable {variable:5.2f} ns  constant {constant:5.2f} ns')
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# A few hundred small programs, each with a function, a loop and some
+# arithmetic, roughly the shape of a course's test directory.
+SECTION = '''function step_{0}(x)
+    return x * {1} + {0}
+end
+local i_{0} = 0
+local total_{0} = 0
+while i_{0} < {2} do
+    total_{0} = total_{0} + step_{0}(i_{0})
+    if total_{0} > 1000 then
+        total_{0} = total_{0} - 1000
+    end
+    i_{0} = i_{0} + 1
+end
+print(total_{0})
+'''
+SECTIONS = 20
+
+def generate(directory, files):
+    for i in range(files):
+        with open(os.path.join(directory, f'program{i}.lua'), 'w') as file:
+            file.write(''.join(SECTION.format(j, (i + j) % 7 + 2, (i + j) % 50 + 10) for j in range(SECTIONS)))
+
+def run(directory, jobs):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'main.py', '--no-cache', '-O', '-j', str(jobs), directory], check=True)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, files)
+        serial = run(directory, 1)
+        print(f'{files} files  -j 1  {serial:.2f} s')
+        jobs = 2
+        while jobs <= os.cpu_count():
+            elapsed = run(directory, jobs)
+            print(f'{files} files  -j {jobs}  {elapsed:.2f} s  speedup {serial / elapsed:.2f}x')
+            jobs *= 2
@@ -0,0 +1,59 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from code.compiler import compile, Options
+
+COUNT = 1000000
+
+# A million integers out, with signs and widths that vary.
+PRINT = f'''local i = 0
+while i < {COUNT} do
+    print(i * 4099 - 2000000000)
+    i = i + 1
+end
+'''
+
+# A count and then that many integers in, summed.
+READ = '''local n = read()
+local total = 0
+while n > 0 do
+    total = total + read()
+    n = n - 1
+end
+print(total)
+'''
+
+def numbers():
+    return f'{COUNT}\n' + ''.join(f'{(i * 7919) % 200001 - 100000}\n' for i in range(COUNT))
+
+def runtime(assembly, directory, stdin, repeat=3):
+    source = os.path.join(directory, 'program.asm')
+    executable = os.path.join(directory, 'program')
+    with open(source, 'w') as file:
+        file.write(assembly)
+    subprocess.run(['nasm', '-f', 'elf', '-o', executable + '.o', source], check=True)
+    subprocess.run(['gcc', '-m32', '-no-pie', '-o', executable, executable + '.o'], check=True)
+    best = float('inf')
+    for _ in range(repeat):
+        with open(stdin, 'rb') as file:
+            start = time.perf_counter()
+            subprocess.run([executable], check=True, stdin=file, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == '__main__':
+    if not (shutil.which('nasm') and shutil.which('gcc')):
+        print('nasm or gcc not found', file=sys.stderr)
+        sys.exit(1)
+    with tempfile.TemporaryDirectory() as directory:
+        stdin = os.path.join(directory, 'numbers.txt')
+        with open(stdin, 'w') as file:
+            file.write(numbers())
+        for name, source in (('print', PRINT), ('read', READ)):
+            for flags, options in (('', Options()), ('-O', Options(optimize=True)), ('--ir -O', Options(optimize=True, ir=True))):
+                elapsed = runtime(compile(source, options), directory, stdin)
+                print(f'{name:6} {flags:8}  {COUNT} integers  {elapsed:.3f} s')
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.batch import generate
+
+SOCKET = os.path.join(tempfile.gettempdir(), f'lua-compiler-bench-{os.getpid()}.sock')
+
+def compile_each(command, filenames):
+    start = time.perf_counter()
+    for filename in filenames:
+        subprocess.run(command + ['--no-cache', filename], check=True)
+    return (time.perf_counter() - start) / len(filenames)
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, files)
+        filenames = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+
+        direct = compile_each([sys.executable, 'main.py'], filenames)
+        print(f'{files} files  main.py         {direct * 1000:7.1f} ms per file')
+
+        daemon = subprocess.Popen([sys.executable, 'main.py', '--serve', '--socket', SOCKET], stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(SOCKET):
+                time.sleep(0.01)
+            client = [sys.executable, '-S', 'client.py', '--socket', SOCKET]
+            served = compile_each(client, filenames)
+            print(f'{files} files  client.py -S    {served * 1000:7.1f} ms per file  speedup {direct / served:.2f}x')
+            metrics = subprocess.run(client + ['--metrics'], check=True, capture_output=True, text=True).stdout
+            print('daemon metrics', json.dumps(json.loads(metrics)))
+        finally:
+            daemon.terminate()
+            daemon.wait()
@@ -0,0 +1,60 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from code.compiler import compile, Options
+from code.encoder import Assembler
+from benchmarks.batch import generate
+
+# Assembles every program with the built-in encoder and with nasm, and
+# when gcc is there links both objects and checks the programs print the
+# same thing.
+def builtin(assemblies, directory):
+    start = time.perf_counter()
+    for number, assembly in enumerate(assemblies):
+        with open(os.path.join(directory, f'builtin{number}.o'), 'wb') as file:
+            file.write(Assembler().run(assembly))
+    return time.perf_counter() - start
+
+def nasm(assemblies, directory):
+    for number, assembly in enumerate(assemblies):
+        with open(os.path.join(directory, f'program{number}.asm'), 'w') as file:
+            file.write(assembly)
+    start = time.perf_counter()
+    for number in range(len(assemblies)):
+        subprocess.run(['nasm', '-f', 'elf', '-o', os.path.join(directory, f'nasm{number}.o'), os.path.join(directory, f'program{number}.asm')], check=True)
+    return time.perf_counter() - start
+
+def output(obj, directory):
+    executable = os.path.join(directory, 'program')
+    subprocess.run(['gcc', '-m32', '-no-pie', '-o', executable, obj], check=True)
+    return subprocess.run([executable], check=True, stdin=subprocess.DEVNULL, capture_output=True).stdout
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, files)
+        assemblies = []
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), 'r') as file:
+                source = file.read()
+            for options in (Options(), Options(optimize=True), Options(optimize=True, ir=True)):
+                assemblies.append(compile(source, options, io.StringIO()))
+        lines = sum(assembly.count('\n') for assembly in assemblies)
+        elapsed = builtin(assemblies, directory)
+        print(f'{len(assemblies)} programs  {lines} lines  builtin  {elapsed:.2f} s')
+        if not shutil.which('nasm'):
+            print('nasm not found: skipping the comparison', file=sys.stderr)
+            sys.exit(0)
+        elapsed = nasm(assemblies, directory)
+        print(f'{len(assemblies)} programs  {lines} lines  nasm     {elapsed:.2f} s')
+        if not shutil.which('gcc'):
+            print('gcc not found: skipping the output check', file=sys.stderr)
+            sys.exit(0)
+        mismatches = [number for number in range(len(assemblies)) if output(os.path.join(directory, f'builtin{number}.o'), directory) != output(os.path.join(directory, f'nasm{number}.o'), directory)]
+        print(f'{len(assemblies) - len(mismatches)} of {len(assemblies)} programs print the same with both objects')
+        sys.exit(1 if mismatches else 0)
@@ -0,0 +1,160 @@
+import random
+import sys
+
+RELATIONS = ('<', '>', '==')
+DIVISORS = (2, 3, 5, 7, 10)
+# Deepest nesting of if statements, which would otherwise nest as deep as
+# chance takes them.
+BRANCHES = 2
+
+# Writes random programs in the subset the compiler accepts. The same seed
+# and parameters always give the same program:
+#   statements  top-level statements after the function declarations
+#   depth       deepest nesting of operators in an expression
+#   loops       deepest nesting of while loops
+#   functions   functions declared before the main program
+#   calls       chance that an operand is a function call
+# Every program ends: loops count up to a small bound, and only the second
+# half of the functions make calls, to functions in the first half, so a
+# call never leads to more than one more level of calls.
+class Generator:
+
+    def __init__(self, seed, statements=200, depth=4, loops=2, functions=5, calls=0.1):
+        self.random = random.Random(seed)
+        self.statements = statements
+        self.depth = depth
+        self.loops = loops
+        self.functions = functions
+        self.calls = calls
+        self.arities = []
+        self.lines = []
+        self.names = 0
+
+    def program(self):
+        leaves = (self.functions + 1) // 2
+        for index in range(self.functions):
+            self._function(index, range(leaves) if index >= leaves else ())
+        self.lines.append('local total = 0')
+        self._scope(['total'], range(self.functions), self.loops)
+        for _ in range(self.statements):
+            self._statement(0)
+        self.lines.append('print(total)')
+        return '\n'.join(self.lines) + '\n'
+
+    def _function(self, index, callees):
+        arity = self.random.randint(0, 3)
+        parameters = [f'p{k}' for k in range(arity)]
+        self.lines.append(f'function f{index}({", ".join(parameters)})')
+        self._scope(parameters, callees, min(self.loops, 1))
+        for _ in range(self.random.randint(1, 6)):
+            self._statement(1)
+        self.lines.append(f'    return {self._expression(self.depth)}')
+        self.lines.append('end')
+        self.arities.append(arity)
+
+    def _scope(self, variables, callees, loops):
+        self.variables = variables
+        self.counters = []
+        self.callees = callees
+        self.remaining = loops
+        self.branches = 0
+
+    def _name(self, prefix):
+        self.names += 1
+        return f'{prefix}{self.names}'
+
+    def _statement(self, indent):
+        pad = '    ' * indent
+        choice = self.random.random()
+        if choice < 0.25 or not self.variables:
+            name = self._name('v')
+            self.lines.append(f'{pad}local {name} = {self._expression(self.depth)}')
+            self.variables = self.variables + [name]
+        elif choice < 0.5:
+            name = self.random.choice(self.variables)
+            self.lines.append(f'{pad}{name} = {self._expression(self.depth)}')
+        elif choice < 0.65 and self.remaining > 0:
+            self._loop(indent)
+        elif choice < 0.8 and self.branches < BRANCHES:
+            self._if(indent)
+        elif choice < 0.9:
+            self.lines.append(f'{pad}print({self._expression(self.depth)})')
+        else:
+            name = self.random.choice(self.variables)
+            self.lines.append(f'{pad}{name} = {name} + 1')
+
+    # Statements in a nested block see the variables declared before it,
+    # but their own locals go out of scope at its end.
+    def _block(self, indent, count):
+        variables = self.variables
+        for _ in range(count):
+            self._statement(indent)
+        self.variables = variables
+
+    def _loop(self, indent):
+        pad = '    ' * indent
+        counter = self._name('i')
+        self.lines.append(f'{pad}local {counter} = 0')
+        self.lines.append(f'{pad}while {counter} < {self.random.randint(1, 8)} do')
+        # The body reads the counter but never assigns it.
+        self.remaining -= 1
+        self.counters.append(counter)
+        self._block(indent + 1, self.random.randint(1, 4))
+        self.counters.pop()
+        self.remaining += 1
+        self.lines.append(f'{pad}    {counter} = {counter} + 1')
+        self.lines.append(f'{pad}end')
+
+    def _if(self, indent):
+        pad = '    ' * indent
+        self.lines.append(f'{pad}if {self._condition()} then')
+        self.branches += 1
+        self._block(indent + 1, self.random.randint(1, 3))
+        if self.random.random() < 0.5:
+            self.lines.append(f'{pad}else')
+            self._block(indent + 1, self.random.randint(1, 3))
+        self.branches -= 1
+        self.lines.append(f'{pad}end')
+
+    def _condition(self):
+        condition = f'{self._expression(2)} {self.random.choice(RELATIONS)} {self._expression(2)}'
+        choice = self.random.random()
+        if choice < 0.15:
+            return f'not ({condition})'
+        if choice < 0.35:
+            operator = self.random.choice(('and', 'or'))
+            return f'{condition} {operator} {self._expression(1)} {self.random.choice(RELATIONS)} {self._expression(1)}'
+        return condition
+
+    # One operand stays as deep as depth allows while the other is usually
+    # a leaf, so the size of an expression grows slowly with its depth.
+    def _expression(self, depth):
+        if depth <= 0 or self.random.random() < 0.2:
+            return self._operand(depth)
+        choice = self.random.random()
+        if choice < 0.1:
+            return f'-({self._expression(depth - 1)})'
+        if choice < 0.25:
+            return f'({self._expression(depth - 1)}) / {self.random.choice(DIVISORS)}'
+        other = self._expression(depth - 1) if self.random.random() < 0.3 else self._operand(0)
+        operator = self.random.choice(('+', '-', '*', '+', '-'))
+        if self.random.random() < 0.5:
+            return f'({self._expression(depth - 1)} {operator} {other})'
+        return f'({other} {operator} {self._expression(depth - 1)})'
+
+    def _operand(self, depth):
+        if self.callees and depth >= 0 and self.random.random() < self.calls:
+            callee = self.random.choice(self.callees)
+            arguments = ', '.join(self._expression(min(depth, 2) - 1) for _ in range(self.arities[callee]))
+            return f'f{callee}({arguments})'
+        names = self.variables + self.counters
+        if names and self.random.random() < 0.7:
+            return self.random.choice(names)
+        return str(self.random.randint(0, 100))
+
+def generate(seed, **parameters):
+    return Generator(seed, **parameters).program()
+
+if __name__ == '__main__':
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    sys.stdout.write(generate(seed))
@@ -0,0 +1,46 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from code.compiler import compile, frontend, Options
+from code.closures import execute
+from benchmarks.batch import generate
+
+# Programs per minute through the Python backend, against compiling,
+# assembling, linking and running each program natively.
+def interpreted(paths):
+    start = time.perf_counter()
+    for path in paths:
+        with open(path, 'r') as file:
+            execute(frontend(file.read(), Options(), io.StringIO()), io.StringIO(), io.StringIO())
+    return time.perf_counter() - start
+
+def native(paths, directory):
+    executable = os.path.join(directory, 'program')
+    start = time.perf_counter()
+    for path in paths:
+        with open(path, 'r') as file:
+            assembly = compile(file.read(), Options(), io.StringIO())
+        with open(executable + '.asm', 'w') as file:
+            file.write(assembly)
+        subprocess.run(['nasm', '-f', 'elf', '-o', executable + '.o', executable + '.asm'], check=True)
+        subprocess.run(['gcc', '-m32', '-no-pie', '-o', executable, executable + '.o'], check=True)
+        subprocess.run([executable], check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, files)
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+        elapsed = interpreted(paths)
+        print(f'{files} files  --run   {elapsed:.2f} s  {60 * files / elapsed:8.0f} programs/minute')
+        if shutil.which('nasm') and shutil.which('gcc'):
+            elapsed = native(paths, directory)
+            print(f'{files} files  native  {elapsed:.2f} s  {60 * files / elapsed:8.0f} programs/minute')
+        else:
+            print('nasm or gcc not found: skipping the native pipeline', file=sys.stderr)
@@ -0,0 +1,77 @@
+import shutil
+import sys
+import tempfile
+
+from code.compiler import compile, Options
+from benchmarks.peephole import instructions, runtime
+
+# Index arithmetic over nested loops, with the invariant subexpressions a
+# numeric kernel written by hand tends to leave inside the inner loop.
+MATRIX = '''local n = 3000
+local total = 0
+local i = 0
+while i < n do
+    local j = 0
+    while j < n do
+        total = total + (i * n + j) * 4 + (n * n - 1) * 3
+        j = j + 1
+    end
+    i = i + 1
+end
+print(total)
+'''
+
+POLYNOMIAL = '''function evaluate(count, a, b, c)
+    local x = 0
+    local sum = 0
+    while x < count do
+        sum = sum + a * x * x + (b * c + a) * x + c * 7
+        x = x + 1
+    end
+    return sum
+end
+local round = 0
+local result = 0
+while round < 20 do
+    result = result + evaluate(1000000, 3, round, 11)
+    round = round + 1
+end
+print(result)
+'''
+
+STRIDES = '''local limit = 100000000
+local k = 0
+local even = 0
+local odd = 0
+while k < limit do
+    even = even + k * 8
+    odd = odd - k * 12 + limit * 2
+    k = k + 2
+end
+print(even)
+print(odd)
+'''
+
+def programs():
+    yield 'matrix', MATRIX
+    yield 'polynomial', POLYNOMIAL
+    yield 'strides', STRIDES
+
+if __name__ == '__main__':
+    run = shutil.which('nasm') and shutil.which('gcc')
+    if not run:
+        print('nasm or gcc not found: reporting instruction counts only', file=sys.stderr)
+    configurations = [
+        ('-O', Options(optimize=True)),
+        ('--ir -O --no-loop-passes', Options(optimize=True, ir=True, loops=False)),
+        ('--ir -O', Options(optimize=True, ir=True)),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in programs():
+            print(name)
+            for flags, options in configurations:
+                assembly = compile(source, options)
+                line = f'    {flags:26}  instructions {instructions(assembly):5}'
+                if run:
+                    line += f'  runtime {runtime(assembly, directory):.3f} s'
+                print(line)
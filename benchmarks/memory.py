@@ -0,0 +1,23 @@
+import resource
+import sys
+import time
+
+from code.syntactical import Parser
+
+# Every statement parses into 7 nodes:
+# VarDec(Identifier, BinOp(+, BinOp(*, Identifier, IntVal), Identifier))
+STATEMENT = 'local value_{0} = alpha * {0} + beta\n'
+NODES_PER_STATEMENT = 7
+
+def generate(nodes):
+    return ''.join(STATEMENT.format(i) for i in range(nodes // NODES_PER_STATEMENT))
+
+if __name__ == '__main__':
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    source = generate(nodes)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    tree = Parser().run(source)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{nodes} nodes  parse {elapsed:.2f} s  peak RSS {peak / 1024:.1f} MB  (+{(peak - before) / 1024:.1f} MB over the generated source)')
@@ -0,0 +1,64 @@
+import io
+import sys
+import time
+
+from code.compiler import compile
+from code.syntactical import Parser
+from code.tree import walk
+
+# An ordinary program, to compare the cost per node with nesting kept
+# shallow.
+SECTION = '''function step_{0}(x, y)
+    local t = x * {1} + y / 3 - (x - y) * 2
+    if t > {2} and not (x == y) then
+        return t - {2}
+    else
+        return t + x
+    end
+end
+local i_{0} = 0
+local total_{0} = 0
+while i_{0} < {2} do
+    total_{0} = total_{0} + step_{0}(i_{0}, total_{0} - i_{0})
+    i_{0} = i_{0} + 1
+end
+print(total_{0})
+'''
+
+def flat(sections):
+    return ''.join(SECTION.format(i, i % 7 + 2, i % 50 + 10) for i in range(sections))
+
+def parenthesised(depth):
+    return f'local x = 1\nprint({"(" * depth}x{" + 1)" * depth})\n'
+
+def nested_ifs(depth):
+    return 'local x = 1\n' + 'if x > 0 then\n' * depth + 'x = x + 1\n' + 'end\n' * depth + 'print(x)\n'
+
+def nested_whiles(depth):
+    return 'local x = 1\n' + 'while x < 0 do\n' * depth + 'x = x + 1\n' + 'end\n' * depth + 'print(x)\n'
+
+# Seconds spent parsing and in the rest of compile(), best of repeat, and
+# the node count.
+def measure(source, repeat=3):
+    parse = total = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tree = Parser().run(source)
+        parse = min(parse, time.perf_counter() - start)
+        start = time.perf_counter()
+        compile(source, log=io.StringIO())
+        total = min(total, time.perf_counter() - start)
+    return parse, total - parse, sum(1 for _ in walk(tree))
+
+if __name__ == '__main__':
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    parse, rest, nodes = measure(flat(sections))
+    print(f'flat              {nodes:8} nodes  parse {1e6 * parse / nodes:5.2f} us/node  passes and codegen {1e6 * rest / nodes:5.2f} us/node')
+    for name, generate in (('parenthesised', parenthesised), ('nested ifs', nested_ifs), ('nested whiles', nested_whiles)):
+        for depth in (100, 1000, 10000, 100000):
+            try:
+                parse, rest, nodes = measure(generate(depth))
+            except RecursionError:
+                print(f'{name:14} {depth:6}  RecursionError')
+                continue
+            print(f'{name:14} {depth:6}  {nodes:8} nodes  parse {1e6 * parse / nodes:5.2f} us/node  passes and codegen {1e6 * rest / nodes:5.2f} us/node')
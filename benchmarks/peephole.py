@@ -0,0 +1,71 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from code.compiler import compile, Options
+from benchmarks.batch import SECTION
+
+# Recursion, branches and loops: the shapes whose templates leave the most
+# redundant pushes, reloads and jumps behind.
+LOOPS = '''function fib(n)
+    if n < 2 then
+        return n
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+local i = 0
+local total = 0
+while i < 3000000 do
+    if i == 3 then
+        total = total + 1
+    else
+        total = total + i * 2
+    end
+    i = i + 1
+end
+print(total)
+print(fib(27))
+'''
+
+def programs():
+    with open('test.lua', 'r') as file:
+        yield 'test.lua', file.read()
+    yield 'sections', ''.join(SECTION.format(j, j % 7 + 2, j % 50 + 10) for j in range(20))
+    yield 'loops', LOOPS
+
+def instructions(assembly):
+    return sum(1 for line in assembly.splitlines() if line and not line.endswith(':') and not line.startswith(';'))
+
+def runtime(assembly, directory, repeat=3):
+    source = os.path.join(directory, 'program.asm')
+    executable = os.path.join(directory, 'program')
+    with open(source, 'w') as file:
+        file.write(assembly)
+    subprocess.run(['nasm', '-f', 'elf', '-o', executable + '.o', source], check=True)
+    subprocess.run(['gcc', '-m32', '-no-pie', '-o', executable, executable + '.o'], check=True)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([executable], check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == '__main__':
+    run = shutil.which('nasm') and shutil.which('gcc')
+    if not run:
+        print('nasm or gcc not found: reporting instruction counts only', file=sys.stderr)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in programs():
+            before = compile(source, Options(optimize=True, peephole=False))
+            log = io.StringIO()
+            after = compile(source, Options(optimize=True, peephole_report=True), log)
+            line = f'{name:10}  instructions {instructions(before):5} -> {instructions(after):5}'
+            if run:
+                slow, fast = runtime(before, directory), runtime(after, directory)
+                line += f'  runtime {slow:.3f} s -> {fast:.3f} s'
+            print(line)
+            print('            ' + ', '.join(entry.removeprefix('peephole ') for entry in log.getvalue().splitlines()))
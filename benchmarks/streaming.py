@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PRELUDE = '''function scale(x, y)
+    return x * y + 1
+end
+local total = 0
+local i = 0
+local label = ""
+'''
+# Repeated until the source reaches its size. Every copy reuses the same
+# names, so only the length of the program grows, and each has comments
+# and a string with -- in it for the tokenizer to get right.
+SECTION = '''-- section {0}
+i = 0
+while i < {1} do
+    if scale(i, {0}) > 1000 then -- keep the total small
+        total = total - 1000
+    else
+        total = total + scale(i, 3)
+    end
+    i = i + 1
+end
+label = "total -- after section {0}"
+print(total)
+'''
+
+def generate(path, megabytes):
+    size = megabytes * 1024 * 1024
+    with open(path, 'w') as file:
+        file.write(PRELUDE)
+        written = len(PRELUDE)
+        section = 0
+        while written < size:
+            chunk = ''.join(SECTION.format(section + k, (section + k) % 50 + 10) for k in range(1000))
+            file.write(chunk)
+            written += len(chunk)
+            section += 1000
+
+# Run in the child, which prints its own peak resident size in kilobytes.
+# The maximum that wait4 reports also counts the pages the child shared
+# with its parent between fork and exec, so a large parent inflates it.
+CHILD = '''import sys
+from code.driver import run
+status = run(sys.argv[1:])
+with open('/proc/self/status') as file:
+    print(next(line.split()[1] for line in file if line.startswith('VmHWM:')))
+sys.exit(status)
+'''
+
+# Compiles in a child process and returns the seconds it took and its peak
+# resident size in megabytes.
+def compile(path):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', CHILD, '--stream', '--no-cache', path], stdout=subprocess.PIPE, text=True)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+    return time.perf_counter() - start, int(process.stdout) / 1024
+
+if __name__ == '__main__':
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    ceiling = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    peaks = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (max(megabytes // 100, 1), megabytes):
+            path = os.path.join(directory, f'program{size}.lua')
+            generate(path, size)
+            elapsed, peak = compile(path)
+            peaks.append(peak)
+            print(f'{size:5} MB source  compile {elapsed:7.1f} s  peak RSS {peak:6.1f} MB')
+            os.remove(path)
+            os.remove(os.path.join(directory, f'program{size}.asm'))
+    print(f'ceiling {ceiling} MB: {"ok" if max(peaks) <= ceiling else "exceeded"}')
+    sys.exit(0 if max(peaks) <= ceiling else 1)
@@ -0,0 +1,146 @@
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from code.compiler import codegen, frontend, Options
+from code.syntactical import Parser
+from code.tokenizer import Tokenizer
+from benchmarks.generator import generate
+from benchmarks.peephole import instructions
+from benchmarks.targets import LINK
+
+# Each case stretches one parameter of the generator and leaves the others
+# at their defaults.
+CASES = {
+    'small': {'statements': 50},
+    'large': {'statements': 300},
+    'deep expressions': {'statements': 150, 'depth': 12},
+    'nested loops': {'statements': 150, 'loops': 4},
+    'many functions': {'statements': 150, 'functions': 100},
+    'call heavy': {'statements': 150, 'functions': 20, 'calls': 0.4},
+}
+
+CONFIGURATIONS = {
+    '': Options(),
+    '-O': Options(optimize=True),
+    '--ir -O': Options(optimize=True, ir=True),
+}
+
+# Seconds a phase takes, best of repeat. prepare is called before each
+# repetition, untimed, and its result passed to phase.
+def best(phase, repeat, prepare=lambda: None):
+    elapsed = float('inf')
+    for _ in range(repeat):
+        argument = prepare()
+        start = time.perf_counter()
+        result = phase(argument)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed, result
+
+# The front end is timed as a whole, then less the parser, which in turn
+# is timed less the tokenizer it runs first.
+def compiler_phases(source, options, repeat):
+    log = io.StringIO()
+    tokenize, _ = best(lambda _: Tokenizer(source), repeat)
+    parse, _ = best(lambda _: Parser().run(source), repeat)
+    front, _ = best(lambda _: frontend(source, options, log), repeat)
+    generation, assembly = best(lambda tree: codegen(tree, options, log), repeat, lambda: frontend(source, options, log))
+    phases = {
+        'tokenize': tokenize,
+        'parse': max(parse - tokenize, 0.0),
+        'passes': max(front - parse, 0.0),
+        'codegen': generation,
+    }
+    return phases, assembly
+
+def native_phases(assembly, directory, target, repeat):
+    source = os.path.join(directory, 'program.asm')
+    executable = os.path.join(directory, 'program')
+    with open(source, 'w') as file:
+        file.write(assembly)
+    assembler, linker = LINK[target]
+    run = lambda command, **arguments: subprocess.run(command, check=True, **arguments)
+    assemble, _ = best(lambda _: run([*assembler, '-o', executable + '.o', source]), repeat)
+    link, _ = best(lambda _: run([*linker, '-o', executable, executable + '.o']), repeat)
+    execute, _ = best(lambda _: run([executable], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL), repeat)
+    return {'assemble': assemble, 'link': link, 'run': execute}
+
+def measure(seed, repeat, native):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for case, parameters in CASES.items():
+            source = generate(seed, **parameters)
+            for flags, options in CONFIGURATIONS.items():
+                phases, assembly = compiler_phases(source, options, repeat)
+                if native:
+                    phases.update(native_phases(assembly, directory, options.target, repeat))
+                results[f'{case} {flags}'.strip()] = {'instructions': instructions(assembly), 'seconds': phases}
+    return results
+
+# Entries of results slower than the same entry of baseline by more than
+# threshold, as a fraction. Times under floor seconds are too noisy to
+# compare, and instruction counts are compared exactly.
+def regressions(results, baseline, threshold, floor):
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name]
+        if result['instructions'] > previous['instructions']:
+            found.append(f'{name}: instructions {previous["instructions"]} -> {result["instructions"]}')
+        for phase, seconds in result['seconds'].items():
+            before = previous['seconds'].get(phase)
+            if before is None or max(before, seconds) < floor:
+                continue
+            if seconds > before * (1 + threshold):
+                found.append(f'{name}: {phase} {before:.4f} s -> {seconds:.4f} s ({seconds / before - 1:+.0%})')
+    return found
+
+def report(results):
+    phases = list(dict.fromkeys(phase for result in results.values() for phase in result['seconds']))
+    width = max(map(len, results))
+    print(f'{"":{width}}  {"instructions":>12}' + ''.join(f'  {phase:>9}' for phase in phases))
+    for name, result in results.items():
+        line = f'{name:{width}}  {result["instructions"]:12}'
+        for phase in phases:
+            seconds = result['seconds'].get(phase)
+            line += f'  {seconds:9.4f}' if seconds is not None else f'  {"-":>9}'
+        print(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.suite', description='Times each phase of the compiler on generated programs.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each phase, of which the fastest counts')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown, as a fraction, reported as a regression')
+    parser.add_argument('--floor', type=float, default=0.005, help='seconds below which a phase is not compared')
+    args = parser.parse_args()
+
+    native = bool(shutil.which('nasm') and shutil.which('gcc'))
+    if not native:
+        print('nasm or gcc not found: timing the compiler only', file=sys.stderr)
+    results = measure(args.seed, args.repeat, native)
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            document = {'seed': args.seed, 'repeat': args.repeat, 'python': platform.python_version(), 'cases': CASES, 'results': results}
+            json.dump(document, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['seed'] != args.seed or baseline['cases'] != CASES:
+            print('baseline was generated from other programs: not comparing', file=sys.stderr)
+            sys.exit(2)
+        found = regressions(results, baseline['results'], args.threshold, args.floor)
+        for line in found:
+            print(f'regression: {line}')
+        print(f'{len(found)} regressions against {args.baseline}')
+        sys.exit(1 if found else 0)
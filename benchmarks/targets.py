@@ -0,0 +1,80 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from code.compiler import compile, Options
+from benchmarks.peephole import instructions
+
+# Recursive calls, where x86 pushes every argument and reads it back from
+# the stack while x86-64 passes them in registers.
+FACTORIAL = '''function factorial(n)
+    if n == 0 then
+        return 1
+    else
+        return n * factorial(n - 1)
+    end
+end
+local k = 0
+local total = 0
+while k < 20000000 do
+    total = total + factorial(k - k / 13 * 13)
+    k = k + 1
+end
+print(total)
+'''
+
+FIBONACCI = '''function fibonacci(n)
+    if n < 2 then
+        return n
+    end
+    return fibonacci(n - 1) + fibonacci(n - 2)
+end
+local n = 0
+local total = 0
+while n < 36 do
+    total = total + fibonacci(n)
+    n = n + 1
+end
+print(total)
+'''
+
+LINK = {
+    'x86': (['nasm', '-f', 'elf'], ['gcc', '-m32', '-no-pie']),
+    'x86-64': (['nasm', '-f', 'elf64'], ['gcc']),
+}
+
+def runtime(assembly, directory, target, repeat=3):
+    source = os.path.join(directory, 'program.asm')
+    executable = os.path.join(directory, 'program')
+    with open(source, 'w') as file:
+        file.write(assembly)
+    assembler, linker = LINK[target]
+    subprocess.run([*assembler, '-o', executable + '.o', source], check=True)
+    subprocess.run([*linker, '-o', executable, executable + '.o'], check=True)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([executable], check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == '__main__':
+    run = shutil.which('nasm') and shutil.which('gcc')
+    if not run:
+        print('nasm or gcc not found: reporting instruction counts only', file=sys.stderr)
+    configurations = [
+        ('--ir -O', Options(optimize=True, ir=True)),
+        ('--target x86-64 -O', Options(optimize=True, target='x86-64')),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in (('factorial', FACTORIAL), ('fibonacci', FIBONACCI)):
+            print(name)
+            for flags, options in configurations:
+                assembly = compile(source, options)
+                line = f'    {flags:20}  instructions {instructions(assembly):5}'
+                if run:
+                    line += f'  runtime {runtime(assembly, directory, options.target):.3f} s'
+                print(line)
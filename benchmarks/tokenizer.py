@@ -0,0 +1,24 @@
+import time
+
+from code.tokenizer import Tokenizer
+
+STATEMENT = 'local value_{0} = (alpha + {0}) * beta - gamma / 3 == 1 and not delta\nprint("item {0}")\n'
+
+def generate(size):
+    lines = []
+    length = 0
+    index = 0
+    while length < size:
+        line = STATEMENT.format(index)
+        lines.append(line)
+        length += len(line)
+        index += 1
+    return ''.join(lines)
+
+if __name__ == '__main__':
+    for megabytes in (1, 2, 4, 8, 16):
+        source = generate(megabytes * 1024 * 1024)
+        start = time.perf_counter()
+        tokenizer = Tokenizer(source)
+        elapsed = time.perf_counter() - start
+        print(f'{megabytes:3} MB  {len(tokenizer.types):10} tokens  {elapsed:7.3f} s  {elapsed / megabytes:6.3f} s/MB')
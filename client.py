@@ -0,0 +1,37 @@
+import json
+import os
+import socket
+import sys
+
+# Thin client for 'python3 main.py --serve'. It takes the same arguments as
+# main.py and imports nothing from the compiler, so run it with 'python3 -S'
+# to keep startup short. Exits with 75 when no daemon is listening.
+UNAVAILABLE = 75
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    path = os.environ.get('LUA_COMPILER_SOCKET', f'/tmp/lua-compiler-{os.getuid()}.sock')
+    if argv[:1] == ['--socket']:
+        path, argv = argv[1], argv[2:]
+
+    if argv == ['--metrics']:
+        request = {'metrics': True}
+    else:
+        request = {'argv': argv, 'cwd': os.getcwd()}
+
+    with socket.socket(socket.AF_UNIX) as connection:
+        try:
+            connection.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            print(f'client.py: no compiler daemon on {path}', file=sys.stderr)
+            sys.exit(UNAVAILABLE)
+        connection.sendall(json.dumps(request).encode() + b'\n')
+        reply = json.loads(connection.makefile('rb').readline())
+
+    if 'status' not in reply:
+        print(json.dumps(reply, indent=2))
+        sys.exit(0)
+    sys.stdout.write(reply.get('output', ''))
+    sys.stderr.write(reply['log'])
+    sys.exit(reply['status'])
@@ -0,0 +1,109 @@
+# Instruction sequences for multiplying and dividing a register by a
+# constant, shared by both code generators. Division truncates towards
+# zero, like IDIV.
+
+# LEA multiplies by these in one instruction.
+LEA_FACTORS = (3, 5, 9)
+
+def is_power_of_two(value):
+    return value > 0 and value & (value - 1) == 0
+
+# Splits a multiplier into a LEA factor and a shift, or returns None.
+def decompose(multiplier):
+    shift = (multiplier & -multiplier).bit_length() - 1
+    odd = multiplier >> shift
+    if odd == 1 or odd in LEA_FACTORS:
+        return odd, shift
+    return None
+
+def multiply(asm, register, multiplier):
+    if multiplier == 0:
+        asm.write(f'MOV {register}, 0')
+        return
+    parts = decompose(abs(multiplier))
+    if parts is None:
+        asm.write(f'IMUL {register}, {register}, {multiplier}')
+        return
+    odd, shift = parts
+    if odd != 1:
+        asm.write(f'LEA {register}, [{register}+{register}*{odd - 1}]')
+    if shift:
+        asm.write(f'SHL {register}, {shift}')
+    if multiplier < 0:
+        asm.write(f'NEG {register}')
+
+# Divisors that division_by_constant handles. The most negative one has no
+# magic number and is left to IDIV.
+def is_reducible(divisor):
+    return divisor != 0 and divisor != -2 ** 31
+
+# Divisors that need more than shifts, and so EAX and a dividend that is
+# not in EAX or EDX.
+def needs_multiply(divisor):
+    return not is_power_of_two(abs(divisor))
+
+# The multiplier and shift that turn signed division by divisor into a
+# multiplication keeping the high half (Hacker's Delight, 10-1).
+def magic(divisor):
+    two31 = 2 ** 31
+    absolute = abs(divisor)
+    t = two31 + (1 if divisor < 0 else 0)
+    anc = t - 1 - t % absolute
+    p = 31
+    q1, r1 = divmod(two31, anc)
+    q2, r2 = divmod(two31, absolute)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= absolute:
+            q2, r2 = q2 + 1, r2 - absolute
+        delta = absolute - r2
+        if q1 > delta or q1 == delta and r1 != 0:
+            break
+    multiplier = (q2 + 1) & 0xFFFFFFFF
+    if divisor < 0:
+        multiplier = -multiplier & 0xFFFFFFFF
+    if multiplier & 0x80000000:
+        multiplier -= 2 ** 32
+    return multiplier, p - 32
+
+# Leaves dividend / divisor in target, clobbering EDX. When the divisor
+# needs a multiply EAX is clobbered too, and the dividend must be a
+# register other than EAX and EDX, or memory; otherwise it must be target.
+def divide_by_constant(asm, target, dividend, divisor):
+    if not needs_multiply(divisor):
+        shift = abs(divisor).bit_length() - 1
+        if shift == 1:
+            asm.write(f'MOV EDX, {target}')
+            asm.write('SHR EDX, 31')
+            asm.write(f'ADD {target}, EDX')
+        elif shift:
+            # Negative dividends round up by adding divisor - 1.
+            asm.write(f'MOV EDX, {target}')
+            asm.write('SAR EDX, 31')
+            asm.write(f'SHR EDX, {32 - shift}')
+            asm.write(f'ADD {target}, EDX')
+        if shift:
+            asm.write(f'SAR {target}, {shift}')
+        if divisor < 0:
+            asm.write(f'NEG {target}')
+        return
+
+    multiplier, shift = magic(divisor)
+    asm.write(f'MOV EAX, {multiplier}')
+    asm.write(f'IMUL {dividend}')
+    if divisor > 0 and multiplier < 0:
+        asm.write(f'ADD EDX, {dividend}')
+    elif divisor < 0 and multiplier > 0:
+        asm.write(f'SUB EDX, {dividend}')
+    if shift:
+        asm.write(f'SAR EDX, {shift}')
+    # Adds one to a negative quotient, which the shift rounded down.
+    asm.write('MOV EAX, EDX')
+    asm.write('SHR EAX, 31')
+    asm.write('ADD EDX, EAX')
+    if target != 'EDX':
+        asm.write(f'MOV {target}, EDX')
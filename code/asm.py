@@ -1,3 +1,4 @@
+import sys
 from textwrap import dedent
 
 class ASM:
@@ -11,47 +12,180 @@ class ASM:
         STDOUT equ 1
         True equ 1
         False equ 0
+        OUTPUT_SIZE equ 65536
+        INPUT_SIZE equ 65536
 
         segment .data
 
-        formatin: db "%d", 0
-        formatout: db "%d", 10, 0 ; newline, nul terminator
         scanint: times 4 db 0 ; 32-bits integer = 4 bytes
 
         segment .bss  ; variaveis
         res RESB 1
+        outbuf RESB OUTPUT_SIZE
+        outpos RESD 1
+        inbuf RESB INPUT_SIZE
+        inpos RESD 1
+        inend RESD 1
 
         section .text
         global main ; linux
         ;global _main ; windows
-        extern scanf ; linux
-        extern printf ; linux
-        ;extern _scanf ; windows
-        ;extern _printf; windows
-        extern fflush ; linux
-        ;extern _fflush ; windows
-        extern stdout ; linux
-        ;extern _stdout ; windows
-
-        ; subrotinas if/while
-        binop_je:
-        JE binop_true
-        JMP binop_false
-
-        binop_jg:
-        JG binop_true
-        JMP binop_false
-
-        binop_jl:
-        JL binop_true
-        JMP binop_false
-
-        binop_false:
-        MOV EAX, False  
-        JMP binop_exit
-        binop_true:
-        MOV EAX, True
-        binop_exit:
+
+        ; Output collects in outbuf and goes out with write(2) when the
+        ; buffer fills, before input is read and at exit. Input comes in
+        ; with read(2) in INPUT_SIZE chunks. The routines keep every
+        ; register but EAX.
+
+        ; Writes EAX in decimal and a newline.
+        PRINT_INT:
+        PUSH EBX
+        PUSH ECX
+        PUSH EDX
+        PUSH EDI
+        SUB ESP, 12 ; digits, written from the end
+        MOV EDI, [outpos]
+        CMP EDI, OUTPUT_SIZE - 12
+        JBE PRINT_INT_ROOM
+        CALL FLUSH_OUTPUT
+        XOR EDI, EDI
+        PRINT_INT_ROOM:
+        TEST EAX, EAX
+        JNS PRINT_INT_POSITIVE
+        NEG EAX
+        MOV BYTE [outbuf+EDI], '-'
+        INC EDI
+        PRINT_INT_POSITIVE:
+        LEA ECX, [ESP+12]
+        MOV EBX, 10
+        PRINT_INT_DIGIT:
+        XOR EDX, EDX
+        DIV EBX
+        ADD DL, '0'
+        DEC ECX
+        MOV [ECX], DL
+        TEST EAX, EAX
+        JNZ PRINT_INT_DIGIT
+        LEA EBX, [ESP+12]
+        PRINT_INT_COPY:
+        MOV DL, [ECX]
+        MOV [outbuf+EDI], DL
+        INC EDI
+        INC ECX
+        CMP ECX, EBX
+        JB PRINT_INT_COPY
+        MOV BYTE [outbuf+EDI], 10
+        INC EDI
+        MOV [outpos], EDI
+        ADD ESP, 12
+        POP EDI
+        POP EDX
+        POP ECX
+        POP EBX
+        RET
+
+        FLUSH_OUTPUT:
+        PUSH EAX
+        PUSH EBX
+        PUSH ECX
+        PUSH EDX
+        MOV ECX, outbuf
+        MOV EDX, [outpos]
+        FLUSH_OUTPUT_WRITE:
+        TEST EDX, EDX
+        JLE FLUSH_OUTPUT_DONE
+        MOV EAX, SYS_WRITE
+        MOV EBX, STDOUT
+        INT 0x80
+        TEST EAX, EAX
+        JLE FLUSH_OUTPUT_DONE
+        ADD ECX, EAX
+        SUB EDX, EAX
+        JMP FLUSH_OUTPUT_WRITE
+        FLUSH_OUTPUT_DONE:
+        MOV DWORD [outpos], 0
+        POP EDX
+        POP ECX
+        POP EBX
+        POP EAX
+        RET
+
+        ; The next input byte in EAX without consuming it, or -1 at the end.
+        INPUT_BYTE:
+        MOV EAX, [inpos]
+        CMP EAX, [inend]
+        JB INPUT_BYTE_READY
+        CALL FLUSH_OUTPUT
+        PUSH EBX
+        PUSH ECX
+        PUSH EDX
+        MOV EAX, SYS_READ
+        MOV EBX, STDIN
+        MOV ECX, inbuf
+        MOV EDX, INPUT_SIZE
+        INT 0x80
+        POP EDX
+        POP ECX
+        POP EBX
+        MOV DWORD [inpos], 0
+        TEST EAX, EAX
+        JG INPUT_BYTE_FILLED
+        MOV DWORD [inend], 0
+        MOV EAX, -1
+        RET
+        INPUT_BYTE_FILLED:
+        MOV [inend], EAX
+        XOR EAX, EAX
+        INPUT_BYTE_READY:
+        MOVZX EAX, BYTE [inbuf+EAX]
+        RET
+
+        ; Reads a decimal integer into EAX like scanf("%d"): blanks are
+        ; skipped, and without digits the previous value is returned.
+        READ_INT:
+        PUSH EBX
+        PUSH ESI
+        READ_INT_SPACE:
+        CALL INPUT_BYTE
+        TEST EAX, EAX
+        JS READ_INT_DONE
+        CMP EAX, ' '
+        JA READ_INT_SIGN
+        INC DWORD [inpos]
+        JMP READ_INT_SPACE
+        READ_INT_SIGN:
+        XOR ESI, ESI
+        CMP EAX, '-'
+        JNE READ_INT_PLUS
+        INC ESI
+        JMP READ_INT_SKIP
+        READ_INT_PLUS:
+        CMP EAX, '+'
+        JNE READ_INT_FIRST
+        READ_INT_SKIP:
+        INC DWORD [inpos]
+        CALL INPUT_BYTE
+        READ_INT_FIRST:
+        SUB EAX, '0'
+        CMP EAX, 9
+        JA READ_INT_DONE
+        XOR EBX, EBX
+        READ_INT_DIGIT:
+        INC DWORD [inpos]
+        IMUL EBX, EBX, 10
+        ADD EBX, EAX
+        CALL INPUT_BYTE
+        SUB EAX, '0'
+        CMP EAX, 9
+        JBE READ_INT_DIGIT
+        TEST ESI, ESI
+        JZ READ_INT_STORE
+        NEG EBX
+        READ_INT_STORE:
+        MOV [scanint], EBX
+        READ_INT_DONE:
+        MOV EAX, [scanint]
+        POP ESI
+        POP EBX
         RET
 
         main:
@@ -65,9 +199,7 @@ class ASM:
     final_code = '''
         ; interrupcao de saida (default)
 
-        PUSH DWORD [stdout]
-        CALL fflush
-        ADD ESP, 4
+        CALL FLUSH_OUTPUT
 
         MOV ESP, EBP
         POP EBP
@@ -77,24 +209,270 @@ class ASM:
         INT 0x80
     '''
 
-    filename = None
-
-    @staticmethod
-    def initialize(filename):
-        ASM.filename = filename
-        with open(ASM.filename, 'w') as file:
-            file.write(dedent(ASM.initial_code))
-
-    @staticmethod
-    def write(code):
-        if ASM.filename is None:
-            raise ValueError("Filename is not set. Call initialize() first.")
-        with open(ASM.filename, 'a') as file:
-            file.write(dedent(code))
-
-    @staticmethod
-    def end():
-        if ASM.filename is None:
-            raise ValueError("Filename is not set. Call initialize() first.")
-        with open(ASM.filename, 'a') as file:
-            file.write(dedent(ASM.final_code))
\ No newline at end of file
+    def __init__(self, sink=None, peephole=None):
+        self.sink = sys.stdout if sink is None else sink
+        self.peephole = peephole
+        self.instructions = []
+        self.started = False
+
+    def write(self, code):
+        self.instructions.append(code)
+
+    # Writes the instructions so far to the sink, after the prelude the
+    # first time, so a program compiled a statement at a time is not held
+    # in memory whole.
+    def flush(self):
+        if self.peephole is not None:
+            self.instructions = self.peephole.run(self.instructions)
+        if not self.started:
+            self.sink.write(dedent(self.initial_code))
+            self.started = True
+        if self.instructions:
+            self.sink.write('\n'.join(self.instructions))
+            self.sink.write('\n')
+            self.instructions = []
+
+    def end(self):
+        self.flush()
+        self.sink.write(dedent(self.final_code))
+
+    # Returns from the current function. Returning from main skips the
+    # flush at the end of the program, so main flushes first.
+    def epilogue(self, main):
+        if main:
+            self.write('CALL FLUSH_OUTPUT')
+        self.write('MOV ESP, EBP')
+        self.write('POP EBP')
+        self.write('RET')
+
+# The same runtime for x86-64 Linux. Data is reached RIP-relative, so the
+# object links into a position-independent executable, and SYSCALL also
+# clobbers RCX and R11, which the routines keep like every register but
+# EAX.
+class ASM64(ASM):
+
+    initial_code = '''
+        ; constantes
+        SYS_READ equ 0
+        SYS_WRITE equ 1
+        SYS_EXIT equ 60
+        STDIN equ 0
+        STDOUT equ 1
+        True equ 1
+        False equ 0
+        OUTPUT_SIZE equ 65536
+        INPUT_SIZE equ 65536
+
+        segment .data
+
+        scanint: times 4 db 0 ; 32-bits integer = 4 bytes
+
+        segment .bss  ; variaveis
+        outbuf RESB OUTPUT_SIZE
+        outpos RESD 1
+        inbuf RESB INPUT_SIZE
+        inpos RESD 1
+        inend RESD 1
+
+        section .text
+        global main
+
+        ; Writes EAX in decimal and a newline.
+        PRINT_INT:
+        PUSH RBX
+        PUSH RCX
+        PUSH RDX
+        PUSH RSI
+        PUSH RDI
+        SUB RSP, 16 ; digits, written from the end
+        MOV EDI, [rel outpos]
+        CMP EDI, OUTPUT_SIZE - 12
+        JBE PRINT_INT_ROOM
+        CALL FLUSH_OUTPUT
+        XOR EDI, EDI
+        PRINT_INT_ROOM:
+        LEA RSI, [rel outbuf]
+        TEST EAX, EAX
+        JNS PRINT_INT_POSITIVE
+        NEG EAX
+        MOV BYTE [RSI+RDI], '-'
+        INC EDI
+        PRINT_INT_POSITIVE:
+        LEA RCX, [RSP+16]
+        MOV EBX, 10
+        PRINT_INT_DIGIT:
+        XOR EDX, EDX
+        DIV EBX
+        ADD DL, '0'
+        DEC RCX
+        MOV [RCX], DL
+        TEST EAX, EAX
+        JNZ PRINT_INT_DIGIT
+        LEA RBX, [RSP+16]
+        PRINT_INT_COPY:
+        MOV DL, [RCX]
+        MOV [RSI+RDI], DL
+        INC EDI
+        INC RCX
+        CMP RCX, RBX
+        JB PRINT_INT_COPY
+        MOV BYTE [RSI+RDI], 10
+        INC EDI
+        MOV [rel outpos], EDI
+        ADD RSP, 16
+        POP RDI
+        POP RSI
+        POP RDX
+        POP RCX
+        POP RBX
+        RET
+
+        FLUSH_OUTPUT:
+        PUSH RAX
+        PUSH RCX
+        PUSH RDX
+        PUSH RSI
+        PUSH RDI
+        PUSH R11
+        LEA RSI, [rel outbuf]
+        MOV EDX, [rel outpos]
+        FLUSH_OUTPUT_WRITE:
+        TEST EDX, EDX
+        JLE FLUSH_OUTPUT_DONE
+        MOV EAX, SYS_WRITE
+        MOV EDI, STDOUT
+        SYSCALL
+        TEST EAX, EAX
+        JLE FLUSH_OUTPUT_DONE
+        ADD RSI, RAX
+        SUB EDX, EAX
+        JMP FLUSH_OUTPUT_WRITE
+        FLUSH_OUTPUT_DONE:
+        MOV DWORD [rel outpos], 0
+        POP R11
+        POP RDI
+        POP RSI
+        POP RDX
+        POP RCX
+        POP RAX
+        RET
+
+        ; The next input byte in EAX without consuming it, or -1 at the end.
+        INPUT_BYTE:
+        MOV EAX, [rel inpos]
+        CMP EAX, [rel inend]
+        JB INPUT_BYTE_READY
+        CALL FLUSH_OUTPUT
+        PUSH RCX
+        PUSH RDX
+        PUSH RSI
+        PUSH RDI
+        PUSH R11
+        MOV EAX, SYS_READ
+        MOV EDI, STDIN
+        LEA RSI, [rel inbuf]
+        MOV EDX, INPUT_SIZE
+        SYSCALL
+        POP R11
+        POP RDI
+        POP RSI
+        POP RDX
+        POP RCX
+        MOV DWORD [rel inpos], 0
+        TEST EAX, EAX
+        JG INPUT_BYTE_FILLED
+        MOV DWORD [rel inend], 0
+        MOV EAX, -1
+        RET
+        INPUT_BYTE_FILLED:
+        MOV [rel inend], EAX
+        XOR EAX, EAX
+        INPUT_BYTE_READY:
+        PUSH RSI
+        LEA RSI, [rel inbuf]
+        MOVZX EAX, BYTE [RSI+RAX]
+        POP RSI
+        RET
+
+        ; Reads a decimal integer into EAX like scanf("%d"): blanks are
+        ; skipped, and without digits the previous value is returned.
+        READ_INT:
+        PUSH RBX
+        PUSH RSI
+        READ_INT_SPACE:
+        CALL INPUT_BYTE
+        TEST EAX, EAX
+        JS READ_INT_DONE
+        CMP EAX, ' '
+        JA READ_INT_SIGN
+        INC DWORD [rel inpos]
+        JMP READ_INT_SPACE
+        READ_INT_SIGN:
+        XOR ESI, ESI
+        CMP EAX, '-'
+        JNE READ_INT_PLUS
+        INC ESI
+        JMP READ_INT_SKIP
+        READ_INT_PLUS:
+        CMP EAX, '+'
+        JNE READ_INT_FIRST
+        READ_INT_SKIP:
+        INC DWORD [rel inpos]
+        CALL INPUT_BYTE
+        READ_INT_FIRST:
+        SUB EAX, '0'
+        CMP EAX, 9
+        JA READ_INT_DONE
+        XOR EBX, EBX
+        READ_INT_DIGIT:
+        INC DWORD [rel inpos]
+        IMUL EBX, EBX, 10
+        ADD EBX, EAX
+        CALL INPUT_BYTE
+        SUB EAX, '0'
+        CMP EAX, 9
+        JBE READ_INT_DIGIT
+        TEST ESI, ESI
+        JZ READ_INT_STORE
+        NEG EBX
+        READ_INT_STORE:
+        MOV [rel scanint], EBX
+        READ_INT_DONE:
+        MOV EAX, [rel scanint]
+        POP RSI
+        POP RBX
+        RET
+
+        main:
+
+        PUSH RBP ; guarda o base pointer
+        MOV RBP, RSP ; estabelece um novo base pointer
+
+        ; codigo gerado pelo compilador abaixo
+    '''
+
+    final_code = '''
+        ; interrupcao de saida (default)
+
+        CALL FLUSH_OUTPUT
+
+        MOV RSP, RBP
+        POP RBP
+
+        MOV EAX, SYS_EXIT
+        XOR EDI, EDI
+        SYSCALL
+    '''
+
+    # main leaves through exit(2) with its value instead of returning into
+    # the C library with callee-saved registers changed.
+    def epilogue(self, main):
+        if main:
+            self.write('CALL FLUSH_OUTPUT')
+            self.write('MOV EDI, EAX')
+            self.write('MOV EAX, SYS_EXIT')
+            self.write('SYSCALL')
+            return
+        self.write('MOV RSP, RBP')
+        self.write('POP RBP')
+        self.write('RET')
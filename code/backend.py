@@ -0,0 +1,373 @@
+from .ir import Temp, MIRRORED_CONDITIONS, NEGATED_CONDITIONS
+from .passes import liveness
+from .loops import depths
+from .arithmetic import multiply, divide_by_constant, is_reducible, needs_multiply
+
+# Temporaries live in these registers; EAX and EDX are scratch for every
+# instruction. Calls to compiled functions clobber all of them, while the
+# runtime's PRINT_INT and READ_INT keep them.
+REGISTERS = ('EBX', 'ESI', 'EDI', 'ECX')
+JUMPS = {'>': 'JG', '<': 'JL', '>=': 'JGE', '<=': 'JLE', '==': 'JE', '!=': 'JNE'}
+SETS = {'>': 'SETG', '<': 'SETL', '>=': 'SETGE', '<=': 'SETLE', '==': 'SETE', '!=': 'SETNE'}
+ARITHMETIC = {'+': 'ADD', '-': 'SUB', '*': 'IMUL', 'and': 'AND', 'or': 'OR'}
+COMMUTATIVE = ('+', '*', 'and', 'or')
+
+def is_memory(location):
+    return location.startswith('[')
+
+def is_immediate(location):
+    return location.lstrip('-').isdigit()
+
+def sized(location):
+    return f'DWORD {location}' if is_memory(location) else location
+
+# Emits NASM for a lowered Program through the ASM buffer, so the prelude,
+# the exit code and the peephole pass are shared with the AST code generator.
+class Backend:
+
+    registers = REGISTERS
+    frame_pointer = 'EBP'
+    stack_pointer = 'ESP'
+    save_in_frame = False
+
+    def __init__(self, asm):
+        self.asm = asm
+        self.locations = {}
+        self.saved = {}
+        self.loads = []
+        self.save_area = []
+        self.scratch = None
+        self.function = None
+
+    def run(self, program):
+        self._function(program.main)
+        for function in program.functions:
+            self._function(function)
+        self.asm.write('END_MAIN:')
+
+    def _function(self, function):
+        asm = self.asm
+        self.function = function.name
+        frame = self._allocate(function)
+        if function.name != 'main':
+            asm.write(f'{function.name}:')
+            self._enter()
+        if frame:
+            asm.write(f'SUB {self.stack_pointer}, {frame}')
+        self._parallel_move(self.loads)
+
+        blocks = function.blocks
+        for index, block in enumerate(blocks):
+            following = blocks[index + 1].label if index + 1 < len(blocks) else None
+            asm.write(f'{block.label}:')
+            for instruction in block.instructions:
+                self._instruction(instruction, following)
+
+    # Variables and temporaries live across blocks compete for registers
+    # held for their whole live range, weighted by how deeply nested in
+    # loops their uses are; a register is taken for every block the range
+    # touches, leaving enough in each block for its own temporaries. The
+    # rest get frame slots. Temporaries used within one block get the
+    # remaining registers by a linear scan over it.
+    def _allocate(self, function):
+        locations = self.locations = {}
+        self.saved = {}
+        self.loads = []
+        slots = 0
+
+        def slot():
+            nonlocal slots
+            slots += 1
+            return f'[{self.frame_pointer}-{4 * slots}]'
+
+        live_in = liveness(function)
+        live_out = {}
+        for block in function.blocks:
+            live_out[block.label] = set()
+            for successor in block.successors():
+                live_out[block.label] |= live_in[successor]
+
+        depth = depths(function)
+        weights, ranges = {}, {}
+        for name in list(function.parameters) + function.locals:
+            weights[name], ranges[name] = 0, set()
+        crossing = set().union(*live_in.values())
+        for block in function.blocks:
+            for instruction in block.instructions:
+                for operand in instruction.uses() + [instruction.dest]:
+                    if operand in crossing and operand not in weights:
+                        weights[operand], ranges[operand] = 0, set()
+        for block in function.blocks:
+            weight = 10 ** min(depth[block.label], 4)
+            for instruction in block.instructions:
+                for operand in instruction.uses() + [instruction.dest]:
+                    if operand in weights:
+                        weights[operand] += weight
+                        ranges[operand].add(block.label)
+            for operand in live_in[block.label] | live_out[block.label]:
+                ranges[operand].add(block.label)
+
+        # The most temporaries of a single block live at once, which keep
+        # that many registers out of reach of the longer ranges.
+        pressure = {}
+        for block in function.blocks:
+            last, live, pressure[block.label] = {}, 0, 0
+            for index, instruction in enumerate(block.instructions):
+                for operand in instruction.uses():
+                    last[operand] = index
+            for index, instruction in enumerate(block.instructions):
+                live -= sum(1 for operand in set(instruction.uses()) if isinstance(operand, Temp) and operand not in weights and last[operand] == index)
+                if isinstance(instruction.dest, Temp) and instruction.dest not in weights and instruction.dest in last:
+                    live += 1
+                pressure[block.label] = max(pressure[block.label], live)
+
+        taken = {block.label: set() for block in function.blocks}
+        for operand in sorted(weights, key=lambda operand: -weights[operand]):
+            if not weights[operand]:
+                break
+            blocks = ranges[operand]
+            if any(len(taken[label]) + max(pressure[label], 1) >= len(self.registers) for label in blocks):
+                continue
+            register = next((register for register in self.registers if all(register not in taken[label] for label in blocks)), None)
+            if register is not None:
+                locations[operand] = register
+                for label in blocks:
+                    taken[label].add(register)
+
+        # Parameters not given a register stay where they arrive when that
+        # is memory, and are stored to a slot when it is a register.
+        for index, parameter in enumerate(function.parameters):
+            incoming = self._incoming(index)
+            if parameter in locations:
+                self.loads.append((locations[parameter], incoming))
+            elif is_memory(incoming):
+                locations[parameter] = incoming
+            elif ranges[parameter]:
+                locations[parameter] = slot()
+                self.loads.append((locations[parameter], incoming))
+        # Values whose ranges share no block share a frame slot.
+        shared = []
+        for operand in weights:
+            if operand not in locations:
+                for location, blocks in shared:
+                    if not blocks & ranges[operand]:
+                        blocks |= ranges[operand]
+                        break
+                else:
+                    location = slot()
+                    shared.append((location, set(ranges[operand])))
+                locations[operand] = location
+
+        for block in function.blocks:
+            last = {}
+            for index, instruction in enumerate(block.instructions):
+                for operand in instruction.uses():
+                    last[operand] = index
+            for operand in live_out[block.label]:
+                last[operand] = len(block.instructions)
+
+            free = [register for register in self.registers if register not in taken[block.label]]
+            active = {}
+            for index, instruction in enumerate(block.instructions):
+                if instruction.op == 'call':
+                    live = [operand for operand in last if last[operand] > index and operand != instruction.dest and operand in locations]
+                    self.saved[instruction] = [register for register in self.registers if register in {locations[operand] for operand in live}]
+                for temp in [temp for temp in active if last.get(temp, -1) <= index]:
+                    free.insert(0, active.pop(temp))
+                dest = instruction.dest
+                if isinstance(dest, Temp) and dest not in locations:
+                    if free and last.get(dest, -1) > index:
+                        locations[dest] = active[dest] = free.pop(0)
+                    else:
+                        locations[dest] = slot()
+
+        # Where the stack pointer has to stay put, registers live across a
+        # call are kept in frame slots instead of being pushed.
+        self.save_area = []
+        if self.save_in_frame:
+            self.save_area = [slot() for _ in range(max(map(len, self.saved.values()), default=0))]
+
+        # IDIV takes no immediate, so the constant divisors that it still
+        # handles are stored here first.
+        if any(instruction.op == '/' and isinstance(instruction.args[1], int) and (isinstance(instruction.args[0], int) or not is_reducible(instruction.args[1]))
+               for block in function.blocks for instruction in block.instructions):
+            self.scratch = slot()
+        return self._frame(slots)
+
+    def _frame(self, slots):
+        return 4 * slots
+
+    def _incoming(self, index):
+        return f'[EBP+{8 + 4 * index}]'
+
+    def _location(self, operand):
+        if isinstance(operand, int):
+            return str(operand)
+        return self.locations[operand]
+
+    def _move(self, destination, source):
+        if destination == source:
+            return
+        if is_memory(destination) and is_memory(source):
+            self.asm.write(f'MOV EAX, {source}')
+            source = 'EAX'
+        self.asm.write(f'MOV {sized(destination) if is_immediate(source) else destination}, {source}')
+
+    # Performs moves that all read their sources before any destination is
+    # written; a cycle of registers is broken through EAX.
+    def _parallel_move(self, moves):
+        pending = [(destination, source) for destination, source in moves if destination != source]
+        while pending:
+            sources = {source for _, source in pending}
+            ready = [move for move in pending if move[0] not in sources]
+            if not ready:
+                destination, source = pending[0]
+                self._move('EAX', source)
+                pending = [(other, 'EAX' if other_source == source else other_source) for other, other_source in pending]
+                continue
+            for destination, source in ready:
+                self._move(destination, source)
+            pending = [move for move in pending if move not in ready]
+
+    def _register(self, location):
+        if is_memory(location) or is_immediate(location):
+            self.asm.write(f'MOV EAX, {location}')
+            return 'EAX'
+        return location
+
+    def _compare(self, condition, left, right):
+        if is_immediate(left) and not is_immediate(right):
+            left, right, condition = right, left, MIRRORED_CONDITIONS[condition]
+        if is_immediate(left) or is_memory(left) and is_memory(right):
+            left = self._register(left)
+        self.asm.write(f'CMP {sized(left) if is_immediate(right) else left}, {right}')
+        return condition
+
+    def _instruction(self, instruction, following):
+        asm = self.asm
+        op, args = instruction.op, instruction.args
+        dest = None if instruction.dest is None else self._location(instruction.dest)
+        operands = [self._location(args[i]) for i in instruction.operand_indices()]
+
+        if op == 'copy':
+            self._move(dest, operands[0])
+        elif op in ARITHMETIC:
+            self._arithmetic(op, dest, *operands)
+        elif op in ('>', '<', '=='):
+            condition = self._compare(op, *operands)
+            asm.write(f'{SETS[condition]} DL')
+            self._set(dest)
+        elif op == '/':
+            self._divide(dest, *operands)
+        elif op == 'neg':
+            self._move(dest, operands[0])
+            asm.write(f'NEG {sized(dest)}')
+        elif op == 'not':
+            self._compare('==', operands[0], '0')
+            asm.write('SETE DL')
+            self._set(dest)
+        elif op == 'print':
+            self._move('EAX', operands[0])
+            asm.write('CALL PRINT_INT')
+        elif op == 'read':
+            asm.write('CALL READ_INT')
+            if dest is not None:
+                self._move(dest, 'EAX')
+        elif op == 'call':
+            self._save(instruction)
+            self._call(instruction, operands)
+            if dest is not None:
+                self._move(dest, 'EAX')
+            self._restore(instruction)
+        elif op == 'jump':
+            if args[0] != following:
+                asm.write(f'JMP {args[0]}')
+        elif op == 'branch':
+            condition = self._compare(args[0], *operands)
+            true_label, false_label = args[3], args[4]
+            if true_label == following:
+                asm.write(f'{JUMPS[NEGATED_CONDITIONS[condition]]} {false_label}')
+            else:
+                asm.write(f'{JUMPS[condition]} {true_label}')
+                if false_label != following:
+                    asm.write(f'JMP {false_label}')
+        elif op == 'return':
+            if operands:
+                self._move('EAX', operands[0])
+            self._return()
+        elif op == 'exit':
+            asm.write('JMP END_MAIN')
+        else:
+            raise ValueError(f'Cannot generate code for IR operation {op}')
+
+    def _enter(self):
+        self.asm.write('PUSH EBP')
+        self.asm.write('MOV EBP, ESP')
+
+    def _call(self, instruction, operands):
+        for operand in reversed(operands):
+            self.asm.write(f'PUSH {sized(operand)}')
+        self.asm.write(f'CALL {instruction.args[0]}')
+        if operands:
+            self.asm.write(f'ADD ESP, {4 * len(operands)}')
+
+    def _return(self):
+        self.asm.epilogue(self.function == 'main')
+
+    def _arithmetic(self, op, dest, left, right):
+        asm = self.asm
+        if is_memory(dest) and dest == right and op in COMMUTATIVE:
+            left, right = right, left
+        if is_memory(dest) and dest == left and op != '*' and not is_memory(right):
+            asm.write(f'{ARITHMETIC[op]} DWORD {dest}, {right}')
+            return
+        if not is_memory(dest) and dest != right:
+            work = dest
+            self._move(work, left)
+        elif not is_memory(dest) and op in COMMUTATIVE and dest != left:
+            work, right = dest, left
+        else:
+            work = 'EAX'
+            self._move(work, left)
+        if op == '*' and is_immediate(right):
+            multiply(asm, work, int(right))
+        else:
+            asm.write(f'{ARITHMETIC[op]} {work}, {right}')
+        self._move(dest, work)
+
+    # Constant divisors become shifts or a multiply by a magic number; the
+    # rest, and constant dividends, go through IDIV.
+    def _divide(self, dest, dividend, divisor):
+        asm = self.asm
+        if is_immediate(divisor) and not is_immediate(dividend) and is_reducible(int(divisor)):
+            if needs_multiply(int(divisor)):
+                divide_by_constant(asm, 'EDX', sized(dividend), int(divisor))
+                self._move(dest, 'EDX')
+            else:
+                work = 'EAX' if is_memory(dest) else dest
+                self._move(work, dividend)
+                divide_by_constant(asm, work, work, int(divisor))
+                self._move(dest, work)
+            return
+        asm.write(f'MOV EAX, {dividend}')
+        if is_immediate(divisor):
+            asm.write(f'MOV DWORD {self.scratch}, {divisor}')
+            divisor = self.scratch
+        asm.write('CDQ')
+        asm.write(f'IDIV {sized(divisor)}')
+        self._move(dest, 'EAX')
+
+    def _set(self, dest):
+        if is_memory(dest):
+            self.asm.write('MOVZX EAX, DL')
+            self._move(dest, 'EAX')
+        else:
+            self.asm.write(f'MOVZX {dest}, DL')
+
+    def _save(self, instruction):
+        for register in self.saved[instruction]:
+            self.asm.write(f'PUSH {register}')
+
+    def _restore(self, instruction):
+        for register in reversed(self.saved[instruction]):
+            self.asm.write(f'POP {register}')
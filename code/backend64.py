@@ -0,0 +1,62 @@
+from .backend import Backend, is_memory, is_immediate
+
+# Values stay 32-bit, so temporaries use the 32-bit halves of twelve
+# registers. The ones that carry no arguments come first, so they keep
+# their values while a call is set up.
+REGISTERS = ('EBX', 'R12D', 'R13D', 'R14D', 'R15D', 'R10D', 'R11D', 'ESI', 'EDI', 'ECX', 'R8D', 'R9D')
+# System V passes the first six arguments in these; the rest go on the
+# stack, eight bytes each.
+ARGUMENTS = ('EDI', 'ESI', 'EDX', 'ECX', 'R8D', 'R9D')
+
+def wide(register):
+    return register[:-1] if register.endswith('D') else 'R' + register[1:]
+
+# The IR code generator for x86-64 Linux. As on x86, callers keep their
+# live registers across calls, here in the frame, so the stack pointer
+# only moves for arguments past the sixth and stays 16-byte aligned at
+# every CALL.
+class Backend64(Backend):
+
+    registers = REGISTERS
+    frame_pointer = 'RBP'
+    stack_pointer = 'RSP'
+    save_in_frame = True
+
+    def _frame(self, slots):
+        return (4 * slots + 15) // 16 * 16
+
+    def _incoming(self, index):
+        if index < len(ARGUMENTS):
+            return ARGUMENTS[index]
+        return f'[RBP+{16 + 8 * (index - len(ARGUMENTS))}]'
+
+    def _enter(self):
+        self.asm.write('PUSH RBP')
+        self.asm.write('MOV RBP, RSP')
+
+    def _call(self, instruction, operands):
+        asm = self.asm
+        stack = operands[len(ARGUMENTS):]
+        padding = len(stack) % 2
+        if padding:
+            asm.write('SUB RSP, 8')
+        for operand in reversed(stack):
+            if is_memory(operand):
+                asm.write(f'MOV EAX, {operand}')
+                operand = 'EAX'
+            asm.write(f'PUSH {operand if is_immediate(operand) else wide(operand)}')
+        self._parallel_move(list(zip(ARGUMENTS, operands)))
+        asm.write(f'CALL {instruction.args[0]}')
+        if stack or padding:
+            asm.write(f'ADD RSP, {8 * (len(stack) + padding)}')
+
+    def _return(self):
+        self.asm.epilogue(self.function == 'main')
+
+    def _save(self, instruction):
+        for register, location in zip(self.saved[instruction], self.save_area):
+            self.asm.write(f'MOV {location}, {register}')
+
+    def _restore(self, instruction):
+        for register, location in zip(self.saved[instruction], self.save_area):
+            self.asm.write(f'MOV {register}, {location}')
@@ -0,0 +1,112 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'lua-compiler')
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+def compiler_version():
+    # Any change to the compiler's own sources invalidates every entry.
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for directory, names in ((os.path.join(root, 'code'), None), (root, ('main.py',))):
+        for name in sorted(names or os.listdir(directory)):
+            if name.endswith('.py'):
+                with open(os.path.join(directory, name), 'rb') as file:
+                    digest.update(name.encode())
+                    digest.update(file.read())
+    return digest.hexdigest()
+
+class Cache:
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory or os.environ.get('LUA_COMPILER_CACHE', DEFAULT_DIRECTORY)
+        self.max_size = max_size
+        self.version = compiler_version()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, source, flags):
+        digest = hashlib.sha256()
+        digest.update(self.version.encode())
+        digest.update(json.dumps(flags, sort_keys=True).encode())
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def load(self, key, suffixes=('.asm',)):
+        entries = []
+        for suffix in suffixes:
+            path = self._path(key, suffix)
+            try:
+                with open(path, 'rb') as file:
+                    entries.append(file.read())
+            except FileNotFoundError:
+                self._count('misses')
+                return None
+            os.utime(path)
+        self._count('hits')
+        return entries
+
+    def store(self, key, entries):
+        for suffix, data in entries.items():
+            self._write(self._path(key, suffix), data)
+        self.evict()
+
+    def _write(self, path, data):
+        # Written under a temporary name and renamed so that concurrent
+        # compilations never read a partial entry.
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _counters(self):
+        try:
+            with open(self._path('.stats', '.json'), 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {'hits': 0, 'misses': 0}
+
+    # Batch workers and daemon threads count at the same time, so the update
+    # holds an exclusive lock for as long as it reads and rewrites the file.
+    def _count(self, field):
+        with open(self._path('.stats', '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            counters = self._counters()
+            counters[field] += 1
+            self._write(self._path('.stats', '.json'), json.dumps(counters).encode())
+
+    def stats(self):
+        stats = self._counters()
+        entries = self._entries()
+        stats['entries'] = len(entries)
+        stats['size'] = sum(size for _, size, _ in entries)
+        return stats
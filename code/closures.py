@@ -0,0 +1,419 @@
+import re
+import sys
+import threading
+
+from .nodes import (
+    BinOpNode, IntValNode, UnOpNode, PrintNode, AssigmentNode, BlockNode,
+    IdentifierNode, NoOpNode, ReadNode, IfNode, WhileNode, VarDecNode,
+    ReturnNode, FuncDecNode, FuncCallNode, is_boolean
+)
+from .optimizer import Optimizer, divide, traps, wrap
+from .tree import is_pure
+
+SIGN = 0x80000000
+MASK = 0xFFFFFFFF
+NUMBER = re.compile(r'[+-]?(\d*)')
+SPACE = re.compile(r'\s*')
+
+# Returned by a body that overwrote its parameters for a tail call.
+TAIL = object()
+
+# Exit statuses of the native program killed by SIGFPE and SIGSEGV. Like
+# the native program, a program that ends this way loses the output still
+# in its buffer. SIGFPE comes from IDIV, on a zero divisor or INT_MIN / -1
+# with -1 computed at run time; a literal -1 divisor is a negation, which
+# wraps. Folding -1 into a literal is then what lets -O turn the trap into
+# a wrap. Output is flushed before each line of input is read, where the
+# native program flushes before each read of up to INPUT_SIZE bytes, which
+# differs only when a program is killed after reading part of its input.
+DIVISION_STATUS = 136
+OVERFLOW_STATUS = 139
+# The runtime's output buffer, flushed before a number is written when
+# fewer than 12 bytes of it are left.
+OUTPUT_SIZE = 65536
+
+# Python frames are much larger than the native ones, so programs run on a
+# thread of their own with room for deep recursion. The stack size is a
+# process-wide default, so threads are started one at a time while it is
+# changed.
+STACK_SIZE = 512 * 1024 * 1024
+RECURSION_LIMIT = 1000000
+STACK_LOCK = threading.Lock()
+
+# Division with the native program's traps, constant telling whether the
+# divisor is a literal.
+def idiv(a, b, constant=False):
+    if traps(a, b, constant):
+        raise ZeroDivisionError('division overflow' if b else 'division by zero')
+    return divide(a, b)
+
+# Closures over operand closures, for operands whose evaluation order does
+# not matter. Values are 32-bit and wrap like the generated code.
+OPERATORS = {
+    '+'     : lambda a, b: lambda f: ((a(f) + b(f) + SIGN) & MASK) - SIGN,
+    '-'     : lambda a, b: lambda f: ((a(f) - b(f) + SIGN) & MASK) - SIGN,
+    '*'     : lambda a, b: lambda f: ((a(f) * b(f) + SIGN) & MASK) - SIGN,
+    '/'     : lambda a, b: lambda f: ((idiv(a(f), b(f)) + SIGN) & MASK) - SIGN,
+    '>'     : lambda a, b: lambda f: int(a(f) > b(f)),
+    '<'     : lambda a, b: lambda f: int(a(f) < b(f)),
+    '=='    : lambda a, b: lambda f: int(a(f) == b(f)),
+    'and'   : lambda a, b: lambda f: a(f) & b(f),
+    'or'    : lambda a, b: lambda f: a(f) | b(f),
+}
+
+# The same with a constant right operand, the common case in loops.
+CONSTANT_OPERATORS = {
+    '+'     : lambda a, c: lambda f: ((a(f) + c + SIGN) & MASK) - SIGN,
+    '-'     : lambda a, c: lambda f: ((a(f) - c + SIGN) & MASK) - SIGN,
+    '*'     : lambda a, c: lambda f: ((a(f) * c + SIGN) & MASK) - SIGN,
+    '/'     : lambda a, c: lambda f: ((idiv(a(f), c, True) + SIGN) & MASK) - SIGN,
+    '>'     : lambda a, c: lambda f: int(a(f) > c),
+    '<'     : lambda a, c: lambda f: int(a(f) < c),
+    '=='    : lambda a, c: lambda f: int(a(f) == c),
+}
+
+CONDITIONS = {
+    '>'     : lambda a, b: lambda f: a(f) > b(f),
+    '<'     : lambda a, b: lambda f: a(f) < b(f),
+    '=='    : lambda a, b: lambda f: a(f) == b(f),
+}
+
+CONSTANT_CONDITIONS = {
+    '>'     : lambda a, c: lambda f: a(f) > c,
+    '<'     : lambda a, c: lambda f: a(f) < c,
+    '=='    : lambda a, c: lambda f: a(f) == c,
+}
+
+# Compiles the AST into nested Python closures and runs them in-process, as
+# a quick stand-in for assembling, linking and running the native program.
+# Every closure takes the frame of the running function, a list holding its
+# parameters and then its locals; names resolve to frame indices once, while
+# compiling. Statements return None, or the value of a return. Calls,
+# reads and scoping behave as in the generated code: arguments and operands
+# with side effects run right to left, functions only see their own
+# parameters and locals, and a function must be declared before it is used.
+class Closures:
+
+    def __init__(self, stdin=sys.stdin, stdout=sys.stdout):
+        self.stdin = stdin
+        self.stdout = stdout
+        self.buffer = ''
+        self.position = 0
+        self.scanned = 0
+        self.functions = {}
+        self.function = None
+        self.scopes = [{}]
+        self.slots = 0
+
+    # Returns a function that runs the program and returns what the top-level
+    # block returned, or None.
+    def compile(self, ast_root):
+        body = self._block(ast_root)
+        size = self.slots
+        return lambda: body([0] * size)
+
+    def _declare(self, name):
+        if name in self.scopes[-1]:
+            raise RuntimeError(f'Key {name} already created.')
+        self.scopes[-1][name] = self.slots
+        self.slots += 1
+        return self.scopes[-1][name]
+
+    def _variable(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise RuntimeError(f'Key {name} does not exist.')
+
+    def _block(self, node):
+        self.scopes.append({})
+        statements = [self._statement(child) for child in node.children]
+        statements = [statement for statement in statements if statement is not None]
+        self.scopes.pop()
+
+        if not statements:
+            return lambda f: None
+        if len(statements) == 1:
+            return statements[0]
+
+        def block(f):
+            for statement in statements:
+                result = statement(f)
+                if result is not None:
+                    return result
+        return block
+
+    def _statement(self, node):
+        if isinstance(node, VarDecNode):
+            value = (lambda f: 0) if node.expression is None else self._expression(node.expression)
+            return self._store(self._declare(node.identifier.value), value)
+        if isinstance(node, AssigmentNode):
+            value = self._expression(node.expression)
+            return self._store(self._variable(node.identifier.value), value)
+        if isinstance(node, PrintNode):
+            value, write = self._expression(node.expression), self.stdout.write
+            def statement(f):
+                write(f'{value(f)}\n')
+            return statement
+        if isinstance(node, FuncCallNode):
+            call = self._expression(node)
+            def statement(f):
+                call(f)
+            return statement
+        if isinstance(node, ReturnNode):
+            return self._return(node)
+        if isinstance(node, BlockNode):
+            return self._block(node)
+        if isinstance(node, IfNode):
+            return self._if(node)
+        if isinstance(node, WhileNode):
+            return self._while(node)
+        if isinstance(node, FuncDecNode):
+            self._function(node)
+            return None
+        if isinstance(node, NoOpNode):
+            return None
+        raise RuntimeError(f'Cannot run {type(node).__name__}.')
+
+    @staticmethod
+    def _store(index, value):
+        def store(f):
+            f[index] = value(f)
+        return store
+
+    def _if(self, node):
+        condition = self._condition(node.condition)
+        block = self._block(node.block)
+        if not node.else_block.children:
+            def statement(f):
+                if condition(f):
+                    return block(f)
+            return statement
+        else_block = self._block(node.else_block)
+        def statement(f):
+            if condition(f):
+                return block(f)
+            return else_block(f)
+        return statement
+
+    def _while(self, node):
+        condition = self._condition(node.condition)
+        block = self._block(node.block)
+        def statement(f):
+            while condition(f):
+                result = block(f)
+                if result is not None:
+                    return result
+        return statement
+
+    # A return of a call to the enclosing function overwrites the
+    # parameters and starts the body over, like the native tail call.
+    def _return(self, node):
+        expression = node.expression
+        if isinstance(expression, FuncCallNode) and expression.value == self.function:
+            _, count = self._callee(expression)
+            arguments = [self._expression(argument) for argument in reversed(expression.children)]
+            if count == 1:
+                argument = arguments[0]
+                def statement(f):
+                    f[0] = argument(f)
+                    return TAIL
+                return statement
+            if count == 2:
+                second, first = arguments
+                def statement(f):
+                    value = second(f)
+                    f[0] = first(f)
+                    f[1] = value
+                    return TAIL
+                return statement
+            def statement(f):
+                values = [argument(f) for argument in arguments]
+                values.reverse()
+                f[:count] = values
+                return TAIL
+            return statement
+        return self._expression(expression)
+
+    def _callee(self, node):
+        if node.value not in self.functions:
+            raise RuntimeError(f'Function {node.value} is not declared.')
+        cell, count = self.functions[node.value]
+        if count != len(node.children):
+            raise RuntimeError(f'Function {node.value} expects {count} arguments, {len(node.children)} given.')
+        return cell, count
+
+    # Functions are bound when the declaration is compiled, as the code
+    # generator does, so a function can call itself and any function
+    # declared before it.
+    def _function(self, node):
+        name = node.children[0].value
+        parameters = [parameter.identifier.value for parameter in node.children[1:-1]]
+        cell = [None]
+        self.functions[name] = (cell, len(parameters))
+
+        saved = self.function, self.scopes, self.slots
+        self.function, self.scopes, self.slots = name, [{}], 0
+        for parameter in parameters:
+            self._declare(parameter)
+        body = self._block(node.children[-1])
+        size = self.slots
+        self.function, self.scopes, self.slots = saved
+
+        padding = [0] * (size - len(parameters))
+        def invoke(arguments):
+            frame = arguments + padding
+            while True:
+                result = body(frame)
+                if result is not TAIL:
+                    return 0 if result is None else result
+        cell[0] = invoke
+
+    def _call(self, node):
+        cell, count = self._callee(node)
+        arguments = [self._expression(argument) for argument in reversed(node.children)]
+        if count == 0:
+            return lambda f: cell[0]([])
+        if count == 1:
+            argument = arguments[0]
+            return lambda f: cell[0]([argument(f)])
+        if count == 2:
+            second, first = arguments
+            def call(f):
+                value = second(f)
+                return cell[0]([first(f), value])
+            return call
+        def call(f):
+            values = [argument(f) for argument in arguments]
+            values.reverse()
+            return cell[0](values)
+        return call
+
+    def _read(self):
+        while True:
+            self.position = SPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                break
+            self.stdout.flush()
+            self.buffer, self.position = self.stdin.readline(), 0
+            if not self.buffer:
+                return self.scanned
+        # A sign is consumed even without digits after it, and a read that
+        # finds no digits leaves the previous value in place.
+        match = NUMBER.match(self.buffer, self.position)
+        self.position = match.end()
+        if match.group(1):
+            self.scanned = ((int(match.group()) + SIGN) & MASK) - SIGN
+        return self.scanned
+
+    # An if or while short-circuits and/or over boolean operands, as the
+    # code generators do, and tests any other value for nonzero.
+    def _condition(self, node, boolean=False):
+        if isinstance(node, UnOpNode) and node.value == 'not':
+            expression = self._condition(node.expression, boolean)
+            return lambda f: not expression(f)
+        if isinstance(node, UnOpNode):
+            return self._condition(node.expression, boolean)
+        if isinstance(node, BinOpNode) and node.value in ('and', 'or') and (boolean or is_boolean(node)):
+            left, right = self._condition(node.left, True), self._condition(node.right, True)
+            if node.value == 'and':
+                return lambda f: left(f) and right(f)
+            return lambda f: left(f) or right(f)
+        if isinstance(node, BinOpNode) and node.value in CONDITIONS and isinstance(node.right, IntValNode):
+            return CONSTANT_CONDITIONS[node.value](self._expression(node.left), node.right.value)
+        if isinstance(node, BinOpNode) and node.value in CONDITIONS and is_pure(node):
+            return CONDITIONS[node.value](self._expression(node.left), self._expression(node.right))
+        expression = self._expression(node)
+        return lambda f: expression(f) != 0
+
+    def _expression(self, node):
+        if isinstance(node, IntValNode):
+            value = node.value
+            return lambda f: value
+        if isinstance(node, IdentifierNode):
+            index = self._variable(node.value)
+            return lambda f: f[index]
+        if isinstance(node, ReadNode):
+            return lambda f: self._read()
+        if isinstance(node, FuncCallNode):
+            return self._call(node)
+        if isinstance(node, UnOpNode):
+            expression = self._expression(node.expression)
+            if node.value == '-':
+                return lambda f: ((SIGN - expression(f)) & MASK) - SIGN
+            if node.value == 'not':
+                return lambda f: 0 if expression(f) else 1
+            return expression
+        if isinstance(node, BinOpNode) and node.value in OPERATORS:
+            return self._binop(node)
+        raise RuntimeError(f'Cannot run {type(node).__name__} {node.value}.')
+
+    def _binop(self, node):
+        left, right = self._expression(node.left), self._expression(node.right)
+        if isinstance(node.right, IntValNode) and node.value in CONSTANT_OPERATORS:
+            return CONSTANT_OPERATORS[node.value](left, node.right.value)
+        if is_pure(node):
+            return OPERATORS[node.value](left, right)
+        # Calls and reads keep the right-to-left order of the generated code.
+        operator = idiv if node.value == '/' else Optimizer.binops[node.value]
+        def binop(f):
+            value = right(f)
+            return wrap(operator(left(f), value))
+        return binop
+
+# Holds output back the way the runtime's buffer does, so what a program
+# prints before it is killed is lost here too.
+class Output:
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        if self.size > OUTPUT_SIZE - 12:
+            self.flush()
+        self.parts.append(text)
+        self.size += len(text)
+
+    def flush(self):
+        if self.parts:
+            self.stream.write(''.join(self.parts))
+            self.stream.flush()
+            self.parts, self.size = [], 0
+
+# Compiles and runs a program, returning the exit status the native program
+# would have. Division by zero and running out of stack end the program the
+# way the matching signals end the native one.
+def execute(ast_root, stdin=sys.stdin, stdout=sys.stdout, log=sys.stderr):
+    outcome = []
+    output = Output(stdout)
+
+    def target():
+        try:
+            outcome.append(Closures(stdin, output).compile(ast_root)())
+        except BaseException as error:
+            outcome.append(error)
+
+    with STACK_LOCK:
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), RECURSION_LIMIT))
+        previous = threading.stack_size(STACK_SIZE)
+        try:
+            thread = threading.Thread(target=target)
+            thread.start()
+        finally:
+            threading.stack_size(previous)
+    thread.join()
+
+    result = outcome[0]
+    if isinstance(result, ZeroDivisionError):
+        print(f'error: {result}', file=log)
+        return DIVISION_STATUS
+    if isinstance(result, RecursionError):
+        print('error: stack overflow', file=log)
+        return OVERFLOW_STATUS
+    if isinstance(result, BaseException):
+        raise result
+    output.flush()
+    # Returning from the top-level block returns from main.
+    return 0 if result is None else result & 0xFF
@@ -0,0 +1,115 @@
+import io
+import sys
+
+from .syntactical import Parser
+from .optimizer import Optimizer
+from .evaluator import Evaluator
+from .deadcode import DeadCode
+from .peephole import Peephole
+from .asm import ASM, ASM64
+from .table import SymbolTable
+from .context import Context
+from .lowering import Lowering
+from .backend import Backend
+from .backend64 import Backend64
+from .nodes import VarDecNode, emit
+from .tree import check_declarations
+from . import passes
+
+# The runtime and the IR code generator for each --target. Only x86 has
+# the AST code generator, so the others always go through the IR.
+TARGETS = {'x86': (ASM, Backend), 'x86-64': (ASM64, Backend64)}
+
+class Options:
+
+    def __init__(self, optimize=False, inline_budget=24, inline_report=False, peephole_report=False, peephole=True, ir=False, dump_ir=False, loops=True, evaluation_budget=10000, target='x86'):
+        self.optimize = optimize
+        self.inline_budget = inline_budget
+        self.peephole = peephole
+        self.target = target
+        self.ir = ir or dump_ir or target != 'x86'
+        self.inline_report = inline_report
+        self.peephole_report = peephole_report
+        self.dump_ir = dump_ir
+        self.loops = loops
+        self.evaluation_budget = evaluation_budget
+
+    # The options that change the generated code, used as part of cache keys.
+    def flags(self):
+        if not self.optimize:
+            return {'optimize': False, 'ir': self.ir, 'target': self.target}
+        return {'optimize': True, 'inline_budget': self.inline_budget, 'peephole': self.peephole, 'ir': self.ir, 'loops': self.loops, 'evaluation_budget': self.evaluation_budget, 'target': self.target}
+
+# Parses the source and runs the AST passes that options ask for.
+def frontend(source, options, log=sys.stderr):
+    tree = Parser().run(source)
+    check_declarations(tree)
+    dead_code = DeadCode()
+    tree = dead_code.run(tree)
+    for warning in dead_code.warnings:
+        print(f'warning: {warning}', file=log)
+    if options.optimize:
+        evaluator = Evaluator(options.evaluation_budget) if options.evaluation_budget else None
+        optimizer = Optimizer(options.inline_budget, evaluator)
+        tree = optimizer.run(tree)
+        if options.inline_report:
+            for line in optimizer.inliner.report + (evaluator.report if evaluator else []):
+                print(line, file=log)
+        # Functions inlined at every call site are no longer called.
+        tree = DeadCode().run(tree)
+    return tree
+
+# Every piece of mutable state lives in objects created here, so several
+# compilations can run one after another, or in parallel threads, in the
+# same process.
+def compile(source, options=None, log=sys.stderr):
+    options = options or Options()
+    return codegen(frontend(source, options, log), options, log)
+
+# Writes the assembly for a tree returned by frontend().
+def codegen(tree, options, log=sys.stderr):
+    output = io.StringIO()
+    peephole = Peephole() if options.optimize and options.peephole else None
+    runtime, backend = TARGETS[options.target]
+    context = Context(runtime(output, peephole))
+    if options.ir:
+        program = Lowering().run(tree)
+        if options.optimize:
+            passes.optimize(program, options.loops)
+        if options.dump_ir:
+            print(program, file=log)
+        backend(context.asm).run(program)
+    else:
+        frame = tree.frame()
+        if frame:
+            context.asm.write(f'SUB ESP, {4 * frame}')
+        emit(tree.evaluate(SymbolTable(), context))
+    context.asm.end()
+    if peephole is not None and options.peephole_report:
+        for name, hits in peephole.hits.items():
+            print(f'peephole {name}: {hits}', file=log)
+    return output.getvalue()
+
+# Compiles one top-level statement at a time with the AST code generator
+# and writes its assembly to sink before parsing the next, so memory does
+# not grow with the length of the source, which may be a bytes-like
+# object such as a memory-mapped file. The passes over the whole tree
+# (dead code, -O and the IR) are skipped, so main's frame grows as its
+# locals are declared instead of being reserved up front.
+def compile_stream(source, sink):
+    context = Context(ASM(sink))
+    symbol_table = SymbolTable()
+    symbol_table.enter()
+    declared = reserved = 0
+    for statement in Parser().statements(source):
+        if isinstance(statement, VarDecNode):
+            declared += 1
+            deepest = declared
+        else:
+            deepest = declared + statement.frame()
+        if deepest > reserved:
+            context.asm.write(f'SUB ESP, {4 * (deepest - reserved)}')
+            reserved = deepest
+        emit(statement.evaluate(symbol_table, context))
+        context.asm.flush()
+    context.asm.end()
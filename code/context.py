@@ -0,0 +1,13 @@
+from .table import FuncTable
+
+class Context:
+
+    def __init__(self, asm):
+        self.asm = asm
+        self.label = 0
+        self.function = None
+        self.functions = FuncTable()
+
+    def new_label(self):
+        self.label += 1
+        return self.label
@@ -0,0 +1,184 @@
+from .nodes import (
+    AssigmentNode, BlockNode, IdentifierNode, IfNode, WhileNode, VarDecNode,
+    ReturnNode, FuncDecNode, FuncCallNode, PrintNode, NoOpNode
+)
+from .tree import walk, children, is_pure, trampoline
+
+def reads(node):
+    return {child.value for child in walk(node) if isinstance(child, IdentifierNode)}
+
+# Removes statements after a return, functions that no call reached from
+# the top-level block can get to, and stores whose value is never read.
+# Each removal is recorded in warnings, once per name and kind.
+class DeadCode:
+
+    def __init__(self):
+        self.warnings = []
+
+    def run(self, ast_root):
+        scopes = [('main', ast_root)] + [(node.children[0].value, node.children[-1]) for node in walk(ast_root) if isinstance(node, FuncDecNode)]
+        for scope, block in scopes:
+            self._unreachable(block, scope)
+        called = self._uncalled(ast_root)
+        for scope, block in scopes:
+            if scope == 'main' or scope in called:
+                # Dropping a store can leave the values it read unused.
+                while True:
+                    size = sum(1 for _ in walk(block))
+                    self._stores(block, scope)
+                    if sum(1 for _ in walk(block)) == size:
+                        break
+        return ast_root
+
+    def _warn(self, message):
+        if message not in self.warnings:
+            self.warnings.append(message)
+
+    # Whether a statement always returns, given the ids of the blocks
+    # nested in it that do.
+    def _terminates(self, node, returning):
+        if isinstance(node, ReturnNode):
+            return True
+        if isinstance(node, BlockNode):
+            return id(node) in returning
+        if isinstance(node, IfNode):
+            return id(node.block) in returning and id(node.else_block) in returning
+        return False
+
+    # Declarations after a return stay, since functions are declared when
+    # the code generator reaches them rather than when they run. Nested
+    # blocks are cut before the blocks around them, found with an explicit
+    # stack so deep nesting does not recurse.
+    def _unreachable(self, block, scope):
+        pending, stack = [], [block]
+        while stack:
+            block = stack.pop()
+            pending.append(block)
+            for statement in block.children:
+                stack.extend(statement.blocks())
+        returning = set()
+        for block in reversed(pending):
+            for index, statement in enumerate(block.children):
+                if self._terminates(statement, returning):
+                    rest = block.children[index + 1:]
+                    kept = [node for node in rest if isinstance(node, FuncDecNode)]
+                    if any(not isinstance(node, (FuncDecNode, NoOpNode)) for node in rest):
+                        self._warn(f'unreachable code after return in {scope}')
+                    block.children[index + 1:] = kept
+                    returning.add(id(block))
+                    break
+
+    # Calls made by a block, not counting the bodies of functions declared
+    # inside it.
+    def _calls(self, block):
+        stack = [block]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, FuncCallNode):
+                yield node.value
+            if not isinstance(node, FuncDecNode) or node is block:
+                stack.extend(children(node))
+
+    def _uncalled(self, ast_root):
+        declarations = {node.children[0].value: node for node in walk(ast_root) if isinstance(node, FuncDecNode)}
+        called, stack = set(), list(self._calls(ast_root))
+        while stack:
+            name = stack.pop()
+            if name not in called and name in declarations:
+                called.add(name)
+                stack.extend(self._calls(declarations[name].children[-1]))
+
+        for node in walk(ast_root):
+            if isinstance(node, BlockNode):
+                for child in node.children:
+                    if isinstance(child, FuncDecNode) and child.children[0].value not in called:
+                        self._warn(f'function {child.children[0].value} is never called')
+                node.children = [child for child in node.children if not isinstance(child, FuncDecNode) or child.children[0].value in called]
+        return called
+
+    # A store is dead when no path from it reads the variable before the
+    # next store or the end of the function. Dead stores of pure values are
+    # dropped and a call whose result is never read stays as a statement. A
+    # local that nothing reads loses its declaration too, unless a store to
+    # it must stay for the side effects of its value, which include a
+    # division that can trap.
+    def _stores(self, block, scope):
+        targets = {id(node.identifier) for node in walk(block) if isinstance(node, (VarDecNode, AssigmentNode))}
+        self.read = {node.value for node in walk(block) if isinstance(node, IdentifierNode) and id(node) not in targets}
+        self.needed = {node.identifier.value for node in walk(block) if isinstance(node, (VarDecNode, AssigmentNode))
+                       and node.expression is not None and not is_pure(node.expression) and not isinstance(node.expression, FuncCallNode)}
+        self.scope = scope
+        self.analysed = {}
+        trampoline(self._block(block, set(), True))
+
+    # A local declared in the block ends with it, so a variable of the same
+    # name from an enclosing block that is live after the block stays live
+    # across the declaration. Nested blocks go through trampoline(), so deep
+    # nesting does not recurse.
+    def _block(self, block, live, prune):
+        declared = {node.identifier.value for node in block.children if isinstance(node, VarDecNode)}
+        after = live & declared
+        statements = []
+        for statement in reversed(block.children):
+            if isinstance(statement, (BlockNode, IfNode, WhileNode)):
+                replacement, live = yield self._nested(statement, live, prune)
+            else:
+                replacement, live = self._statement(statement, live, prune)
+            if isinstance(statement, VarDecNode):
+                live |= after & {statement.identifier.value}
+            if replacement is not None:
+                statements.append(replacement)
+        if prune:
+            block.children = statements[::-1]
+        return live
+
+    def _statement(self, node, live, prune):
+        if isinstance(node, (VarDecNode, AssigmentNode)):
+            name, value = node.identifier.value, node.expression
+            used = set() if value is None else reads(value)
+            if name in live:
+                return node, (live - {name}) | used
+            unread = name not in self.read
+            if prune and (unread or isinstance(node, AssigmentNode)):
+                self._warn(f'local {name} in {self.scope} is never read' if unread else f'value assigned to {name} in {self.scope} is never read')
+            if isinstance(value, FuncCallNode) and (unread or isinstance(node, AssigmentNode)) and name not in self.needed:
+                return value, live | used
+            if name in self.needed or isinstance(value, FuncCallNode):
+                return node, (live - {name}) | used
+            if isinstance(node, VarDecNode) and not unread:
+                if prune:
+                    node.expression = None
+                return node, live - {name}
+            return None, live - {name}
+        if isinstance(node, (PrintNode, FuncCallNode)):
+            return node, live | reads(node)
+        if isinstance(node, ReturnNode):
+            return node, reads(node.expression)
+        return node, live
+
+    def _nested(self, node, live, prune):
+        if isinstance(node, BlockNode):
+            return node, (yield self._block(node, live, prune))
+        if isinstance(node, IfNode):
+            then_live = yield self._block(node.block, live, prune)
+            else_live = yield self._block(node.else_block, live, prune)
+            return node, then_live | else_live | reads(node.condition)
+        loop_live = live | reads(node.condition)
+        while True:
+            new = live | reads(node.condition) | (yield self._analyse(node.block, loop_live))
+            if new == loop_live:
+                break
+            loop_live = new
+        if prune:
+            yield self._block(node.block, loop_live, True)
+        return node, loop_live
+
+    # The live variables before a block, without pruning it. A loop repeats
+    # this until nothing changes, and so would every loop around it, which
+    # grows exponentially with nesting; the result for each block and live
+    # set is kept instead.
+    def _analyse(self, block, live):
+        key = (id(block), frozenset(live))
+        if key not in self.analysed:
+            self.analysed[key] = yield self._block(block, live, False)
+        return self.analysed[key]
@@ -0,0 +1,181 @@
+import argparse
+import io
+import mmap
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .compiler import compile, compile_stream, frontend, Options
+from .closures import execute
+from .encoder import Assembler
+from .cache import Cache, DEFAULT_MAX_SIZE
+
+def argument_parser(exit_on_error=True):
+    parser = argparse.ArgumentParser(prog='main.py', description='Compile a Lua subset to NASM x86 assembly.', exit_on_error=exit_on_error)
+    parser.add_argument('filenames', nargs='*', metavar='filename', help='Lua sources, or directories searched for *.lua; several are compiled in parallel')
+    parser.add_argument('-O', dest='optimize', action='store_true', help='run the AST optimisation passes before code generation')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes used for several files (default: one per CPU)')
+    parser.add_argument('--inline-budget', type=int, default=24, metavar='NODES', help='largest function body, in AST nodes, that -O inlines (default: 24)')
+    parser.add_argument('--inline-report', action='store_true', help='list the calls inlined or evaluated by -O on stderr')
+    parser.add_argument('--eval-budget', dest='evaluation_budget', type=int, default=10000, metavar='STEPS', help='steps -O may spend running a pure call with constant arguments at compile time; 0 disables (default: 10000)')
+    parser.add_argument('--no-peephole', dest='peephole', action='store_false', help='skip the peephole pass that -O runs over the instruction stream')
+    parser.add_argument('--peephole-report', action='store_true', help='print how often each peephole rule applied under -O on stderr')
+    parser.add_argument('--target', choices=('x86', 'x86-64'), default='x86', help='instruction set and calling convention: 32-bit cdecl, or x86-64 System V through the IR (default: x86)')
+    parser.add_argument('--ir', action='store_true', help='generate code through the three-address IR instead of straight from the AST')
+    parser.add_argument('--no-loop-passes', dest='loops', action='store_false', help='skip loop-invariant code motion and strength reduction under --ir -O')
+    parser.add_argument('--dump-ir', action='store_true', help='print the IR, after the -O passes, on stderr; implies --ir')
+    parser.add_argument('--stream', action='store_true', help='compile a memory-mapped source one top-level statement at a time, writing the assembly as it goes, so memory stays flat however large the input; plain x86 code generation only, without the cache or the dead code pass')
+    parser.add_argument('--run', action='store_true', help='run the programs in-process instead of writing assembly; the exit status is the last nonzero program status')
+    parser.add_argument('--object', metavar='PATH', help='also assemble the output into an ELF32 object file at PATH, caching it')
+    parser.add_argument('--assembler', choices=('nasm', 'builtin'), default='nasm', help='what --object assembles with: the nasm program, or the built-in x86 encoder (default: nasm)')
+    parser.add_argument('--no-cache', action='store_true', help='always compile, without reading or writing the compile cache')
+    parser.add_argument('--cache-dir', metavar='DIR', help='compile cache directory (default: $LUA_COMPILER_CACHE or ~/.cache/lua-compiler)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_SIZE, metavar='BYTES', help='evict least recently used entries above this size')
+    parser.add_argument('--cache-stats', action='store_true', help='print compile cache hits, misses and size on stderr')
+    parser.add_argument('--serve', action='store_true', help='run as a daemon answering compile requests on a Unix socket')
+    parser.add_argument('--socket', metavar='PATH', help='daemon socket (default: $LUA_COMPILER_SOCKET or /tmp/lua-compiler-UID.sock)')
+    return parser
+
+def build(filename, args, log=sys.stderr):
+    if args.stream:
+        build_stream(filename, args)
+        return
+    options = Options(args.optimize, args.inline_budget, args.inline_report, args.peephole_report, args.peephole, args.ir, args.dump_ir, args.loops, args.evaluation_budget, args.target)
+    # Reports are produced while compiling, so they bypass the cache.
+    cache = None if args.no_cache or args.inline_report or args.peephole_report or args.dump_ir else Cache(args.cache_dir, args.cache_size)
+
+    with open(filename, 'r') as file:
+        code = file.read()
+
+    # Warnings are kept with the assembly and shown again on a cache hit.
+    suffixes = ('.asm', '.log', '.o') if args.object else ('.asm', '.log')
+    flags = dict(options.flags(), assembler=args.assembler) if args.object else options.flags()
+    key = cache.key(code, flags) if cache else None
+    entries = cache.load(key, suffixes) if cache else None
+
+    asm_file = os.path.splitext(filename)[0] + '.asm'
+    if entries is None:
+        warnings = io.StringIO()
+        assembly = compile(code, options, warnings if cache else log).encode()
+        log.write(warnings.getvalue())
+        with open(asm_file, 'wb') as file:
+            file.write(assembly)
+        entries = [assembly, warnings.getvalue().encode()]
+        if args.object:
+            entries.append(assemble(asm_file, args))
+        if cache:
+            cache.store(key, dict(zip(suffixes, entries)))
+    else:
+        log.write(entries[1].decode())
+        with open(asm_file, 'wb') as file:
+            file.write(entries[0])
+        if args.object:
+            with open(args.object, 'wb') as file:
+                file.write(entries[2])
+
+# Compiles for --stream. The assembly goes to a temporary file that only
+# replaces the .asm once the whole source compiled.
+def build_stream(filename, args):
+    with open(filename, 'rb') as file:
+        # The map outlives the file; it is left to the garbage collector
+        # since the tokenizer of a failed compilation may still use it.
+        source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+    asm_file = os.path.splitext(filename)[0] + '.asm'
+    partial = asm_file + '.partial'
+    try:
+        with open(partial, 'w') as output:
+            compile_stream(source, output)
+    except BaseException:
+        os.remove(partial)
+        raise
+    os.replace(partial, asm_file)
+    if args.object:
+        assemble(asm_file, args)
+
+# Writes the object file for --object and returns its contents.
+def assemble(asm_file, args):
+    if args.assembler == 'builtin':
+        if args.target != 'x86':
+            raise ValueError(f'the built-in assembler only encodes x86, not {args.target}')
+        with open(asm_file, 'r') as file:
+            obj = Assembler().run(file.read())
+        with open(args.object, 'wb') as file:
+            file.write(obj)
+        return obj
+    subprocess.run(['nasm', '-f', 'elf64' if args.target == 'x86-64' else 'elf', '-o', args.object, asm_file], check=True)
+    with open(args.object, 'rb') as file:
+        return file.read()
+
+# Runs a program with the Python backend. -O and its options apply, so
+# the optimised tree can be checked against the plain one.
+def interpret(filename, args, log=sys.stderr, stdin=sys.stdin, stdout=sys.stdout):
+    options = Options(args.optimize, args.inline_budget, args.inline_report, evaluation_budget=args.evaluation_budget)
+    with open(filename, 'r') as file:
+        code = file.read()
+    status = execute(frontend(code, options, log), stdin, stdout, log)
+    stdout.flush()
+    return status
+
+def build_reporting(filename, args):
+    try:
+        build(filename, args)
+    except Exception as error:
+        return f'{filename}: {type(error).__name__}: {error}'
+
+def sources(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                yield from (os.path.join(directory, name) for name in sorted(names) if name.endswith('.lua'))
+        else:
+            yield path
+
+# Runs one main.py command line and returns its exit status. The daemon
+# calls this from several threads at once, so nothing here may touch
+# process-wide state such as the working directory or sys.stderr.
+def run(argv, cwd=None, log=sys.stderr, stdin=sys.stdin, stdout=sys.stdout):
+    parser = argument_parser(exit_on_error=False)
+    try:
+        args, unknown = parser.parse_known_args(argv)
+    except argparse.ArgumentError as error:
+        print(f'{parser.prog}: error: {error}', file=log)
+        return 2
+    if unknown:
+        print(f"{parser.prog}: error: unrecognized arguments: {' '.join(unknown)}", file=log)
+        return 2
+
+    if cwd is not None:
+        args.filenames = [os.path.join(cwd, path) for path in args.filenames]
+        args.object = args.object and os.path.join(cwd, args.object)
+        args.cache_dir = args.cache_dir and os.path.join(cwd, args.cache_dir)
+    filenames = list(sources(args.filenames))
+
+    if not filenames and not (args.cache_stats and not args.no_cache):
+        print(f'{parser.prog}: error: the following arguments are required: filename', file=log)
+        return 2
+    if args.stream and (args.optimize or args.ir or args.dump_ir or args.run or args.target != 'x86'):
+        print(f'{parser.prog}: error: --stream only works with the plain x86 code generator, not with -O, --ir, --dump-ir, --run or --target x86-64', file=log)
+        return 2
+    if len(filenames) > 1 and args.object:
+        print(f'{parser.prog}: error: --object takes a single input file', file=log)
+        return 2
+
+    if args.run:
+        statuses = [interpret(filename, args, log, stdin, stdout) for filename in filenames]
+        return next((status for status in reversed(statuses) if status), 0)
+
+    if len(filenames) == 1:
+        build(filenames[0], args, log)
+    elif filenames:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            errors = [error for error in executor.map(build_reporting, filenames, [args] * len(filenames), chunksize=4) if error]
+        for error in errors:
+            print(error, file=log)
+        if errors:
+            return 1
+
+    if args.cache_stats and not args.no_cache:
+        stats = Cache(args.cache_dir, args.cache_size).stats()
+        print(f"cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries, {stats['size']} bytes", file=log)
+    return 0
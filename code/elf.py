@@ -0,0 +1,101 @@
+import struct
+
+# Just enough of ELF32 for a relocatable i386 object: sections with
+# contents or reserved space, a symbol table and REL relocations.
+
+ET_REL = 1
+EM_386 = 3
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_NOBITS = 8
+SHT_REL = 9
+
+SHF_WRITE = 1
+SHF_ALLOC = 2
+SHF_EXECINSTR = 4
+
+STB_LOCAL = 0
+STB_GLOBAL = 1
+STT_NOTYPE = 0
+STT_SECTION = 3
+STT_FILE = 4
+SHN_ABS = 0xFFF1
+
+R_386_32 = 1
+R_386_PC32 = 2
+
+HEADER_SIZE = 52
+SECTION_HEADER_SIZE = 40
+
+class Strings:
+
+    def __init__(self):
+        self.data = bytearray(b'\0')
+        self.offsets = {'': 0}
+
+    def add(self, name):
+        offset = self.offsets.get(name)
+        if offset is None:
+            offset = self.offsets[name] = len(self.data)
+            self.data += name.encode() + b'\0'
+        return offset
+
+class ObjectFile:
+
+    def __init__(self, filename=''):
+        self.sections = []
+        self.names = Strings()
+        self.strings = Strings()
+        self.symbols = bytearray(16)
+        self.locals = 1
+        self.relocations = {}
+        self.section_symbols = {}
+        if filename:
+            self.symbol(filename, 0, SHN_ABS, kind=STT_FILE)
+
+    # Adds a section and returns its index. NOBITS sections take a size
+    # instead of contents.
+    def section(self, name, flags, contents=b'', size=None, kind=SHT_PROGBITS, align=4):
+        self.sections.append((name, kind, flags, bytes(contents), len(contents) if size is None else size, align))
+        self.section_symbols[len(self.sections)] = self.symbol('', 0, len(self.sections), kind=STT_SECTION)
+        return len(self.sections)
+
+    # Local symbols have to come before every global one.
+    def symbol(self, name, value, section, bind=STB_LOCAL, kind=STT_NOTYPE):
+        if bind == STB_LOCAL and self.locals * 16 != len(self.symbols):
+            raise ValueError(f'local symbol {name} after a global one')
+        self.symbols += struct.pack('<IIIBBH', self.strings.add(name), value, 0, bind << 4 | kind, 0, section)
+        if bind == STB_LOCAL:
+            self.locals += 1
+        return len(self.symbols) // 16 - 1
+
+    def relocate(self, section, offset, symbol, kind):
+        self.relocations.setdefault(section, bytearray()).extend(struct.pack('<II', offset, symbol << 8 | kind))
+
+    def bytes(self):
+        headers = [(0, 0, 0, 0, 0, 0, 0, 0, 0, 0)]
+        body = bytearray()
+
+        def place(contents, align):
+            body.extend(bytes(-(HEADER_SIZE + len(body)) % align))
+            offset = HEADER_SIZE + len(body)
+            body.extend(contents)
+            return offset
+
+        for name, kind, flags, contents, size, align in self.sections:
+            offset = place(contents, align) if kind != SHT_NOBITS else HEADER_SIZE + len(body)
+            headers.append((self.names.add(name), kind, flags, 0, offset, size, 0, 0, align, 0))
+        symbol_table = len(headers) + len(self.relocations)
+        for section, relocations in sorted(self.relocations.items()):
+            name = self.names.add('.rel' + self.sections[section - 1][0])
+            headers.append((name, SHT_REL, 0, 0, place(relocations, 4), len(relocations), symbol_table, section, 4, 8))
+        headers.append((self.names.add('.symtab'), SHT_SYMTAB, 0, 0, place(self.symbols, 4), len(self.symbols), symbol_table + 1, self.locals, 4, 16))
+        headers.append((self.names.add('.strtab'), SHT_STRTAB, 0, 0, place(self.strings.data, 1), len(self.strings.data), 0, 0, 1, 0))
+        name = self.names.add('.shstrtab')
+        headers.append((name, SHT_STRTAB, 0, 0, place(self.names.data, 1), len(self.names.data), 0, 0, 1, 0))
+
+        section_headers = place(b'', 4)
+        header = struct.pack('<4sBBBB8sHHIIIIIHHHHHH', b'\x7fELF', 1, 1, 1, 0, bytes(8), ET_REL, EM_386, 1, 0, 0, section_headers, 0, HEADER_SIZE, 0, 0, SECTION_HEADER_SIZE, len(headers), len(headers) - 1)
+        return header + body + b''.join(struct.pack('<10I', *fields) for fields in headers)
@@ -0,0 +1,616 @@
+import re
+import struct
+
+from .elf import ObjectFile, SHF_ALLOC, SHF_EXECINSTR, SHF_WRITE, SHT_NOBITS, STB_GLOBAL, R_386_32, R_386_PC32
+
+# Assembles the NASM text that ASM writes into an ELF32 relocatable object,
+# the same one 'nasm -f elf' would produce, without leaving the process.
+# It knows the instructions, operands and directives the code generators
+# and the runtime use; anything else is a ValueError naming the line.
+
+REGISTERS = {'EAX': 0, 'ECX': 1, 'EDX': 2, 'EBX': 3, 'ESP': 4, 'EBP': 5, 'ESI': 6, 'EDI': 7}
+BYTE_REGISTERS = {'AL': 0, 'CL': 1, 'DL': 2, 'BL': 3, 'AH': 4, 'CH': 5, 'DH': 6, 'BH': 7}
+SIZES = {'BYTE': 1, 'DWORD': 4}
+SCALES = {1: 0, 2: 1, 4: 2, 8: 3}
+
+CONDITIONS = {
+    'O': 0, 'NO': 1, 'B': 2, 'C': 2, 'NAE': 2, 'AE': 3, 'NB': 3, 'NC': 3,
+    'E': 4, 'Z': 4, 'NE': 5, 'NZ': 5, 'BE': 6, 'NA': 6, 'A': 7, 'NBE': 7,
+    'S': 8, 'NS': 9, 'P': 10, 'PE': 10, 'NP': 11, 'PO': 11,
+    'L': 12, 'NGE': 12, 'GE': 13, 'NL': 13, 'LE': 14, 'NG': 14, 'G': 15, 'NLE': 15,
+}
+
+# The /digit that selects the operation in each instruction group.
+ARITHMETIC = {'ADD': 0, 'OR': 1, 'ADC': 2, 'SBB': 3, 'AND': 4, 'SUB': 5, 'XOR': 6, 'CMP': 7}
+UNARY = {'NOT': 2, 'NEG': 3, 'MUL': 4, 'IMUL': 5, 'DIV': 6, 'IDIV': 7}
+SHIFTS = {'SHL': 4, 'SAL': 4, 'SHR': 5, 'SAR': 7}
+SIMPLE = {'RET': b'\xc3', 'CDQ': b'\x99', 'NOP': b'\x90'}
+
+DATA = {'DB': 1, 'DD': 4}
+RESERVE = {'RESB': 1, 'RESD': 4}
+STORAGE = {'TIMES', *DATA, *RESERVE}
+
+SECTIONS = ('.text', '.data', '.bss')
+FLAGS = {'.text': SHF_ALLOC | SHF_EXECINSTR, '.data': SHF_ALLOC | SHF_WRITE, '.bss': SHF_ALLOC | SHF_WRITE}
+
+TOKEN = re.compile(r"'[^']*'|[+\-*]|[^+\-*\s']+")
+MEMORY = re.compile(r'(?:(\w+)\s*)?\[(.*)\]$')
+LABEL = re.compile(r'[A-Za-z_.$?][\w.$?@#~]*')
+EQU = re.compile(r'\s*([A-Za-z_.$?][\w.$?@#~]*)\s+equ\s+(.*)$', re.IGNORECASE)
+
+# Branch sizes once the target is known to be within a signed byte, and
+# when it is not.
+SHORT = 2
+LONG = {'JMP': 5, 'CALL': 5}
+
+class Register:
+    __slots__ = ('number', 'size')
+
+    def __init__(self, number, size):
+        self.number = number
+        self.size = size
+
+class Immediate:
+    __slots__ = ('value', 'symbol', 'size')
+
+    def __init__(self, value, symbol, size=None):
+        self.value = value
+        self.symbol = symbol
+        self.size = size
+
+class Memory:
+    __slots__ = ('base', 'index', 'scale', 'displacement', 'symbol', 'size')
+
+    def __init__(self, base, index, scale, displacement, symbol, size):
+        self.base = base
+        self.index = index
+        self.scale = scale
+        self.displacement = displacement
+        self.symbol = symbol
+        self.size = size
+
+def signed(value, bits=32):
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+def fits_byte(value):
+    return -128 <= value <= 127
+
+def split_operands(text):
+    if "'" not in text:
+        return [operand.strip() for operand in text.split(',')]
+    operands, current, quoted = [], '', False
+    for character in text:
+        if character == "'":
+            quoted = not quoted
+        if character == ',' and not quoted:
+            operands.append(current.strip())
+            current = ''
+        else:
+            current += character
+    return operands + [current.strip()]
+
+def strip_comment(line):
+    if "'" not in line:
+        return line.partition(';')[0].strip()
+    quoted = False
+    for position, character in enumerate(line):
+        if character == "'":
+            quoted = not quoted
+        elif character == ';' and not quoted:
+            return line[:position].strip()
+    return line.strip()
+
+class Assembler:
+
+    def __init__(self):
+        self.constants = {}
+        self.operands = {}
+        self.encodings = {}
+        self.section = '.text'
+        # Text is a list of pieces, each some fixed code followed by a
+        # branch whose size is only known once labels have addresses.
+        self.pieces = [[bytearray(), [], None]]
+        self.data = bytearray()
+        self.bss = 0
+        self.labels = {}
+        self.globals = []
+        self.externs = []
+
+    def run(self, source):
+        lines = source.splitlines()
+        self._constants(lines)
+        for number, line in enumerate(lines, 1):
+            try:
+                self._line(strip_comment(line))
+            except (ValueError, KeyError) as error:
+                raise ValueError(f'line {number}: {error}: {line.strip()}') from None
+        return self._object()
+
+    # equ constants may be used before the line defining them.
+    def _constants(self, lines):
+        for line in lines:
+            if 'equ' not in line and 'EQU' not in line:
+                continue
+            match = EQU.match(strip_comment(line))
+            if match:
+                self.constants[match.group(1)] = self._value(match.group(2))
+
+    def _line(self, line):
+        if not line:
+            return
+        # Most lines repeat one already encoded.
+        encoding = self.encodings.get(line)
+        if encoding is not None and self.section == '.text':
+            self._append(encoding)
+            return
+        label, colon, rest = line.partition(':')
+        if colon and LABEL.fullmatch(label):
+            self._label(label)
+            line = rest.strip()
+            if not line:
+                return
+        words = line.split(None, 2)
+        keyword = words[0].upper()
+        if keyword in ('SECTION', 'SEGMENT'):
+            self.section = words[1]
+            if self.section not in SECTIONS:
+                raise ValueError(f'unknown section {self.section}')
+        elif keyword == 'GLOBAL':
+            self.globals.extend(name.strip() for name in line.split(None, 1)[1].split(','))
+        elif keyword == 'EXTERN':
+            self.externs.extend(name.strip() for name in line.split(None, 1)[1].split(','))
+        elif len(words) > 1 and words[1].upper() == 'EQU':
+            return
+        elif len(words) > 1 and words[1].upper() in STORAGE:
+            self._label(words[0])
+            self._data(line.split(None, 1)[1])
+        elif keyword in STORAGE:
+            self._data(line)
+        elif self.section != '.text':
+            raise ValueError('instruction outside .text')
+        else:
+            self._instruction(line)
+
+    def _label(self, name):
+        if name in self.labels:
+            raise ValueError(f'label {name} redefined')
+        if self.section == '.text':
+            piece = self.pieces[-1]
+            self.labels[name] = ('.text', len(self.pieces) - 1, len(piece[0]))
+        elif self.section == '.data':
+            self.labels[name] = ('.data', 0, len(self.data))
+        else:
+            self.labels[name] = ('.bss', 0, self.bss)
+
+    def _data(self, line):
+        words = line.split(None, 1)
+        keyword = words[0].upper()
+        count = 1
+        if keyword == 'TIMES':
+            count, line = line.split(None, 2)[1:]
+            count = self._value(count)
+            words = line.split(None, 1)
+            keyword = words[0].upper()
+        if keyword in RESERVE:
+            if self.section != '.bss':
+                raise ValueError(f'{keyword} outside .bss')
+            self.bss += count * RESERVE[keyword] * self._value(words[1])
+            return
+        if self.section != '.data':
+            raise ValueError(f'{keyword} outside .data')
+        size = DATA[keyword]
+        item = bytearray()
+        for operand in split_operands(words[1]):
+            if size == 1 and len(operand) > 3 and operand[0] == operand[-1] == "'":
+                item += operand[1:-1].encode()
+            else:
+                item += (self._value(operand) & (1 << 8 * size) - 1).to_bytes(size, 'little')
+        self.data += item * count
+
+    # Splits an expression into its terms: the sum of the plain numbers, a
+    # symbol to relocate against, and (register, scale) pairs.
+    def _terms(self, text):
+        value, symbol, registers = 0, None, []
+        tokens = TOKEN.findall(text)
+        sign = 1
+        position = 0
+        while position < len(tokens):
+            token = tokens[position]
+            position += 1
+            if token == '+':
+                continue
+            if token == '-':
+                sign = -sign
+                continue
+            factors = [token]
+            while position + 1 < len(tokens) and tokens[position] == '*':
+                factors.append(tokens[position + 1])
+                position += 2
+            product, register, name = sign, None, None
+            for factor in factors:
+                if factor.upper() in REGISTERS:
+                    if register is not None:
+                        raise ValueError('register times register')
+                    register = REGISTERS[factor.upper()]
+                elif factor[0] == "'":
+                    product *= int.from_bytes(factor[1:-1].encode(), 'little')
+                elif factor[0].isdigit():
+                    product *= int(factor, 16) if factor[:2].lower() == '0x' else int(factor)
+                elif factor in self.constants:
+                    product *= self.constants[factor]
+                else:
+                    name = factor
+            if name is not None:
+                if len(factors) > 1 or sign < 0 or symbol is not None:
+                    raise ValueError(f'cannot relocate {text}')
+                symbol = name
+            elif register is not None:
+                registers.append((register, product, len(factors) > 1))
+            else:
+                value += product
+            sign = 1
+        return value, symbol, registers
+
+    def _value(self, text):
+        value, symbol, registers = self._terms(text)
+        if symbol is not None or registers:
+            raise ValueError(f'{text} is not a constant')
+        return value
+
+    def _operand(self, text):
+        operand = self.operands.get(text)
+        if operand is None:
+            operand = self.operands[text] = self._parse_operand(text)
+        return operand
+
+    def _parse_operand(self, text):
+        upper = text.upper()
+        if upper in REGISTERS:
+            return Register(REGISTERS[upper], 4)
+        if upper in BYTE_REGISTERS:
+            return Register(BYTE_REGISTERS[upper], 1)
+        match = MEMORY.match(text)
+        if match:
+            size = match.group(1) and SIZES[match.group(1).upper()]
+            displacement, symbol, registers = self._terms(match.group(2))
+            return Memory(*self._address_registers(registers), signed(displacement), symbol, size)
+        size = None
+        word, _, rest = text.partition(' ')
+        if word.upper() in SIZES:
+            size, text = SIZES[word.upper()], rest
+        value, symbol, registers = self._terms(text)
+        if registers:
+            raise ValueError(f'invalid operand {text}')
+        return Immediate(value, symbol, size)
+
+    # Picks the base and the scaled index out of the registers in an
+    # address, as NASM does.
+    @staticmethod
+    def _address_registers(registers):
+        base, index, scale = None, None, 1
+        for register, factor, scaled in registers:
+            if factor == 1 and not scaled and base is None:
+                base = register
+            elif index is None and factor in SCALES:
+                index, scale = register, factor
+            else:
+                raise ValueError('invalid effective address')
+        if index == REGISTERS['ESP']:
+            if scale != 1 or base == index:
+                raise ValueError('ESP cannot be an index')
+            base, index = index, base
+        return base, index, scale
+
+    def _instruction(self, line):
+        mnemonic, _, rest = line.partition(' ')
+        mnemonic = mnemonic.upper()
+        rest = rest.strip()
+        if (mnemonic in LONG or mnemonic[0] == 'J' and mnemonic[1:] in CONDITIONS) and LABEL.fullmatch(rest) and rest.upper() not in REGISTERS:
+            self.pieces[-1][2] = (mnemonic, rest)
+            self.pieces.append([bytearray(), [], None])
+            return
+        operands = [self._operand(operand) for operand in split_operands(rest)] if rest else []
+        encoding = self.encodings[line] = self._encode(mnemonic, operands)
+        self._append(encoding)
+
+    def _append(self, encoding):
+        code, relocations = encoding
+        piece = self.pieces[-1]
+        for offset, symbol, kind in relocations:
+            piece[1].append((len(piece[0]) + offset, symbol, kind))
+        piece[0] += code
+
+    # The ModRM byte for operand, with the SIB byte and displacement it
+    # needs, and where in them a symbol's address goes, if anywhere.
+    @staticmethod
+    def _address(digit, operand):
+        if isinstance(operand, Register):
+            return bytes((0xC0 | digit << 3 | operand.number,)), None
+        if not isinstance(operand, Memory):
+            raise ValueError('invalid combination of operands')
+        base, index, displacement = operand.base, operand.index, operand.displacement
+        if base is None and index is None:
+            return struct.pack('<Bi', digit << 3 | 5, displacement), 1
+        if base is None:
+            head = bytes((digit << 3 | 4, SCALES[operand.scale] << 6 | index << 3 | 5))
+            return head + struct.pack('<i', displacement), 2
+        if operand.symbol is not None or not fits_byte(displacement):
+            mode = 2
+        elif displacement or base == REGISTERS['EBP']:
+            mode = 1
+        else:
+            mode = 0
+        if index is None and base != REGISTERS['ESP']:
+            head = bytes((mode << 6 | digit << 3 | base,))
+        else:
+            index = 4 if index is None else index
+            head = bytes((mode << 6 | digit << 3 | 4, SCALES[operand.scale] << 6 | index << 3 | base))
+        if mode == 1:
+            return head + struct.pack('<b', displacement), None
+        if mode == 2:
+            return head + struct.pack('<i', displacement), len(head)
+        return head, None
+
+    # Opcode, then the ModRM bytes for operand when there is one, then the
+    # immediate in size bytes.
+    def _emit(self, opcode, digit=0, operand=None, immediate=None, size=0):
+        code = bytearray(opcode)
+        relocations = []
+        if operand is not None:
+            address, displacement = self._address(digit, operand)
+            if displacement is not None and operand.symbol is not None:
+                relocations.append((len(code) + displacement, operand.symbol, R_386_32))
+            code += address
+        if immediate is not None:
+            if immediate.symbol is not None:
+                if size != 4:
+                    raise ValueError('a symbol needs a 32-bit field')
+                relocations.append((len(code), immediate.symbol, R_386_32))
+            code += (immediate.value & (1 << 8 * size) - 1).to_bytes(size, 'little')
+        return bytes(code), relocations
+
+    @staticmethod
+    def _size(*operands):
+        sizes = {operand.size for operand in operands if operand.size}
+        if not sizes:
+            raise ValueError('operation size not specified')
+        if len(sizes) > 1:
+            raise ValueError('mismatch in operand sizes')
+        return sizes.pop()
+
+    @staticmethod
+    def _accumulator(operand):
+        return isinstance(operand, Register) and operand.number == 0
+
+    @staticmethod
+    def _absolute(operand):
+        return isinstance(operand, Memory) and operand.base is None and operand.index is None
+
+    @staticmethod
+    def _offset(memory):
+        return Immediate(memory.displacement, memory.symbol)
+
+    @staticmethod
+    def _short(immediate):
+        return immediate.symbol is None and fits_byte(signed(immediate.value))
+
+    def _encode(self, mnemonic, operands):
+        count = len(operands)
+        if mnemonic in SIMPLE and count == 0:
+            return SIMPLE[mnemonic], []
+        if mnemonic in ARITHMETIC and count == 2:
+            target, source = operands
+            digit = ARITHMETIC[mnemonic]
+            wide = self._size(*operands) == 4
+            if isinstance(source, Immediate):
+                if not wide:
+                    return self._emit(b'\x80', digit, target, source, 1)
+                if self._short(source):
+                    return self._emit(b'\x83', digit, target, source, 1)
+                if self._accumulator(target):
+                    return self._emit(bytes((digit << 3 | 5,)), immediate=source, size=4)
+                return self._emit(b'\x81', digit, target, source, 4)
+            if isinstance(source, Register):
+                return self._emit(bytes((digit << 3 | wide,)), source.number, target)
+            if isinstance(target, Register):
+                return self._emit(bytes((digit << 3 | 2 | wide,)), target.number, source)
+        elif mnemonic == 'MOV' and count == 2:
+            target, source = operands
+            size = self._size(*operands)
+            wide = size == 4
+            if isinstance(source, Immediate):
+                if isinstance(target, Register):
+                    return self._emit(bytes(((0xB8 if wide else 0xB0) + target.number,)), immediate=source, size=size)
+                return self._emit(b'\xc7' if wide else b'\xc6', 0, target, source, size)
+            # The accumulator has shorter forms for absolute addresses.
+            if self._accumulator(source) and self._absolute(target):
+                return self._emit(b'\xa3' if wide else b'\xa2', immediate=self._offset(target), size=4)
+            if self._accumulator(target) and self._absolute(source):
+                return self._emit(b'\xa1' if wide else b'\xa0', immediate=self._offset(source), size=4)
+            if isinstance(source, Register):
+                return self._emit(b'\x89' if wide else b'\x88', source.number, target)
+            if isinstance(target, Register):
+                return self._emit(b'\x8b' if wide else b'\x8a', target.number, source)
+        elif mnemonic == 'TEST' and count == 2:
+            target, source = operands
+            wide = self._size(*operands) == 4
+            if isinstance(source, Immediate):
+                return self._emit(b'\xf7' if wide else b'\xf6', 0, target, source, 4 if wide else 1)
+            if isinstance(target, Register) and not isinstance(source, Register):
+                target, source = source, target
+            if isinstance(source, Register):
+                return self._emit(b'\x85' if wide else b'\x84', source.number, target)
+        elif mnemonic == 'XCHG' and count == 2:
+            target, source = operands
+            wide = self._size(*operands) == 4
+            if not isinstance(source, Register):
+                target, source = source, target
+            if wide and isinstance(target, Register) and (self._accumulator(target) or self._accumulator(source)):
+                return bytes((0x90 + target.number + source.number,)), []
+            if isinstance(source, Register):
+                return self._emit(b'\x87' if wide else b'\x86', source.number, target)
+        elif mnemonic == 'LEA' and count == 2:
+            target, source = operands
+            if isinstance(target, Register) and target.size == 4 and isinstance(source, Memory):
+                return self._emit(b'\x8d', target.number, source)
+        elif mnemonic in ('MOVZX', 'MOVSX') and count == 2:
+            target, source = operands
+            if isinstance(target, Register) and target.size == 4 and source.size == 1:
+                return self._emit(b'\x0f\xb6' if mnemonic == 'MOVZX' else b'\x0f\xbe', target.number, source)
+        elif mnemonic == 'IMUL' and count in (2, 3):
+            target, source = operands[:2]
+            immediate = operands[2] if count == 3 else None
+            # IMUL reg, imm is IMUL reg, reg, imm.
+            if count == 2 and isinstance(source, Immediate):
+                source, immediate = target, source
+            if isinstance(target, Register) and target.size == 4 and self._size(target, source) == 4:
+                if immediate is None:
+                    return self._emit(b'\x0f\xaf', target.number, source)
+                if self._short(immediate):
+                    return self._emit(b'\x6b', target.number, source, immediate, 1)
+                return self._emit(b'\x69', target.number, source, immediate, 4)
+        elif mnemonic in UNARY and count == 1:
+            wide = self._size(*operands) == 4
+            return self._emit(b'\xf7' if wide else b'\xf6', UNARY[mnemonic], operands[0])
+        elif mnemonic in ('INC', 'DEC') and count == 1:
+            operand = operands[0]
+            digit = mnemonic == 'DEC'
+            if isinstance(operand, Register) and operand.size == 4:
+                return bytes((0x40 | digit << 3 | operand.number,)), []
+            wide = self._size(operand) == 4
+            return self._emit(b'\xff' if wide else b'\xfe', digit, operand)
+        elif mnemonic == 'PUSH' and count == 1:
+            operand = operands[0]
+            if isinstance(operand, Register) and operand.size == 4:
+                return bytes((0x50 + operand.number,)), []
+            if isinstance(operand, Immediate):
+                if self._short(operand):
+                    return self._emit(b'\x6a', immediate=operand, size=1)
+                return self._emit(b'\x68', immediate=operand, size=4)
+            if isinstance(operand, Memory) and operand.size in (None, 4):
+                return self._emit(b'\xff', 6, operand)
+        elif mnemonic == 'POP' and count == 1:
+            operand = operands[0]
+            if isinstance(operand, Register) and operand.size == 4:
+                return bytes((0x58 + operand.number,)), []
+            if isinstance(operand, Memory) and operand.size in (None, 4):
+                return self._emit(b'\x8f', 0, operand)
+        elif mnemonic in SHIFTS and count == 2:
+            target, amount = operands
+            wide = self._size(target) == 4
+            if isinstance(amount, Immediate) and amount.symbol is None:
+                if amount.value == 1:
+                    return self._emit(b'\xd1' if wide else b'\xd0', SHIFTS[mnemonic], target)
+                return self._emit(b'\xc1' if wide else b'\xc0', SHIFTS[mnemonic], target, amount, 1)
+            if isinstance(amount, Register) and amount.size == 1 and amount.number == BYTE_REGISTERS['CL']:
+                return self._emit(b'\xd3' if wide else b'\xd2', SHIFTS[mnemonic], target)
+        elif mnemonic[:3] == 'SET' and mnemonic[3:] in CONDITIONS and count == 1:
+            if operands[0].size in (None, 1):
+                return self._emit(bytes((0x0F, 0x90 | CONDITIONS[mnemonic[3:]])), 0, operands[0])
+        elif mnemonic in ('CALL', 'JMP') and count == 1:
+            if operands[0].size in (None, 4):
+                return self._emit(b'\xff', 2 if mnemonic == 'CALL' else 4, operands[0])
+        elif mnemonic == 'INT' and count == 1 and isinstance(operands[0], Immediate):
+            return self._emit(b'\xcd', immediate=operands[0], size=1)
+        raise ValueError(f'unsupported instruction {mnemonic}')
+
+    # Gives every branch to a label in .text the short form, then makes
+    # long the ones whose target is out of reach until nothing changes.
+    # Growing a branch only moves targets further away, so this ends.
+    def _layout(self):
+        long = []
+        for _, _, branch in self.pieces:
+            local = branch is not None and self.labels.get(branch[1], ('',))[0] == '.text'
+            long.append(branch is not None and (branch[0] == 'CALL' or not local))
+        while True:
+            starts = self._starts(long)
+            changed = False
+            for number, (code, _, branch) in enumerate(self.pieces):
+                if branch is None or long[number]:
+                    continue
+                _, piece, offset = self.labels[branch[1]]
+                if not fits_byte(starts[piece] + offset - (starts[number] + len(code) + SHORT)):
+                    long[number] = changed = True
+            if not changed:
+                return long, starts
+
+    def _starts(self, long):
+        starts = []
+        address = 0
+        for (code, _, branch), is_long in zip(self.pieces, long):
+            starts.append(address)
+            address += len(code)
+            if branch is not None:
+                address += LONG.get(branch[0], 6) if is_long else SHORT
+        return starts
+
+    def _address_of(self, name, starts):
+        section, piece, offset = self.labels[name]
+        return section, starts[piece] + offset if section == '.text' else offset
+
+    def _text(self):
+        long, starts = self._layout()
+        text = bytearray()
+        relocations = []
+        for (code, fixed, branch), is_long in zip(self.pieces, long):
+            relocations.extend((len(text) + offset, symbol, kind) for offset, symbol, kind in fixed)
+            text += code
+            if branch is None:
+                continue
+            mnemonic, label = branch
+            if mnemonic == 'JMP':
+                opcode = b'\xe9' if is_long else b'\xeb'
+            elif mnemonic == 'CALL':
+                opcode = b'\xe8'
+            else:
+                condition = CONDITIONS[mnemonic[1:]]
+                opcode = bytes((0x0F, 0x80 | condition)) if is_long else bytes((0x70 | condition,))
+            text += opcode
+            end = len(text) + (4 if is_long else 1)
+            if self.labels.get(label, ('',))[0] == '.text':
+                _, target = self._address_of(label, starts)
+                text += struct.pack('<i' if is_long else '<b', target - end)
+            else:
+                relocations.append((len(text), label, R_386_PC32))
+                text += struct.pack('<i', -4)
+        return text, relocations, starts
+
+    def _object(self):
+        text, relocations, starts = self._text()
+        # References to labels defined here relocate against their section,
+        # with the label's offset added to the field, as NASM does.
+        targets = []
+        for offset, symbol, kind in relocations:
+            if symbol in self.labels:
+                section, value = self._address_of(symbol, starts)
+                field = struct.unpack_from('<i', text, offset)[0] + value
+                struct.pack_into('<I', text, offset, field & 0xFFFFFFFF)
+                targets.append((offset, section, kind))
+            elif symbol in self.externs:
+                targets.append((offset, symbol, kind))
+            else:
+                raise ValueError(f'symbol {symbol} is not defined')
+
+        elf = ObjectFile()
+        sections = {
+            '.text': elf.section('.text', FLAGS['.text'], text, align=16),
+            '.data': elf.section('.data', FLAGS['.data'], self.data),
+            '.bss': elf.section('.bss', FLAGS['.bss'], size=self.bss, kind=SHT_NOBITS),
+        }
+        symbols = {name: elf.section_symbols[index] for name, index in sections.items()}
+        exported = set(self.globals)
+        for name in self.labels:
+            if name not in exported:
+                section, value = self._address_of(name, starts)
+                elf.symbol(name, value, sections[section])
+        for name in self.globals:
+            if name not in self.labels:
+                raise ValueError(f'global symbol {name} is not defined')
+            section, value = self._address_of(name, starts)
+            elf.symbol(name, value, sections[section], STB_GLOBAL)
+        for name in self.externs:
+            symbols[name] = elf.symbol(name, 0, 0, STB_GLOBAL)
+        for offset, target, kind in targets:
+            elf.relocate(sections['.text'], offset, symbols[target], kind)
+        return elf.bytes()
@@ -0,0 +1,194 @@
+from .nodes import (
+    BinOpNode, IntValNode, UnOpNode, PrintNode, AssigmentNode, BlockNode,
+    IdentifierNode, ReadNode, IfNode, WhileNode, VarDecNode, ReturnNode,
+    FuncDecNode, FuncCallNode, NoOpNode, is_boolean
+)
+from .tree import walk
+from .optimizer import Optimizer, traps, wrap
+
+# Non-tail calls nest the interpreter's own Python frames.
+DEPTH = 64
+
+# Functions that neither print, read nor declare other functions, and only
+# call functions of the same kind. Locals and parameters are all a function
+# can see, so the result of a call depends on its arguments alone.
+def pure_functions(ast_root):
+    declarations = {}
+    for node in walk(ast_root):
+        if isinstance(node, FuncDecNode):
+            declarations.setdefault(node.children[0].value, []).append(node)
+    functions = {name: nodes[0] for name, nodes in declarations.items() if len(nodes) == 1}
+
+    calls = {}
+    for name, function in list(functions.items()):
+        body = list(walk(function.children[-1]))
+        if any(isinstance(node, (PrintNode, ReadNode, FuncDecNode)) for node in body):
+            del functions[name]
+        else:
+            calls[name] = [node for node in body if isinstance(node, FuncCallNode)]
+
+    changed = True
+    while changed:
+        changed = False
+        for name in list(functions):
+            for call in calls[name]:
+                callee = functions.get(call.value)
+                if callee is None or len(callee.children) - 2 != len(call.children):
+                    del functions[name]
+                    changed = True
+                    break
+    return functions
+
+# Runs calls to pure functions with constant arguments at compile time. Each
+# call from the program gets budget steps, one per statement, loop iteration
+# and call, and calls nest at most DEPTH deep. Results, and the calls that
+# ran out of budget, are remembered for the rest of the compilation.
+class Evaluator:
+
+    def __init__(self, budget=10000):
+        self.budget = budget
+        self.functions = {}
+        self.memo = {}
+        self.report = []
+
+    def run(self, ast_root):
+        self.functions = pure_functions(ast_root)
+        return ast_root
+
+    # The value of the call, or None when it cannot be computed here.
+    def call(self, node):
+        function = self.functions.get(node.value)
+        if function is None or len(function.children) - 2 != len(node.children):
+            return None
+        if not all(isinstance(argument, IntValNode) for argument in node.children):
+            return None
+        key = (node.value, tuple(argument.value for argument in node.children))
+        if key not in self.memo:
+            self.steps = 0
+            try:
+                self._call(*key, 0)
+            except RuntimeError:
+                self.memo[key] = None
+            if self.memo[key] is not None:
+                self.report.append(f'evaluated {node.value}({", ".join(map(str, key[1]))}) = {self.memo[key]}')
+        return self.memo[key]
+
+    def _step(self):
+        self.steps += 1
+        if self.steps > self.budget:
+            raise RuntimeError('Evaluation budget exhausted.')
+
+    # Tail calls, which the accumulator rewrite produces for linear
+    # recursions, run in a loop rather than nesting.
+    def _call(self, name, arguments, depth):
+        if depth > DEPTH:
+            raise RuntimeError('Evaluation too deep.')
+        pending = []
+        while True:
+            self._step()
+            key = (name, arguments)
+            if key in self.memo:
+                value = self.memo[key]
+                if value is None:
+                    raise RuntimeError(f'Call {name}{arguments} cannot be evaluated.')
+                break
+            pending.append(key)
+            function = self.functions[name]
+            parameters = [parameter.identifier.value for parameter in function.children[1:-1]]
+            result = self._block(function.children[-1], [dict(zip(parameters, arguments))], depth)
+            if result is None:
+                raise RuntimeError(f'Function {name} ends without a return.')
+            if isinstance(result, int):
+                value = result
+                break
+            name, arguments = result
+        for key in pending:
+            self.memo[key] = value
+        return value
+
+    # A block returns None when it runs to its end, the returned value, or
+    # the name and arguments of a call in return position.
+    def _block(self, block, scopes, depth):
+        scopes.append({})
+        for statement in block.children:
+            result = self._statement(statement, scopes, depth)
+            if result is not None:
+                break
+        else:
+            result = None
+        scopes.pop()
+        return result
+
+    def _statement(self, node, scopes, depth):
+        self._step()
+        if isinstance(node, VarDecNode):
+            value = 0 if node.expression is None else self._expression(node.expression, scopes, depth)
+            scopes[-1][node.identifier.value] = value
+        elif isinstance(node, AssigmentNode):
+            value = self._expression(node.expression, scopes, depth)
+            self._scope(node.identifier.value, scopes)[node.identifier.value] = value
+        elif isinstance(node, FuncCallNode):
+            self._expression(node, scopes, depth)
+        elif isinstance(node, ReturnNode):
+            expression = node.expression
+            if isinstance(expression, FuncCallNode):
+                return expression.value, tuple(self._expression(argument, scopes, depth) for argument in expression.children)
+            return self._expression(expression, scopes, depth)
+        elif isinstance(node, BlockNode):
+            return self._block(node, scopes, depth)
+        elif isinstance(node, IfNode):
+            block = node.block if self._condition(node.condition, scopes, depth) else node.else_block
+            return self._block(block, scopes, depth)
+        elif isinstance(node, WhileNode):
+            while self._condition(node.condition, scopes, depth):
+                result = self._block(node.block, scopes, depth)
+                if result is not None:
+                    return result
+                self._step()
+        elif not isinstance(node, NoOpNode):
+            raise RuntimeError(f'Cannot evaluate {type(node).__name__}.')
+        return None
+
+    @staticmethod
+    def _scope(name, scopes):
+        for scope in reversed(scopes):
+            if name in scope:
+                return scope
+        raise RuntimeError(f'Key {name} does not exist.')
+
+    # An if or while short-circuits and/or over boolean operands, as the
+    # code generators do.
+    def _condition(self, node, scopes, depth, boolean=False):
+        if isinstance(node, UnOpNode) and node.value == 'not':
+            return not self._condition(node.expression, scopes, depth, boolean)
+        if isinstance(node, UnOpNode):
+            return self._condition(node.expression, scopes, depth, boolean)
+        if isinstance(node, BinOpNode) and node.value in ('and', 'or') and (boolean or is_boolean(node)):
+            left = self._condition(node.left, scopes, depth, True)
+            if left == (node.value == 'or'):
+                return left
+            return self._condition(node.right, scopes, depth, True)
+        return self._expression(node, scopes, depth) != 0
+
+    def _expression(self, node, scopes, depth):
+        if isinstance(node, IntValNode):
+            return node.value
+        if isinstance(node, IdentifierNode):
+            return self._scope(node.value, scopes)[node.value]
+        if isinstance(node, UnOpNode):
+            value = self._expression(node.expression, scopes, depth)
+            if node.value == '-':
+                return wrap(-value)
+            if node.value == 'not':
+                return int(value == 0)
+            return value
+        if isinstance(node, BinOpNode) and node.value in Optimizer.binops:
+            left = self._expression(node.left, scopes, depth)
+            right = self._expression(node.right, scopes, depth)
+            if node.value == '/' and traps(left, right, isinstance(node.right, IntValNode)):
+                raise RuntimeError('Division traps.')
+            return wrap(Optimizer.binops[node.value](left, right))
+        if isinstance(node, FuncCallNode):
+            arguments = tuple(self._expression(argument, scopes, depth) for argument in node.children)
+            return self._call(node.value, arguments, depth + 1)
+        raise RuntimeError(f'Cannot evaluate {type(node).__name__}.')
@@ -0,0 +1,220 @@
+from .nodes import (
+    BinOpNode, IntValNode, UnOpNode, PrintNode, AssigmentNode, BlockNode,
+    IdentifierNode, NoOpNode, ReadNode, IfNode, WhileNode, StringNode,
+    VarDecNode, ReturnNode, FuncDecNode, FuncCallNode
+)
+from .tree import walk, is_pure, exposes_short_circuit, trampoline
+
+# Copies a tree, replacing the parameters in substitutions with copies of
+# their arguments and renaming the names in renames. Like the other passes
+# it runs through trampoline(), so deep nesting does not recurse.
+def clone(node, substitutions, renames):
+    return trampoline(_clone(node, substitutions, renames))
+
+def _clone(node, substitutions, renames):
+    if isinstance(node, IdentifierNode):
+        if node.value in substitutions:
+            return (yield _clone(substitutions[node.value], {}, {}))
+        return IdentifierNode(renames.get(node.value, node.value))
+    if isinstance(node, (IntValNode, StringNode, ReadNode, NoOpNode)):
+        return type(node)(node.value)
+    if isinstance(node, BinOpNode):
+        left = yield _clone(node.left, substitutions, renames)
+        return BinOpNode(node.value, left, (yield _clone(node.right, substitutions, renames)))
+    if isinstance(node, UnOpNode):
+        return UnOpNode(node.value, (yield _clone(node.expression, substitutions, renames)))
+    if isinstance(node, (FuncCallNode, BlockNode)):
+        copy = type(node)(node.value)
+        for child in node.children:
+            copy.children.append((yield _clone(child, substitutions, renames)))
+        return copy
+    if isinstance(node, VarDecNode):
+        expression = None if node.expression is None else (yield _clone(node.expression, substitutions, renames))
+        return VarDecNode((yield _clone(node.identifier, substitutions, renames)), expression)
+    if isinstance(node, AssigmentNode):
+        identifier = yield _clone(node.identifier, substitutions, renames)
+        return AssigmentNode(identifier, (yield _clone(node.expression, substitutions, renames)))
+    if isinstance(node, PrintNode):
+        return PrintNode((yield _clone(node.expression, substitutions, renames)))
+    if isinstance(node, ReturnNode):
+        return ReturnNode((yield _clone(node.expression, substitutions, renames)))
+    if isinstance(node, WhileNode):
+        condition = yield _clone(node.condition, substitutions, renames)
+        return WhileNode(condition, (yield _clone(node.block, substitutions, renames)))
+    if isinstance(node, IfNode):
+        condition = yield _clone(node.condition, substitutions, renames)
+        block = yield _clone(node.block, substitutions, renames)
+        return IfNode(condition, block, (yield _clone(node.else_block, substitutions, renames)))
+    raise ValueError(f'Cannot copy node {type(node).__name__}')
+
+class Inliner:
+
+    def __init__(self, budget=24):
+        self.budget = budget
+        self.functions = {}
+        self.report = []
+        self.sites = 0
+
+    def run(self, ast_root):
+        declarations = {}
+        for node in walk(ast_root):
+            if isinstance(node, FuncDecNode):
+                declarations.setdefault(node.children[0].value, []).append(node)
+
+        recursive = self._recursive(declarations)
+        self.functions = {
+            name: functions[0] for name, functions in declarations.items()
+            if len(functions) == 1 and name not in recursive
+            and sum(1 for _ in walk(functions[0].children[-1])) <= self.budget
+        }
+
+        trampoline(self._block(ast_root, 'main'))
+        return ast_root
+
+    @staticmethod
+    def _recursive(declarations):
+        calls = {
+            name: {node.value for function in functions for node in walk(function) if isinstance(node, FuncCallNode)}
+            for name, functions in declarations.items()
+        }
+        recursive = set()
+        for name in calls:
+            stack, seen = list(calls[name]), set()
+            while stack:
+                callee = stack.pop()
+                if callee == name:
+                    recursive.add(name)
+                    break
+                if callee not in seen:
+                    seen.add(callee)
+                    stack.extend(calls.get(callee, ()))
+        return recursive
+
+    def _block(self, block, caller):
+        children = []
+        for statement in block.children:
+            children.append((yield self._statement(statement, caller)))
+        block.children = children
+
+    def _arguments(self, call, caller):
+        arguments = []
+        for argument in call.children:
+            arguments.append((yield self._expression(argument, caller)))
+        call.children = arguments
+
+    def _statement(self, node, caller):
+        if isinstance(node, FuncDecNode):
+            yield self._block(node.children[-1], node.children[0].value)
+        elif isinstance(node, BlockNode):
+            yield self._block(node, caller)
+        elif isinstance(node, FuncCallNode):
+            yield self._arguments(node, caller)
+            block = self._inline_procedure(node, caller)
+            if block is not None:
+                return (yield self._statement(block, caller))
+        elif isinstance(node, WhileNode):
+            node.condition = yield self._expression(node.condition, caller)
+            yield self._block(node.block, caller)
+        elif isinstance(node, IfNode):
+            node.condition = yield self._expression(node.condition, caller)
+            yield self._block(node.block, caller)
+            yield self._block(node.else_block, caller)
+        elif isinstance(node, (VarDecNode, AssigmentNode)):
+            if node.expression is not None:
+                node.expression = yield self._expression(node.expression, caller)
+        elif isinstance(node, (PrintNode, ReturnNode)):
+            node.expression = yield self._expression(node.expression, caller)
+        return node
+
+    def _expression(self, node, caller):
+        if isinstance(node, BinOpNode):
+            node.left = yield self._expression(node.left, caller)
+            node.right = yield self._expression(node.right, caller)
+        elif isinstance(node, UnOpNode):
+            node.expression = yield self._expression(node.expression, caller)
+        elif isinstance(node, FuncCallNode):
+            yield self._arguments(node, caller)
+            expression = self._inline_expression(node, caller)
+            if expression is not None:
+                return (yield self._expression(expression, caller))
+        return node
+
+    def _parameters(self, call):
+        function = self.functions.get(call.value)
+        if function is None:
+            return None, None
+        parameters = [parameter.identifier.value for parameter in function.children[1:-1]]
+        if len(parameters) != len(call.children):
+            return None, None
+        return function, parameters
+
+    # A function whose body is a single return is substituted into the
+    # calling expression. Arguments replace the parameters directly, so each
+    # must be a constant, a variable, or a pure expression used at most once.
+    def _inline_expression(self, call, caller):
+        function, parameters = self._parameters(call)
+        if function is None:
+            return None
+        body = function.children[-1].children
+        if len(body) != 1 or not isinstance(body[0], ReturnNode):
+            return None
+
+        expression = body[0].expression
+        uses = {}
+        for node in walk(expression):
+            if isinstance(node, IdentifierNode):
+                uses[node.value] = uses.get(node.value, 0) + 1
+
+        substitutions = {}
+        for parameter, argument in zip(parameters, call.children):
+            if isinstance(argument, (IntValNode, IdentifierNode)):
+                substitutions[parameter] = argument
+            elif is_pure(argument) and uses.get(parameter, 0) <= 1:
+                substitutions[parameter] = argument
+            else:
+                return None
+
+        inlined = clone(expression, substitutions, {})
+        if exposes_short_circuit(inlined):
+            return None
+        self.report.append(f'inlined {call.value} into {caller}')
+        return inlined
+
+    # A function without returns called as a statement becomes a block in the
+    # caller. Parameters that cannot be substituted, and the function's
+    # locals, are declared in that block under fresh names. A parameter the
+    # body declares again is never substituted, since substitution ignores
+    # scopes, and the body then goes in a block of its own, as in the
+    # function, so the local shadows the parameter instead of clashing with
+    # it.
+    def _inline_procedure(self, call, caller):
+        function, parameters = self._parameters(call)
+        if function is None:
+            return None
+        body = function.children[-1]
+        nodes = list(walk(body))
+        if any(isinstance(node, (ReturnNode, FuncDecNode)) for node in nodes):
+            return None
+
+        assigned = {node.identifier.value for node in nodes if isinstance(node, AssigmentNode)}
+        declared = [node.identifier.value for node in nodes if isinstance(node, VarDecNode)]
+
+        self.sites += 1
+        block = BlockNode()
+        substitutions = {}
+        renames = {name: f'{name}.{call.value}.{self.sites}' for name in declared}
+        for parameter, argument in reversed(list(zip(parameters, call.children))):
+            if isinstance(argument, (IntValNode, IdentifierNode)) and parameter not in assigned and parameter not in renames:
+                substitutions[parameter] = argument
+            else:
+                renames[parameter] = f'{parameter}.{call.value}.{self.sites}'
+                block.children.append(VarDecNode(IdentifierNode(renames[parameter]), argument))
+
+        statements = [clone(statement, substitutions, renames) for statement in body.children]
+        if any(parameter in declared for parameter in parameters):
+            inner = BlockNode()
+            inner.children = statements
+            statements = [inner]
+        block.children.extend(statements)
+        self.report.append(f'inlined {call.value} into {caller}')
+        return block
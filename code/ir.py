@@ -0,0 +1,145 @@
+# Three-address intermediate representation. Operands are ints (constants),
+# strs (variables of the enclosing function) or Temps. Every block ends in
+# exactly one terminator: jump, branch, return or exit.
+
+BINARY_OPERATORS = ('+', '-', '*', '/', '>', '<', '==', 'and', 'or', '..')
+TERMINATORS = ('jump', 'branch', 'return', 'exit')
+# Instructions that must run even when their result is unused.
+SIDE_EFFECTS = ('print', 'read', 'call') + TERMINATORS
+
+MIRRORED_CONDITIONS = {'>': '<', '<': '>', '>=': '<=', '<=': '>=', '==': '==', '!=': '!='}
+NEGATED_CONDITIONS = {'>': '<=', '<': '>=', '>=': '<', '<=': '>', '==': '!=', '!=': '=='}
+
+class Temp:
+
+    __slots__ = ('number',)
+
+    def __init__(self, number):
+        self.number = number
+
+    def __repr__(self):
+        return f'%{self.number}'
+
+class Instruction:
+
+    __slots__ = ('op', 'dest', 'args')
+
+    def __init__(self, op, dest=None, args=()):
+        self.op = op
+        self.dest = dest
+        self.args = list(args)
+
+    # Positions in args that hold operands rather than labels, conditions
+    # or function names.
+    def operand_indices(self):
+        if self.op == 'jump':
+            return range(0)
+        if self.op == 'branch':
+            return range(1, 3)
+        if self.op == 'call':
+            return range(1, len(self.args))
+        return range(len(self.args))
+
+    # Whether the instruction must run even when its result is unused.
+    # Division traps on a zero divisor and on INT_MIN / -1, so only one by
+    # another constant is free to go.
+    def has_side_effects(self):
+        if self.op == '/':
+            return not isinstance(self.args[1], int) or self.args[1] in (0, -1)
+        return self.op in SIDE_EFFECTS
+
+    def uses(self):
+        return [self.args[i] for i in self.operand_indices() if not isinstance(self.args[i], int)]
+
+    def targets(self):
+        if self.op == 'jump':
+            return [self.args[0]]
+        if self.op == 'branch':
+            return [self.args[3], self.args[4]]
+        return []
+
+    def retarget(self, mapping):
+        if self.op == 'jump':
+            self.args[0] = mapping.get(self.args[0], self.args[0])
+        elif self.op == 'branch':
+            self.args[3] = mapping.get(self.args[3], self.args[3])
+            self.args[4] = mapping.get(self.args[4], self.args[4])
+
+    def __repr__(self):
+        op, dest, args = self.op, self.dest, self.args
+        if op == 'copy':
+            text = f'{args[0]}'
+        elif op in BINARY_OPERATORS:
+            text = f'{args[0]} {op} {args[1]}'
+        elif op in ('neg', 'not'):
+            text = f'{op} {args[0]}'
+        elif op == 'read':
+            text = 'read'
+        elif op == 'call':
+            text = f"call {args[0]}({', '.join(map(str, args[1:]))})"
+        elif op == 'branch':
+            text = f'if {args[1]} {args[0]} {args[2]} goto {args[3]} else {args[4]}'
+        else:
+            text = ' '.join([op] + [str(arg) for arg in args])
+        return text if dest is None else f'{dest} = {text}'
+
+class Block:
+
+    __slots__ = ('label', 'instructions')
+
+    def __init__(self, label):
+        self.label = label
+        self.instructions = []
+
+    @property
+    def terminator(self):
+        if self.instructions and self.instructions[-1].op in TERMINATORS:
+            return self.instructions[-1]
+        return None
+
+    def successors(self):
+        return self.terminator.targets()
+
+class Function:
+
+    __slots__ = ('name', 'parameters', 'locals', 'blocks')
+
+    def __init__(self, name, parameters):
+        self.name = name
+        self.parameters = parameters
+        self.locals = []
+        self.blocks = []
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def block_map(self):
+        return {block.label: block for block in self.blocks}
+
+    def predecessors(self):
+        predecessors = {block.label: [] for block in self.blocks}
+        for block in self.blocks:
+            for target in block.successors():
+                predecessors[target].append(block.label)
+        return predecessors
+
+    def __repr__(self):
+        lines = [f"function {self.name}({', '.join(self.parameters)})"]
+        if self.locals:
+            lines.append(f"  locals {', '.join(self.locals)}")
+        for block in self.blocks:
+            lines.append(f'{block.label}:')
+            lines.extend(f'    {instruction}' for instruction in block.instructions)
+        return '\n'.join(lines)
+
+class Program:
+
+    __slots__ = ('main', 'functions')
+
+    def __init__(self, main, functions):
+        self.main = main
+        self.functions = functions
+
+    def __repr__(self):
+        return '\n\n'.join(repr(function) for function in [self.main] + self.functions) + '\n'
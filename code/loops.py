@@ -0,0 +1,125 @@
+# Natural loops of a Function's control-flow graph. An edge whose target
+# dominates its source is a back edge; the loop is its target, the header,
+# with every block that reaches the source without passing the header.
+
+class Loop:
+
+    __slots__ = ('header', 'blocks')
+
+    def __init__(self, header, blocks):
+        self.header = header
+        self.blocks = blocks
+
+    def __repr__(self):
+        return f"loop {self.header}: {', '.join(sorted(self.blocks))}"
+
+# Dominance among the blocks reachable from the entry. Immediate dominators
+# come from the algorithm of Lengauer and Tarjan, with path compression, so
+# deep nesting, where the dominator tree is as deep as the program, costs
+# no more than a wide one. Numbering the dominator tree in preorder and
+# postorder answers whether one block dominates another in constant time.
+class Dominators:
+
+    def __init__(self, function):
+        blocks = function.block_map()
+        entry = function.entry.label
+        # Depth-first preorder: order[n] is the block numbered n.
+        order, parent, number = [], [], {}
+        stack = [(entry, -1)]
+        while stack:
+            label, above = stack.pop()
+            if label in number:
+                continue
+            number[label] = len(order)
+            order.append(label)
+            parent.append(above)
+            stack.extend((successor, number[label]) for successor in reversed(blocks[label].successors()) if successor not in number)
+        predecessors = function.predecessors()
+
+        size = len(order)
+        semi, best, ancestor, idom = list(range(size)), list(range(size)), [-1] * size, [0] * size
+        bucket = [[] for _ in range(size)]
+
+        # The vertex of least semidominator on the path up to the root of
+        # its tree in the forest linked so far, compressing the path.
+        def evaluate(vertex):
+            if ancestor[vertex] == -1:
+                return vertex
+            path, passed = [], vertex
+            while ancestor[ancestor[passed]] != -1:
+                path.append(passed)
+                passed = ancestor[passed]
+            for passed in reversed(path):
+                above = ancestor[passed]
+                if semi[best[above]] < semi[best[passed]]:
+                    best[passed] = best[above]
+                ancestor[passed] = ancestor[above]
+            return best[vertex]
+
+        for vertex in range(size - 1, 0, -1):
+            for predecessor in predecessors[order[vertex]]:
+                if predecessor in number:
+                    semi[vertex] = min(semi[vertex], semi[evaluate(number[predecessor])])
+            bucket[semi[vertex]].append(vertex)
+            ancestor[vertex] = parent[vertex]
+            for waiting in bucket[parent[vertex]]:
+                lowest = evaluate(waiting)
+                idom[waiting] = lowest if semi[lowest] < semi[waiting] else parent[vertex]
+            bucket[parent[vertex]] = []
+        for vertex in range(1, size):
+            if idom[vertex] != semi[vertex]:
+                idom[vertex] = idom[idom[vertex]]
+        idom = {order[vertex]: order[idom[vertex]] for vertex in range(size)}
+
+        children = {label: [] for label in order}
+        for label, parent in idom.items():
+            if label != entry:
+                children[parent].append(label)
+        self.first, self.last = {}, {}
+        counter = 0
+        stack = [(entry, False)]
+        while stack:
+            label, done = stack.pop()
+            counter += 1
+            if done:
+                self.last[label] = counter
+                continue
+            self.first[label] = counter
+            stack.append((label, True))
+            stack.extend((child, False) for child in children[label])
+
+    # Whether label is reachable from the entry.
+    def __contains__(self, label):
+        return label in self.first
+
+    def dominates(self, dominator, label):
+        return self.first[dominator] <= self.first[label] and self.last[label] <= self.last[dominator]
+
+# Loops sharing a header are merged. Inner loops come before the loops
+# that contain them.
+def find_loops(function):
+    dominance = Dominators(function)
+    predecessors = function.predecessors()
+    bodies = {}
+    for block in function.blocks:
+        if block.label not in dominance:
+            continue
+        for target in block.successors():
+            if not dominance.dominates(target, block.label):
+                continue
+            body = bodies.setdefault(target, {target})
+            stack = [block.label]
+            while stack:
+                label = stack.pop()
+                if label not in body:
+                    body.add(label)
+                    stack.extend(predecessor for predecessor in predecessors[label] if predecessor in dominance)
+    return sorted((Loop(header, body) for header, body in bodies.items()), key=lambda loop: len(loop.blocks))
+
+# How many loops each block is nested in.
+def depths(function, loops=None):
+    depth = {block.label: 0 for block in function.blocks}
+    for loop in find_loops(function) if loops is None else loops:
+        for label in loop.blocks:
+            depth[label] += 1
+    return depth
@@ -0,0 +1,227 @@
+from .nodes import (
+    BinOpNode, IntValNode, UnOpNode, PrintNode, AssigmentNode, BlockNode,
+    IdentifierNode, NoOpNode, ReadNode, IfNode, WhileNode, StringNode,
+    VarDecNode, ReturnNode, FuncDecNode, FuncCallNode, is_boolean
+)
+from .ir import Temp, Instruction, Block, Function, Program
+from .tree import trampoline
+
+# Lowers the AST into one Function per FuncDecNode plus one for the
+# top-level block. Operands keep the AST's right-to-left evaluation order.
+class Lowering:
+
+    def __init__(self):
+        self.functions = {}
+        self.label = 0
+        self.temporaries = 0
+        self.function = None
+        self.block = None
+        self.scopes = []
+
+    def run(self, ast_root):
+        main = Function('main', [])
+        self.scopes = [{}]
+        self._begin(main, 'BEGIN_MAIN')
+        trampoline(self._statement(ast_root))
+        self._emit('exit')
+        return Program(main, list(self.functions.values()))
+
+    def _new_label(self, prefix):
+        self.label += 1
+        return f'{prefix}_{self.label}'
+
+    def _new_temporary(self):
+        self.temporaries += 1
+        return Temp(self.temporaries)
+
+    def _begin(self, function, label):
+        self.function = function
+        self._start(Block(label))
+
+    def _start(self, block):
+        self.function.blocks.append(block)
+        self.block = block
+
+    def _emit(self, op, dest=None, *args):
+        if self.block.terminator is not None:
+            # Code after a return or a tail call is unreachable; it goes to a
+            # block without predecessors that dead code elimination removes.
+            self._start(Block(self._new_label('DEAD')))
+        self.block.instructions.append(Instruction(op, dest, args))
+        return dest
+
+    def _variable(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise RuntimeError(f'Key {name} does not exist.')
+
+    # Locals are block scoped, so a name declared again in another block is
+    # a different variable and gets a name of its own in the function.
+    def _declare(self, name):
+        scope = self.scopes[-1]
+        if name in scope:
+            raise RuntimeError(f'Key {name} already created.')
+        function = self.function
+        variable, count = name, 1
+        while variable in function.locals or variable in function.parameters:
+            count += 1
+            variable = f'{name}.{count}'
+        function.locals.append(variable)
+        scope[name] = variable
+        return variable
+
+    def _declaration(self, call):
+        function = self.functions.get(call.value)
+        if function is None:
+            raise RuntimeError(f'Function {call.value} is not declared.')
+        if len(function.parameters) != len(call.children):
+            raise RuntimeError(f'Function {call.value} expects {len(function.parameters)} arguments, {len(call.children)} given.')
+        return function
+
+    # The methods that walk the tree are generators run by trampoline(),
+    # so how deeply blocks and expressions nest is limited only by memory.
+    def _statement(self, node):
+        if isinstance(node, BlockNode):
+            self.scopes.append({})
+            for child in node.children:
+                yield self._statement(child)
+            self.scopes.pop()
+        elif isinstance(node, VarDecNode):
+            value = 0 if node.expression is None else (yield self._expression(node.expression))
+            self._emit('copy', self._declare(node.identifier.value), value)
+        elif isinstance(node, AssigmentNode):
+            value = yield self._expression(node.expression)
+            self._emit('copy', self._variable(node.identifier.value), value)
+        elif isinstance(node, PrintNode):
+            value = yield self._expression(node.expression)
+            self._emit('print', None, value)
+        elif isinstance(node, FuncCallNode):
+            yield self._call(node, None)
+        elif isinstance(node, IfNode):
+            label = self._new_label('IF')
+            then_block, else_block, join_block = Block(f'THEN_{label}'), Block(f'ELSE_{label}'), Block(f'END_{label}')
+            yield self._branch(node.condition, then_block.label, else_block.label)
+            self._start(then_block)
+            yield self._statement(node.block)
+            self._emit('jump', None, join_block.label)
+            self._start(else_block)
+            yield self._statement(node.else_block)
+            self._emit('jump', None, join_block.label)
+            self._start(join_block)
+        elif isinstance(node, WhileNode):
+            label = self._new_label('WHILE')
+            body_block, test_block, exit_block = Block(f'LOOP_{label}'), Block(f'TEST_{label}'), Block(f'EXIT_{label}')
+            self._emit('jump', None, test_block.label)
+            self._start(body_block)
+            yield self._statement(node.block)
+            self._emit('jump', None, test_block.label)
+            self._start(test_block)
+            yield self._branch(node.condition, body_block.label, exit_block.label)
+            self._start(exit_block)
+        elif isinstance(node, FuncDecNode):
+            yield self._function(node)
+        elif isinstance(node, ReturnNode):
+            yield self._return(node.expression)
+        elif not isinstance(node, NoOpNode):
+            raise ValueError(f'Cannot lower node {type(node).__name__}')
+
+    def _function(self, node):
+        name = node.children[0].value
+        function = Function(name, [parameter.identifier.value for parameter in node.children[1:-1]])
+        self.functions[name] = function
+
+        enclosing_function, enclosing_block, enclosing_scopes = self.function, self.block, self.scopes
+        self.scopes = [{parameter: parameter for parameter in function.parameters}]
+        self._begin(function, f'BEGIN_FUNC_{name}')
+        yield self._statement(node.children[-1])
+        if self.block.terminator is None:
+            self._emit('return')
+        self.function, self.block, self.scopes = enclosing_function, enclosing_block, enclosing_scopes
+
+    def _return(self, expression):
+        function = self.function
+        if not (isinstance(expression, FuncCallNode) and expression.value == function.name):
+            value = yield self._expression(expression)
+            self._emit('return', None, value)
+            return
+
+        # A self tail call assigns the arguments to the parameters and jumps
+        # back to the start of the body. Arguments are copied to temporaries
+        # first so that none of them sees a parameter already overwritten.
+        self._declaration(expression)
+        arguments = yield self._arguments(expression)
+        values = []
+        for argument in arguments:
+            if isinstance(argument, int):
+                values.append(argument)
+            else:
+                values.append(self._emit('copy', self._new_temporary(), argument))
+        for parameter, value in zip(function.parameters, values):
+            self._emit('copy', parameter, value)
+        self._emit('jump', None, function.entry.label)
+
+    # Arguments are evaluated right to left, like the operands of the
+    # generated code, and returned in order.
+    def _arguments(self, call):
+        arguments = []
+        for argument in reversed(call.children):
+            arguments.append((yield self._expression(argument)))
+        return arguments[::-1]
+
+    def _call(self, node, dest):
+        self._declaration(node)
+        arguments = yield self._arguments(node)
+        return self._emit('call', dest, node.value, *arguments)
+
+    def _expression(self, node):
+        if isinstance(node, IntValNode):
+            return node.value
+        if isinstance(node, StringNode):
+            return 0
+        if isinstance(node, IdentifierNode):
+            return self._variable(node.value)
+        if isinstance(node, BinOpNode):
+            right = yield self._expression(node.right)
+            left = yield self._expression(node.left)
+            if node.value == '..':
+                return left
+            return self._emit(node.value, self._new_temporary(), left, right)
+        if isinstance(node, UnOpNode):
+            operand = yield self._expression(node.expression)
+            if node.value == '-':
+                return self._emit('neg', self._new_temporary(), operand)
+            if node.value == 'not':
+                return self._emit('not', self._new_temporary(), operand)
+            return operand
+        if isinstance(node, ReadNode):
+            return self._emit('read', self._new_temporary())
+        if isinstance(node, FuncCallNode):
+            return (yield self._call(node, self._new_temporary()))
+        raise ValueError(f'Cannot lower node {type(node).__name__}')
+
+    # Lowers a condition straight into jumps; and/or short-circuit here as
+    # they do in BinOpNode.branch, over boolean operands only. Inside an
+    # and/or found boolean, every operand is, so boolean skips the check.
+    def _branch(self, node, true_label, false_label, boolean=False):
+        if isinstance(node, BinOpNode) and node.value in ('>', '<', '=='):
+            right = yield self._expression(node.right)
+            left = yield self._expression(node.left)
+            self._emit('branch', None, node.value, left, right, true_label, false_label)
+        elif isinstance(node, BinOpNode) and node.value in ('and', 'or') and (boolean or is_boolean(node)):
+            middle = Block(self._new_label('SKIP'))
+            if node.value == 'and':
+                yield self._branch(node.left, middle.label, false_label, True)
+            else:
+                yield self._branch(node.left, true_label, middle.label, True)
+            self._start(middle)
+            yield self._branch(node.right, true_label, false_label, True)
+        elif isinstance(node, UnOpNode) and node.value == 'not':
+            yield self._branch(node.expression, false_label, true_label, boolean)
+        elif isinstance(node, UnOpNode):
+            yield self._branch(node.expression, true_label, false_label, boolean)
+        elif isinstance(node, IntValNode):
+            self._emit('jump', None, true_label if node.value else false_label)
+        else:
+            value = yield self._expression(node)
+            self._emit('branch', None, '!=', value, 0, true_label, false_label)
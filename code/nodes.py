@@ -1,252 +1,634 @@
 from abc import ABC, abstractmethod
-from .table import SymbolTable, FuncTable
-from code.asm import ASM
+from .table import SymbolTable
+from .arithmetic import multiply, divide_by_constant, is_reducible, needs_multiply
 
 class Node(ABC):
 
-    _id = 0
+    __slots__ = ('value',)
 
     def __init__(self, value=None):
         self.value = value
-        self.children = []
-        self.id = Node._id
-        Node._id += 1
 
     @abstractmethod
-    def evaluate():
+    def evaluate(self, symbol_table, context):
         pass
 
-class IdentifierNode(Node):
+    # Stack slots the statement needs for its locals at the deepest point.
+    def frame(self):
+        return 0
+
+    # The blocks that share the frame of the enclosing function.
+    def blocks(self):
+        return ()
+
+# Expressions are evaluated into a target register. EAX holds the value of a
+# whole expression, the registers below hold temporaries and EDX is left as
+# scratch for DIV.
+REGISTERS = ('EBX', 'ECX', 'ESI', 'EDI')
+ALL_REGISTERS = ('EAX',) + REGISTERS
+# Registers that the runtime's PRINT_INT and READ_INT may clobber.
+CALLER_SAVED = ('EAX',)
+
+def live_registers(target, free, candidates=ALL_REGISTERS):
+    return [register for register in candidates if register != target and register not in free]
+
+# Code generation runs on an explicit stack instead of recursing, so how
+# deeply the program nests is limited only by memory. evaluate, generate
+# and branch either write all their code at once and return None, or are
+# generators that yield what those methods return for each child at the
+# point where its code goes; emit() runs them in that order.
+def emit(task):
+    if task is None:
+        return
+    stack = [task]
+    while stack:
+        for child in stack[-1]:
+            if child is not None:
+                stack.append(child)
+            break
+        else:
+            stack.pop()
+
+class ExpressionNode(Node):
+
+    __slots__ = ()
+
+    def evaluate(self, symbol_table, context):
+        return self.generate(symbol_table, context, 'EAX', REGISTERS)
+
+    # Sethi-Ullman number and whether the subtree is free of calls and reads.
+    def label(self):
+        return 1, True
+
+    # Jumps to label when the truth value of the expression equals when.
+    def branch(self, symbol_table, context, label, when):
+        asm = context.asm
+        yield self.evaluate(symbol_table, context)
+        asm.write('CMP EAX, False')
+        asm.write(f'JNE {label}' if when else f'JE {label}')
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    @abstractmethod
+    def generate(self, symbol_table, context, target, free):
+        pass
+
+class IdentifierNode(ExpressionNode):
+
+    __slots__ = ()
+
+    def generate(self, symbol_table, context, target, free):
+        address = symbol_table.get(self.value)
+        asm_code = f'MOV {target}, [EBP-{abs(address)}]' if address > 0 else f'MOV {target}, [EBP+{abs(address)}]'
+        context.asm.write(asm_code)
 
-    def evaluate(self, symbol_table):
+    def branch(self, symbol_table, context, label, when):
+        asm = context.asm
         address = symbol_table.get(self.value)
-        asm_code = f'MOV EAX, [EBP-{abs(address)}]\n' if address > 0 else f'MOV EAX, [EBP+{abs(address)}]\n'
-        ASM.write(asm_code)
+        asm_code = f'CMP DWORD [EBP-{abs(address)}], False' if address > 0 else f'CMP DWORD [EBP+{abs(address)}], False'
+        asm.write(asm_code)
+        asm.write(f'JNE {label}' if when else f'JE {label}')
 
-class ReadNode(Node):
+class ReadNode(ExpressionNode):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ()
+
+    def label(self):
+        return 1, False
 
-    def evaluate(self, symbol_table):
-        ASM.write('PUSH scanint\n')
-        ASM.write('PUSH formatin\n')
-        ASM.write('CALL scanf\n')
-        ASM.write('ADD ESP, 8\n')
-        ASM.write('MOV EAX, DWORD [scanint]\n')
+    def generate(self, symbol_table, context, target, free):
+        asm = context.asm
+        live = live_registers(target, free, CALLER_SAVED)
+        for register in live:
+            asm.write(f'PUSH {register}')
+        asm.write('CALL READ_INT')
+        if target != 'EAX':
+            asm.write(f'MOV {target}, EAX')
+        for register in reversed(live):
+            asm.write(f'POP {register}')
 
 class WhileNode(Node):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ('condition', 'block')
 
-    def evaluate(self, symbol_table):
-        ASM.write(f'LOOP_{self.id}:\n')
+    def __init__(self, condition, block):
+        super().__init__()
+        self.condition = condition
+        self.block = block
 
-        self.children[0].evaluate(symbol_table)
+    def evaluate(self, symbol_table, context):
+        asm = context.asm
+        label = context.new_label()
+        asm.write(f'JMP TEST_{label}')
+        asm.write(f'LOOP_{label}:')
 
-        ASM.write('CMP EAX, False\n')
-        ASM.write(f'JE EXIT_{self.id}\n')
+        yield self.block.evaluate(symbol_table, context)
 
-        self.children[1].evaluate(symbol_table)
+        asm.write(f'TEST_{label}:')
+        yield self.condition.branch(symbol_table, context, f'LOOP_{label}', True)
 
-        ASM.write(f'JMP LOOP_{self.id}\n')
-        ASM.write(f'EXIT_{self.id}:\n')
+    def frame(self):
+        return self.block.frame()
+
+    def blocks(self):
+        return (self.block,)
 
 class IfNode(Node):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ('condition', 'block', 'else_block')
+
+    def __init__(self, condition, block, else_block):
+        super().__init__()
+        self.condition = condition
+        self.block = block
+        self.else_block = else_block
+
+    def evaluate(self, symbol_table, context):
+        asm = context.asm
+        label = context.new_label()
+        yield self.condition.branch(symbol_table, context, f'EXIT_{label}', False)
+
+        yield self.block.evaluate(symbol_table, context)
 
-    def evaluate(self, symbol_table):
-        self.children[0].evaluate(symbol_table)
+        asm.write(f'JMP EXIT_ELSE_{label}')
+        asm.write(f'EXIT_{label}:')
 
-        ASM.write('CMP EAX, False\n')
-        ASM.write(f'JE EXIT_{self.id}\n')
-        self.children[1].evaluate(symbol_table)
+        yield self.else_block.evaluate(symbol_table, context)
+        asm.write(f'EXIT_ELSE_{label}:')
 
-        ASM.write(f'JMP EXIT_ELSE_{self.id}\n')
-        ASM.write(f'EXIT_{self.id}:\n')
+    def frame(self):
+        return max(self.block.frame(), self.else_block.frame())
 
-        self.children[2].evaluate(symbol_table)
-        ASM.write(f'EXIT_ELSE_{self.id}:\n')
+    def blocks(self):
+        return (self.block, self.else_block)
 
 class VarDecNode(Node):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ('identifier', 'expression')
 
-    def evaluate(self, symbol_table):
-        ASM.write(f'PUSH DWORD 0\n')
-        key = self.children[0].value
+    def __init__(self, identifier, expression=None):
+        super().__init__()
+        self.identifier = identifier
+        self.expression = expression
+
+    # The value is evaluated before the name is declared, so it still sees a
+    # variable of the same name from an enclosing block.
+    def evaluate(self, symbol_table, context):
+        asm = context.asm
+        if self.expression is not None:
+            yield self.expression.evaluate(symbol_table, context)
+        key = self.identifier.value
         symbol_table.create(key)
-        if len(self.children) > 1:
-            self.children[1].evaluate(symbol_table)
-            address = symbol_table.get(key)
-            asm_code = f'MOV [EBP-{abs(address)}], EAX\n' if address > 0 else f'MOV [EBP+{abs(address)}], EAX\n'
-            ASM.write(asm_code)
+        address = symbol_table.get(key)
+        if self.expression is not None:
+            asm.write(f'MOV [EBP-{address}], EAX')
+        else:
+            asm.write(f'MOV DWORD [EBP-{address}], 0')
 
 class PrintNode(Node):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ('expression',)
 
-    def evaluate(self, symbol_table):
-        self.children[0].evaluate(symbol_table)
-        ASM.write('PUSH EAX\n')
-        ASM.write('PUSH formatout\n')
-        ASM.write('CALL printf\n')
-        ASM.write('ADD ESP, 8\n')
+    def __init__(self, expression):
+        super().__init__()
+        self.expression = expression
+
+    def evaluate(self, symbol_table, context):
+        asm = context.asm
+        yield self.expression.evaluate(symbol_table, context)
+        asm.write('CALL PRINT_INT')
 
 class AssigmentNode(Node):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ('identifier', 'expression')
+
+    def __init__(self, identifier, expression):
+        super().__init__()
+        self.identifier = identifier
+        self.expression = expression
 
-    def evaluate(self, symbol_table):
-        self.children[1].evaluate(symbol_table)
-        key = self.children[0].value
+    def evaluate(self, symbol_table, context):
+        yield self.expression.evaluate(symbol_table, context)
+        key = self.identifier.value
         address = symbol_table.get(key)
-        asm_code = f'MOV [EBP-{abs(address)}], EAX\n' if address > 0 else f'MOV [EBP+{abs(address)}], EAX\n'
-        ASM.write(asm_code)
+        asm_code = f'MOV [EBP-{abs(address)}], EAX' if address > 0 else f'MOV [EBP+{abs(address)}], EAX'
+        context.asm.write(asm_code)
 
 class BlockNode(Node):
 
+    __slots__ = ('children',)
+
     def __init__(self, value=None):
         super().__init__(value)
+        self.children = []
 
-    def evaluate(self, symbol_table):
+    def evaluate(self, symbol_table, context):
+        symbol_table.enter()
         for child in self.children:
-            child.evaluate(symbol_table)
-
-class BinOpNode(Node):
-
-    def __init__(self, value=None):
+            yield child.evaluate(symbol_table, context)
+        symbol_table.leave()
+
+    # Locals take the next slots in order of declaration and nested blocks
+    # start above them, matching how SymbolTable hands out addresses. The
+    # nested blocks are sized first, innermost up, so deep nesting does not
+    # recurse.
+    def frame(self):
+        pending, stack = [], [self]
+        while stack:
+            block = stack.pop()
+            pending.append(block)
+            for child in block.children:
+                stack.extend(child.blocks())
+        frames = {}
+        for block in reversed(pending):
+            declared = deepest = 0
+            for child in block.children:
+                if isinstance(child, VarDecNode):
+                    declared += 1
+                    deepest = max(deepest, declared)
+                else:
+                    deepest = max(deepest, declared + max((frames[id(nested)] for nested in child.blocks()), default=0))
+            frames[id(block)] = deepest
+        return frames[id(self)]
+
+    def blocks(self):
+        return (self,)
+
+def compare(asm, target, operand, condition):
+    asm.write(f'CMP {target}, {operand}')
+    asm.write(f'SET{condition} DL')
+    asm.write(f'MOVZX {target}, DL')
+
+def divide(asm, target, operand, free):
+    if operand.lstrip('-').isdigit():
+        divide_constant(asm, target, int(operand), free)
+        return
+    saved = target != 'EAX' and 'EAX' not in free
+    if saved:
+        asm.write('PUSH EAX')
+        operand = operand.replace('[ESP]', '[ESP+4]')
+    if operand == 'EAX':
+        asm.write(f'XCHG EAX, {target}')
+        asm.write('CDQ')
+        asm.write(f'IDIV {target}')
+        asm.write(f'MOV {target}, EAX')
+    else:
+        if target != 'EAX':
+            asm.write(f'MOV EAX, {target}')
+        asm.write('CDQ')
+        asm.write(f'IDIV {operand}')
+        if target != 'EAX':
+            asm.write(f'MOV {target}, EAX')
+    if saved:
+        asm.write('POP EAX')
+
+# The multiply for a general divisor needs EAX and the dividend outside
+# EAX: a free register takes it, or else the stack.
+def divide_constant(asm, target, divisor, free):
+    if not needs_multiply(divisor):
+        divide_by_constant(asm, target, target, divisor)
+    elif target != 'EAX':
+        saved = 'EAX' not in free
+        if saved:
+            asm.write('PUSH EAX')
+        divide_by_constant(asm, target, target, divisor)
+        if saved:
+            asm.write('POP EAX')
+    elif free:
+        asm.write(f'MOV {free[0]}, EAX')
+        divide_by_constant(asm, target, free[0], divisor)
+    else:
+        asm.write('PUSH EAX')
+        divide_by_constant(asm, target, 'DWORD [ESP]', divisor)
+        asm.write('ADD ESP, 4')
+
+# Whether an expression is always 0 or 1: a comparison, a not, a literal 0
+# or 1, or and/or over such operands. A condition short-circuits and/or
+# only over these, where the logical result is the bitwise one; otherwise
+# it tests the bitwise value the expression has anywhere else.
+def is_boolean(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinOpNode) and node.value in ('and', 'or'):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, IntValNode):
+            if node.value not in (0, 1):
+                return False
+        elif not (isinstance(node, BinOpNode) and node.value in BinOpNode.conditions or isinstance(node, UnOpNode) and node.value == 'not'):
+            return False
+    return True
+
+class BinOpNode(ExpressionNode):
+
+    __slots__ = ('left', 'right', 'registers', 'pure')
+
+    immediate_operators = {'+', '-', '*', '/', '>', '<', '==', 'and', 'or'}
+    commutative_operators = {'+': '+', '*': '*', '==': '==', 'and': 'and', 'or': 'or', '>': '<', '<': '>'}
+    conditions = {'>': 'G', '<': 'L', '==': 'E'}
+    negated_conditions = {'>': 'LE', '<': 'GE', '==': 'NE'}
+
+    def __init__(self, value, left, right):
         super().__init__(value)
-
-    def evaluate(self, symbol_table):
-        self.children[1].evaluate(symbol_table)
-        ASM.write(f'PUSH EAX\n')
-        self.children[0].evaluate(symbol_table)
-        ASM.write(f'POP EBX\n')
-        if self.value == '+':
-            ASM.write(f'ADD EAX, EBX\n')
-        elif self.value == '-':
-            ASM.write(f'SUB EAX, EBX\n')
-        elif self.value == '*':
-            ASM.write(f'IMUL EBX\n')
-        elif self.value == '/':
-            ASM.write(f'DIV EBX\n')
-        elif self.value == '>':
-            ASM.write(f'CMP EAX, EBX\n')
-            ASM.write(f'CALL binop_jg\n')
-        elif self.value == '<':
-            ASM.write(f'CMP EAX, EBX\n')
-            ASM.write(f'CALL binop_jl\n')
-        elif self.value == '==':
-            ASM.write(f'CMP EAX, EBX\n')
-            ASM.write(f'CALL binop_je\n')
-        elif self.value == 'and':
-            ASM.write(f'AND EAX, EBX\n')
-        elif self.value == 'or':
-            ASM.write(f'OR EAX, EBX\n')
-        elif self.value == '..':
+        self.left = left
+        self.right = right
+        self.registers = None
+        self.pure = None
+
+    # Operations below that are not labelled yet are labelled first, from
+    # the bottom up, so a deep expression does not recurse.
+    def label(self):
+        if self.registers is None:
+            pending, stack = [], [self]
+            while stack:
+                node = stack.pop()
+                pending.append(node)
+                for child in (node.left, node.right):
+                    while isinstance(child, UnOpNode):
+                        child = child.expression
+                    if isinstance(child, BinOpNode) and child.registers is None:
+                        stack.append(child)
+            for node in reversed(pending):
+                node._label()
+        return self.registers, self.pure
+
+    def _label(self):
+        if self.registers is None:
+            left_registers, left_pure = self.left.label()
+            right_registers, right_pure = self.right.label()
+            if self._immediate():
+                self.registers = left_registers
+            elif left_registers == right_registers:
+                self.registers = left_registers + 1
+            else:
+                self.registers = max(left_registers, right_registers)
+            self.pure = left_pure and right_pure
+
+    def generate(self, symbol_table, context, target, free):
+        operator, operand, rest = yield from self._operands(symbol_table, context, target, free)
+        self._apply(context.asm, operator, target, operand, rest)
+        if operand == 'DWORD [ESP]':
+            context.asm.write('ADD ESP, 4')
+
+    def branch(self, symbol_table, context, label, when):
+        asm = context.asm
+
+        if self.value in self.conditions:
+            operator, operand, _ = yield from self._operands(symbol_table, context, 'EAX', REGISTERS)
+            asm.write(f'CMP EAX, {operand}')
+            if operand == 'DWORD [ESP]':
+                asm.write('LEA ESP, [ESP+4]')
+            condition = self.conditions[operator] if when else self.negated_conditions[operator]
+            asm.write(f'J{condition} {label}')
+        elif self.value in ('and', 'or') and is_boolean(self):
+            yield self._short_circuit(symbol_table, context, label, when)
+        else:
+            yield super().branch(symbol_table, context, label, when)
+
+    # and/or over operands that are 0 or 1 jump straight to label and skip
+    # the right operand once the left decides. Every and/or below is
+    # boolean too, so it goes straight here without checking again.
+    def _short_circuit(self, symbol_table, context, label, when):
+        skip = None if when == (self.value == 'or') else f'SKIP_{context.new_label()}'
+        operands = ((self.left, skip or label, when if skip is None else not when), (self.right, label, when))
+        for operand, target, sense in operands:
+            while isinstance(operand, UnOpNode):
+                sense = not sense
+                operand = operand.expression
+            if isinstance(operand, BinOpNode) and operand.value in ('and', 'or'):
+                yield operand._short_circuit(symbol_table, context, target, sense)
+            else:
+                yield operand.branch(symbol_table, context, target, sense)
+        if skip is not None:
+            context.asm.write(f'{skip}:')
+
+    # Division by zero and by the most negative value still goes through
+    # IDIV, which needs the divisor in a register.
+    def _immediate(self):
+        if not isinstance(self.right, IntValNode) or self.value not in self.immediate_operators:
+            return False
+        return self.value != '/' or is_reducible(self.right.value)
+
+    # Generates the operands, the left one into target, and returns the
+    # operator to apply with the right operand (a register, an immediate or the spilled
+    # value at [ESP]) and the registers that are still free.
+    def _operands(self, symbol_table, context, target, free):
+        asm = context.asm
+        left, right = self.left, self.right
+
+        if self._immediate():
+            yield left.generate(symbol_table, context, target, free)
+            return self.value, str(right.value), free
+        if isinstance(left, IntValNode) and self.value in self.commutative_operators:
+            yield right.generate(symbol_table, context, target, free)
+            return self.commutative_operators[self.value], str(left.value), free
+
+        if not free:
+            yield right.generate(symbol_table, context, target, free)
+            asm.write(f'PUSH {target}')
+            yield left.generate(symbol_table, context, target, free)
+            return self.value, 'DWORD [ESP]', free
+
+        temporary, rest = free[0], free[1:]
+        left_registers, _ = left.label()
+        right_registers, _ = right.label()
+        registers, pure = self.label()
+
+        # Calls and reads must keep the right-to-left evaluation order.
+        if pure and left_registers >= right_registers:
+            yield left.generate(symbol_table, context, target, free)
+            yield right.generate(symbol_table, context, temporary, rest)
+        else:
+            yield right.generate(symbol_table, context, temporary, (target,) + rest)
+            yield left.generate(symbol_table, context, target, rest)
+        return self.value, temporary, rest
+
+    @staticmethod
+    def _apply(asm, operator, target, operand, free):
+        if operator == '+':
+            asm.write(f'ADD {target}, {operand}')
+        elif operator == '-':
+            asm.write(f'SUB {target}, {operand}')
+        elif operator == '*':
+            if operand.lstrip('-').isdigit():
+                multiply(asm, target, int(operand))
+            else:
+                asm.write(f'IMUL {target}, {operand}')
+        elif operator == '/':
+            divide(asm, target, operand, free)
+        elif operator in BinOpNode.conditions:
+            compare(asm, target, operand, BinOpNode.conditions[operator])
+        elif operator == 'and':
+            asm.write(f'AND {target}, {operand}')
+        elif operator == 'or':
+            asm.write(f'OR {target}, {operand}')
+        elif operator == '..':
             # Operator .. ASM code generation not implemented
             pass
 
-class UnOpNode(Node):
+class UnOpNode(ExpressionNode):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ('expression',)
 
-    def evaluate(self, symbol_table):
-        # This node does not do ASM code generation
-        if self.value == '+':
-            return self.children[0].evaluate(symbol_table)[0], 'INT'
-        elif self.value == '-':
-            return -self.children[0].evaluate(symbol_table)[0], 'INT'
+    def __init__(self, value, expression):
+        super().__init__(value)
+        self.expression = expression
+
+    def label(self):
+        node = self.expression
+        while isinstance(node, UnOpNode):
+            node = node.expression
+        return node.label()
+
+    def generate(self, symbol_table, context, target, free):
+        asm = context.asm
+        yield self.expression.generate(symbol_table, context, target, free)
+        if self.value == '-':
+            asm.write(f'NEG {target}')
         elif self.value == 'not':
-            return not self.children[0].evaluate(symbol_table)[0], 'INT'
+            compare(asm, target, 'False', 'E')
 
-class IntValNode(Node):
+    # Negation does not change whether a value is zero. A chain of unary
+    # operators is followed in a loop, like the one in label().
+    def branch(self, symbol_table, context, label, when):
+        node = self
+        while isinstance(node, UnOpNode):
+            if node.value == 'not':
+                when = not when
+            node = node.expression
+        return node.branch(symbol_table, context, label, when)
 
-    def __init__(self, value=None):
-        super().__init__(value)
+class IntValNode(ExpressionNode):
+
+    __slots__ = ()
+
+    def generate(self, symbol_table, context, target, free):
+        context.asm.write(f'MOV {target}, {self.value}')
 
-    def evaluate(self, symbol_table):
-        ASM.write(f'MOV EAX, {self.value}\n')
+    def branch(self, symbol_table, context, label, when):
+        if (self.value != 0) == when:
+            context.asm.write(f'JMP {label}')
 
 class FuncDecNode(Node):
 
+    __slots__ = ('children',)
+
     def __init__(self, value=None):
         super().__init__(value)
+        self.children = []
 
-    def evaluate(self, symbol_table):
-        FuncTable.set(self.children[0].value, self)
-        ASM.write(f'JMP END_FUNC_{self.children[0].value}\n')
+    def evaluate(self, symbol_table, context):
+        asm = context.asm
+        context.functions.set(self.children[0].value, tuple(child.identifier.value for child in self.children[1:-1]))
+        asm.write(f'JMP END_FUNC_{self.children[0].value}')
 
-        ASM.write(f'{self.children[0].value}:\n')
-        ASM.write(f'PUSH EBP\n')
-        ASM.write(f'MOV EBP, ESP\n')
+        asm.write(f'{self.children[0].value}:')
+        asm.write(f'PUSH EBP')
+        asm.write(f'MOV EBP, ESP')
+        frame = self.children[-1].frame()
+        if frame:
+            asm.write(f'SUB ESP, {4 * frame}')
+        asm.write(f'BEGIN_FUNC_{self.children[0].value}:')
 
         local_symbol_table = SymbolTable()
         for i in range(1, len(self.children) - 1):
-            key = self.children[i].children[0].value
-            local_symbol_table.create(key, shift=4, sign=-1)
+            local_symbol_table.create_parameter(self.children[i].identifier.value)
 
-        self.children[-1].evaluate(local_symbol_table)
+        enclosing_function = context.function
+        context.function = self.children[0].value
+        yield self.children[-1].evaluate(local_symbol_table, context)
+        context.function = enclosing_function
 
-        ASM.write('MOV ESP, EBP\n')
-        ASM.write('POP EBP\n')
-        ASM.write('RET\n')
+        asm.epilogue(False)
 
-        ASM.write(f'END_FUNC_{self.children[0].value}:\n')
+        asm.write(f'END_FUNC_{self.children[0].value}:')
 
-class FuncCallNode(Node):
+class FuncCallNode(ExpressionNode):
+
+    __slots__ = ('children',)
 
     def __init__(self, value=None):
         super().__init__(value)
+        self.children = []
 
-    def evaluate(self, symbol_table):
+    def label(self):
+        return 1, False
 
-        func = FuncTable.get(self.value)
-        if len(func.children) - 2 != len(self.children):
-            raise RuntimeError(f'Function {self.value} expects {len(func.children) - 2} arguments, {len(self.children)} given.')
+    # Only the parameter names of a declaration are kept, so the trees of
+    # functions already generated can be freed.
+    def _declaration(self, context):
+        parameters = context.functions.get(self.value)
+        if parameters is None:
+            raise RuntimeError(f'Function {self.value} is not declared.')
+        if len(parameters) != len(self.children):
+            raise RuntimeError(f'Function {self.value} expects {len(parameters)} arguments, {len(self.children)} given.')
+        return parameters
+
+    def generate(self, symbol_table, context, target, free):
+        asm = context.asm
+
+        self._declaration(context)
+
+        # Compiled functions do not preserve any register.
+        live = live_registers(target, free)
+        for register in live:
+            asm.write(f'PUSH {register}')
+
+        for i in range(len(self.children)-1, -1, -1):
+            yield self.children[i].evaluate(symbol_table, context)
+            asm.write('PUSH EAX')
+
+        asm.write(f'CALL {self.value}')
+        asm.write(f'ADD ESP, {4 * len(self.children)}')
+        if target != 'EAX':
+            asm.write(f'MOV {target}, EAX')
+
+        for register in reversed(live):
+            asm.write(f'POP {register}')
+
+    # A call to the enclosing function in return position reuses its frame:
+    # the arguments overwrite the parameter slots and the body starts over.
+    def tail_call(self, symbol_table, context):
+        asm = context.asm
+
+        parameters = self._declaration(context)
 
         for i in range(len(self.children)-1, -1, -1):
-            self.children[i].evaluate(symbol_table)
-            ASM.write('PUSH EAX\n')
+            yield self.children[i].evaluate(symbol_table, context)
+            asm.write('PUSH EAX')
+
+        for parameter in parameters:
+            address = symbol_table.get_parameter(parameter)
+            asm.write(f'POP DWORD [EBP+{abs(address)}]')
 
-        ASM.write(f'CALL {self.value}\n')
-        ASM.write(f'ADD ESP, {4 * len(self.children)}\n')
+        asm.write(f'JMP BEGIN_FUNC_{self.value}')
 
 class ReturnNode(Node):
 
-        def __init__(self, value=None):
-            super().__init__(value)
+        __slots__ = ('expression',)
 
-        def evaluate(self, symbol_table):
-            self.children[0].evaluate(symbol_table)
-            ASM.write('MOV ESP, EBP\n')
-            ASM.write('POP EBP\n')
-            ASM.write(f'RET\n')
+        def __init__(self, expression):
+            super().__init__()
+            self.expression = expression
 
-class StringNode(Node):
+        def evaluate(self, symbol_table, context):
+            asm = context.asm
+            if isinstance(self.expression, FuncCallNode) and self.expression.value == context.function:
+                yield self.expression.tail_call(symbol_table, context)
+                return
+            yield self.expression.evaluate(symbol_table, context)
+            asm.epilogue(context.function is None)
 
-    def __init__(self, value=None):
-        super().__init__(value)
+class StringNode(ExpressionNode):
 
-    def evaluate(self, symbol_table):
+    __slots__ = ()
+
+    def generate(self, symbol_table, context, target, free):
         # This node does not do ASM code generation
-        return str(self.value), 'STRING'
+        pass
 
 class NoOpNode(Node):
 
-    def __init__(self, value=None):
-        super().__init__(value)
+    __slots__ = ()
 
-    def evaluate(self, symbol_table):
+    def evaluate(self, symbol_table, context):
         pass
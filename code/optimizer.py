@@ -0,0 +1,229 @@
+from .nodes import (
+    BinOpNode, IntValNode, UnOpNode, PrintNode, AssigmentNode, BlockNode,
+    ReadNode, IfNode, WhileNode, VarDecNode, ReturnNode, FuncDecNode,
+    FuncCallNode, IdentifierNode, is_boolean
+)
+from .tree import walk, is_call_to, is_pure, exposes_short_circuit, trampoline
+from .inliner import Inliner
+
+ACCUMULATOR = '.accumulator'
+
+def wrap(value):
+    value &= 0xFFFFFFFF
+    return value - 0x100000000 if value & 0x80000000 else value
+
+def divide(a, b):
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+# IDIV traps on a zero divisor and on INT_MIN / -1, whose quotient does not
+# fit in 32 bits. A constant divisor never gets there unless it is zero:
+# it becomes shifts or a multiply, and -1 a negation that wraps.
+def traps(dividend, divisor, constant=False):
+    return divisor == 0 or not constant and divisor == -1 and dividend == -2 ** 31
+
+class Optimizer:
+
+    binops = {
+        '+'     : lambda a, b: a + b,
+        '-'     : lambda a, b: a - b,
+        '*'     : lambda a, b: a * b,
+        '/'     : divide,
+        '>'     : lambda a, b: int(a > b),
+        '<'     : lambda a, b: int(a < b),
+        '=='    : lambda a, b: int(a == b),
+        'and'   : lambda a, b: a & b,
+        'or'    : lambda a, b: a | b,
+    }
+
+    identities = {'+': 0, '*': 1}
+
+    def __init__(self, inline_budget=24, evaluator=None):
+        self.inliner = Inliner(inline_budget)
+        self.evaluator = evaluator
+
+    def run(self, ast_root):
+        self.inliner.run(ast_root)
+        self._accumulate(ast_root)
+        if self.evaluator is not None:
+            self.evaluator.run(ast_root)
+        return trampoline(self._optimize(ast_root))
+
+    # Rewrites linear recursions such as 'return n * f(n - 1)' to carry the
+    # pending operation in an extra parameter, so that every recursive call
+    # becomes a tail call.
+    def _accumulate(self, ast_root):
+        declarations = {}
+        for node in walk(ast_root):
+            if isinstance(node, FuncDecNode):
+                declarations.setdefault(node.children[0].value, []).append(node)
+
+        for name, functions in declarations.items():
+            if len(functions) != 1:
+                continue
+            function = functions[0]
+            operator = self._accumulator_operator(function)
+            if operator is None:
+                continue
+
+            body_nodes = {id(node) for node in walk(function)}
+            for node in walk(ast_root):
+                if is_call_to(node, name) and id(node) not in body_nodes:
+                    node.children.append(IntValNode(self.identities[operator]))
+
+            for node in walk(function.children[-1]):
+                if not isinstance(node, ReturnNode):
+                    continue
+                expression = node.expression
+                if is_call_to(expression, name):
+                    expression.children.append(IdentifierNode(ACCUMULATOR))
+                elif isinstance(expression, BinOpNode) and is_call_to(expression.left, name):
+                    expression.left.children.append(BinOpNode(operator, IdentifierNode(ACCUMULATOR), expression.right))
+                    node.expression = expression.left
+                elif isinstance(expression, BinOpNode) and is_call_to(expression.right, name):
+                    expression.right.children.append(BinOpNode(operator, IdentifierNode(ACCUMULATOR), expression.left))
+                    node.expression = expression.right
+                else:
+                    node.expression = BinOpNode(operator, IdentifierNode(ACCUMULATOR), expression)
+
+            function.children.insert(-1, VarDecNode(IdentifierNode(ACCUMULATOR)))
+
+    def _accumulator_operator(self, function):
+        name = function.children[0].value
+        body = function.children[-1]
+        operator = None
+        calls = 0
+        accounted = 0
+
+        for node in walk(body):
+            if is_call_to(node, name):
+                calls += 1
+            if not isinstance(node, ReturnNode):
+                continue
+            expression = node.expression
+            if is_call_to(expression, name):
+                accounted += 1
+            elif isinstance(expression, BinOpNode) and expression.value in self.identities:
+                if is_call_to(expression.left, name):
+                    other = expression.right
+                elif is_call_to(expression.right, name):
+                    other = expression.left
+                else:
+                    continue
+                # The other operand moves in front of the recursive call.
+                if not is_pure(other) or operator not in (None, expression.value):
+                    return None
+                operator = expression.value
+                accounted += 1
+
+        if operator is None or calls != accounted:
+            return None
+        return operator
+
+    # The passes below are generators run by trampoline(), so how deeply
+    # blocks and expressions nest is limited only by memory.
+    def _optimize(self, node):
+        if isinstance(node, BlockNode):
+            children = []
+            for child in node.children:
+                child = yield self._optimize(child)
+                # A call evaluated at compile time leaves nothing to run.
+                if not isinstance(child, IntValNode):
+                    children.append(child)
+            node.children = children
+        elif isinstance(node, (FuncDecNode, FuncCallNode)):
+            children = []
+            for child in node.children:
+                children.append((yield self._optimize(child)))
+            node.children = children
+            value = None if self.evaluator is None or isinstance(node, FuncDecNode) else self.evaluator.call(node)
+            if value is not None:
+                return IntValNode(value)
+        elif isinstance(node, (VarDecNode, AssigmentNode)):
+            if node.expression is not None:
+                node.expression = yield self._optimize(node.expression)
+        elif isinstance(node, (PrintNode, ReturnNode)):
+            node.expression = yield self._optimize(node.expression)
+        elif isinstance(node, WhileNode):
+            node.condition = yield self._condition(node.condition)
+            node.block = yield self._optimize(node.block)
+        elif isinstance(node, IfNode):
+            node.condition = yield self._condition(node.condition)
+            node.block = yield self._optimize(node.block)
+            node.else_block = yield self._optimize(node.else_block)
+        elif isinstance(node, BinOpNode):
+            return (yield self._fold_binop(node))
+        elif isinstance(node, UnOpNode):
+            return (yield self._fold_unop(node))
+        return node
+
+    # An if or while branches on not, and on and/or over boolean operands,
+    # logically rather than bitwise, so constants at the top of a condition
+    # fold by their truth value.
+    def _condition(self, node, boolean=False):
+        if isinstance(node, UnOpNode) and node.value != 'not':
+            return (yield self._condition(node.expression, boolean))
+        if isinstance(node, UnOpNode):
+            expression = node.expression = yield self._condition(node.expression, boolean)
+            if isinstance(expression, IntValNode):
+                return IntValNode(int(expression.value == 0))
+            return node
+        if isinstance(node, BinOpNode) and node.value in ('and', 'or') and (boolean or is_boolean(node)):
+            left = node.left = yield self._condition(node.left, True)
+            right = node.right = yield self._condition(node.right, True)
+            if isinstance(left, IntValNode) and isinstance(right, IntValNode):
+                if node.value == 'and':
+                    return IntValNode(int(left.value != 0 and right.value != 0))
+                return IntValNode(int(left.value != 0 or right.value != 0))
+            return node
+        return (yield self._optimize(node))
+
+    def _fold_binop(self, node):
+        left = node.left = yield self._optimize(node.left)
+        right = node.right = yield self._optimize(node.right)
+        operator = node.value
+        left_constant = isinstance(left, IntValNode)
+        right_constant = isinstance(right, IntValNode)
+
+        if operator not in self.binops:
+            return node
+
+        if left_constant and right_constant:
+            if operator == '/' and traps(left.value, right.value, True):
+                return node
+            return IntValNode(wrap(self.binops[operator](left.value, right.value)))
+
+        if right_constant:
+            constant, other = right.value, left
+        elif left_constant:
+            constant, other = left.value, right
+        else:
+            return node
+
+        if operator in ('+', '-', '*', '/') and exposes_short_circuit(other):
+            return node
+        if operator in ('+', 'or') and constant == 0:
+            return other
+        if operator == '-' and right_constant and constant == 0:
+            return other
+        if operator == '*' and constant == 1:
+            return other
+        if operator == '/' and right_constant and constant == 1:
+            return other
+        if operator in ('*', 'and') and constant == 0 and is_pure(other):
+            return IntValNode(0)
+        return node
+
+    def _fold_unop(self, node):
+        expression = node.expression = yield self._optimize(node.expression)
+
+        if node.value == '+':
+            return expression
+        if isinstance(expression, IntValNode):
+            if node.value == '-':
+                return IntValNode(wrap(-expression.value))
+            if node.value == 'not':
+                return IntValNode(int(expression.value == 0))
+        if node.value == '-' and isinstance(expression, UnOpNode) and expression.value == '-':
+            return expression.expression
+        return node
@@ -0,0 +1,417 @@
+from .ir import Temp, Instruction, Block, BINARY_OPERATORS, SIDE_EFFECTS
+from .optimizer import Optimizer, wrap
+from .loops import find_loops, Dominators
+
+# Registers the backend can hold across a loop while leaving one for the
+# temporaries of each instruction.
+LOOP_REGISTERS = 3
+
+CONDITIONS = {
+    '>'     : lambda a, b: a > b,
+    '<'     : lambda a, b: a < b,
+    '>='    : lambda a, b: a >= b,
+    '<='    : lambda a, b: a <= b,
+    '=='    : lambda a, b: a == b,
+    '!='    : lambda a, b: a != b,
+}
+
+def optimize(program, loops=True):
+    for function in [program.main] + program.functions:
+        simplify(function)
+        if loops and optimize_loops(function):
+            simplify(function)
+        reorder_blocks(function)
+    return program
+
+def simplify(function):
+    for _ in range(4):
+        changed = propagate_copies(function)
+        changed |= propagate_constants(function)
+        changed |= thread_jumps(function)
+        changed |= eliminate_dead_code(function)
+        if not changed:
+            break
+
+# Forward copy and constant propagation inside each block, folding the
+# instructions whose operands all become constants. A temporary copied into
+# a variable right after being computed is computed into the variable instead.
+def propagate_copies(function):
+    changed = False
+    for block in function.blocks:
+        copies = {}
+        for index, instruction in enumerate(block.instructions):
+            for i in instruction.operand_indices():
+                operand = instruction.args[i]
+                if not isinstance(operand, int) and operand in copies:
+                    instruction.args[i] = copies[operand]
+                    changed = True
+
+            folded = fold(instruction)
+            if folded is not None:
+                block.instructions[index] = instruction = folded
+                changed = True
+
+            dest = instruction.dest
+            if dest is None:
+                continue
+            for key in [key for key, value in copies.items() if key == dest or value == dest]:
+                del copies[key]
+            if instruction.op == 'copy' and instruction.args[0] != dest:
+                copies[dest] = instruction.args[0]
+
+    return coalesce(function) or changed
+
+# A temporary or local assigned a constant once, where that assignment
+# dominates every read, is replaced by the constant across blocks.
+def propagate_constants(function):
+    definitions = {}
+    for block in function.blocks:
+        for index, instruction in enumerate(block.instructions):
+            if instruction.dest is not None:
+                definitions.setdefault(instruction.dest, []).append((block.label, index, instruction))
+    constants = {}
+    for dest, found in definitions.items():
+        if len(found) == 1 and found[0][2].op == 'copy' and isinstance(found[0][2].args[0], int) and dest not in function.parameters:
+            constants[dest] = found[0]
+    if not constants:
+        return False
+
+    dominance = Dominators(function)
+    changed = False
+    for block in function.blocks:
+        if block.label not in dominance:
+            continue
+        for index, instruction in enumerate(block.instructions):
+            for i in instruction.operand_indices():
+                operand = instruction.args[i]
+                if isinstance(operand, int) or operand not in constants:
+                    continue
+                label, position, definition = constants[operand]
+                if dominance.dominates(label, block.label) and (label != block.label or position < index):
+                    instruction.args[i] = definition.args[0]
+                    changed = True
+    return changed
+
+def fold(instruction):
+    op, args = instruction.op, instruction.args
+    if op in BINARY_OPERATORS and op != '..' and isinstance(args[0], int) and isinstance(args[1], int):
+        if op == '/' and args[1] == 0:
+            return None
+        return Instruction('copy', instruction.dest, [wrap(Optimizer.binops[op](args[0], args[1]))])
+    if op in ('+', '-', '*') and isinstance(args[1], int) or op in ('+', '*') and isinstance(args[0], int):
+        other, constant = (args[0], args[1]) if isinstance(args[1], int) else (args[1], args[0])
+        if constant == 0 and op == '*':
+            return Instruction('copy', instruction.dest, [0])
+        if constant == 0 and op in ('+', '-') or constant == 1 and op == '*':
+            return Instruction('copy', instruction.dest, [other])
+    if op == 'neg' and isinstance(args[0], int):
+        return Instruction('copy', instruction.dest, [wrap(-args[0])])
+    if op == 'not' and isinstance(args[0], int):
+        return Instruction('copy', instruction.dest, [int(args[0] == 0)])
+    if op == 'branch' and isinstance(args[1], int) and isinstance(args[2], int):
+        return Instruction('jump', None, [args[3] if CONDITIONS[args[0]](args[1], args[2]) else args[4]])
+    if op == 'branch' and args[3] == args[4]:
+        return Instruction('jump', None, [args[3]])
+    return None
+
+def coalesce(function):
+    uses = {}
+    for block in function.blocks:
+        for instruction in block.instructions:
+            for operand in instruction.uses():
+                if isinstance(operand, Temp):
+                    uses[operand] = uses.get(operand, 0) + 1
+
+    changed = False
+    for block in function.blocks:
+        instructions = block.instructions
+        for index in range(len(instructions) - 1, 0, -1):
+            copy, definition = instructions[index], instructions[index - 1]
+            if copy.op == 'copy' and isinstance(copy.args[0], Temp) and copy.args[0] is definition.dest \
+                    and uses[copy.args[0]] == 1:
+                definition.dest = copy.dest
+                del instructions[index]
+                changed = True
+    return changed
+
+# Removes blocks that cannot be reached, then every instruction without side
+# effects whose result is never read, using liveness over the whole CFG.
+def eliminate_dead_code(function):
+    blocks = function.block_map()
+    reachable, stack = set(), [function.entry.label]
+    while stack:
+        label = stack.pop()
+        if label not in reachable:
+            reachable.add(label)
+            stack.extend(blocks[label].successors())
+    changed = len(reachable) != len(function.blocks)
+    function.blocks = [block for block in function.blocks if block.label in reachable]
+
+    live_in = liveness(function)
+    for block in function.blocks:
+        live = set()
+        for successor in block.successors():
+            live |= live_in[successor]
+        kept = []
+        for instruction in reversed(block.instructions):
+            dest = instruction.dest
+            if dest is not None and dest not in live:
+                if not instruction.has_side_effects():
+                    changed = True
+                    continue
+                if instruction.op in SIDE_EFFECTS:
+                    instruction.dest = None
+            if dest is not None:
+                live.discard(dest)
+            live.update(instruction.uses())
+            kept.append(instruction)
+        kept.reverse()
+        block.instructions = kept
+
+    used = {operand for block in function.blocks for instruction in block.instructions for operand in instruction.uses() + [instruction.dest]}
+    function.locals = [name for name in function.locals if name in used]
+    return changed
+
+def liveness(function):
+    gen, kill = {}, {}
+    for block in function.blocks:
+        used, defined = set(), set()
+        for instruction in block.instructions:
+            used.update(operand for operand in instruction.uses() if operand not in defined)
+            if instruction.dest is not None:
+                defined.add(instruction.dest)
+        gen[block.label], kill[block.label] = used, defined
+
+    live_in = {block.label: set() for block in function.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(function.blocks):
+            live_out = set()
+            for successor in block.successors():
+                live_out |= live_in[successor]
+            new = gen[block.label] | (live_out - kill[block.label])
+            if new != live_in[block.label]:
+                live_in[block.label] = new
+                changed = True
+    return live_in
+
+# Jumps to a block that only jumps on go straight to the final target, and a
+# block reached by a single jump is merged into its predecessor.
+def thread_jumps(function):
+    entry = function.entry.label
+    forward = {}
+    for block in function.blocks:
+        if block.label != entry and len(block.instructions) == 1 and block.terminator.op == 'jump':
+            forward[block.label] = block.terminator.args[0]
+
+    # Where a chain ends is kept for every label on it, so a long chain is
+    # walked once. Chains that loop back on themselves are not kept.
+    final, ends = {}, {}
+    for label in forward:
+        target, seen = label, {label}
+        while target in forward and forward[target] not in seen:
+            if target in ends:
+                target = ends[target]
+                break
+            target = forward[target]
+            seen.add(target)
+        if target not in forward:
+            ends.update(dict.fromkeys(seen, target))
+        if target != label:
+            final[label] = target
+
+    changed = False
+    for block in function.blocks:
+        terminator = block.terminator
+        targets = terminator.targets()
+        terminator.retarget(final)
+        changed |= targets != terminator.targets()
+        folded = fold(terminator)
+        if folded is not None:
+            block.instructions[-1] = folded
+            changed = True
+
+    blocks = function.block_map()
+    predecessors = function.predecessors()
+    merged = set()
+    for block in function.blocks:
+        if block.label in merged:
+            continue
+        while True:
+            terminator = block.terminator
+            if terminator.op != 'jump':
+                break
+            target = terminator.args[0]
+            if target == entry or target == block.label or len(predecessors[target]) != 1 or target in merged:
+                break
+            block.instructions[-1:] = blocks[target].instructions
+            merged.add(target)
+            changed = True
+    function.blocks = [block for block in function.blocks if block.label not in merged]
+    return changed
+
+# Lays blocks out so that a block reached by a single jump follows it and
+# the backend can drop the jump. Other blocks keep the lowering order, which
+# already puts loop conditions after their bodies.
+def reorder_blocks(function):
+    blocks = function.block_map()
+    predecessors = function.predecessors()
+    placed, layout = set(), []
+    for block in function.blocks:
+        while block is not None and block.label not in placed:
+            placed.add(block.label)
+            layout.append(block)
+            block = None
+            terminator = layout[-1].terminator
+            for target in terminator.targets():
+                if target not in placed and len(predecessors[target]) == 1:
+                    block = blocks[target]
+                    break
+    function.blocks = layout
+
+# Loops are visited innermost first, and found again after each one since
+# the preheaders added for an inner loop belong to the loops around it.
+def optimize_loops(function):
+    changed, done = False, set()
+    while True:
+        loop = next((loop for loop in find_loops(function) if loop.header not in done), None)
+        if loop is None:
+            return changed
+        done.add(loop.header)
+        preheader = insert_preheader(function, loop)
+        changed |= hoist_invariants(function, loop, preheader)
+        changed |= reduce_strength(function, loop, preheader)
+
+# Returns the block that every entry into the loop passes through just
+# before the header, creating one when the header has several outside
+# predecessors or is the function's entry.
+def insert_preheader(function, loop):
+    header = loop.header
+    outside = [label for label in function.predecessors()[header] if label not in loop.blocks]
+    blocks = function.block_map()
+    if header != function.entry.label and len(outside) == 1:
+        block = blocks[outside[0]]
+        if block.terminator.op == 'jump':
+            return block
+
+    preheader = Block(f'PRE_{header}')
+    preheader.instructions.append(Instruction('jump', None, [header]))
+    for label in outside:
+        blocks[label].terminator.retarget({header: preheader.label})
+    position = min(index for index, block in enumerate(function.blocks) if block.label in loop.blocks)
+    function.blocks.insert(position, preheader)
+    return preheader
+
+def definitions(function, loop):
+    defined = {}
+    for block in function.blocks:
+        if block.label in loop.blocks:
+            for instruction in block.instructions:
+                if instruction.dest is not None:
+                    defined.setdefault(instruction.dest, []).append(instruction)
+    return defined
+
+# Moves computations whose operands do not change inside the loop to the
+# preheader. The result must have no other definition in the loop and, for
+# variables, must not be read before it is written or after the loop, so
+# running it once up front is unobservable. A division that can trap
+# stays put.
+def hoist_invariants(function, loop, preheader):
+    defined = definitions(function, loop)
+    live_in = liveness(function)
+    exits = {target for block in function.blocks if block.label in loop.blocks for target in block.successors()} - loop.blocks
+
+    def hoistable(instruction):
+        op, dest = instruction.op, instruction.dest
+        if op not in BINARY_OPERATORS and op not in ('copy', 'neg', 'not'):
+            return False
+        if op == '/' and instruction.has_side_effects():
+            return False
+        if len(defined[dest]) != 1 or dest in live_in[loop.header]:
+            return False
+        if not isinstance(dest, Temp) and any(dest in live_in[label] for label in exits):
+            return False
+        return all(isinstance(operand, int) or operand not in defined or defined[operand][0] in invariant
+                   for operand in instruction.uses())
+
+    invariant = []
+    found = True
+    while found:
+        found = False
+        for block in function.blocks:
+            if block.label not in loop.blocks:
+                continue
+            for instruction in block.instructions:
+                if instruction not in invariant and hoistable(instruction):
+                    invariant.append(instruction)
+                    found = True
+
+    if not invariant:
+        return False
+    for block in function.blocks:
+        if block.label in loop.blocks:
+            block.instructions = [instruction for instruction in block.instructions if instruction not in invariant]
+    preheader.instructions[-1:-1] = invariant
+    return True
+
+# A variable changed only by a constant step is an induction variable, and
+# its product with a loop invariant is kept in a variable of its own that
+# the preheader initialises and each step advances by step times the
+# invariant, which replaces the multiplication with an addition.
+def reduce_strength(function, loop, preheader):
+    defined = definitions(function, loop)
+    steps = {}
+    for dest, instructions in defined.items():
+        instruction = instructions[0]
+        if len(instructions) != 1 or instruction.op not in ('+', '-'):
+            continue
+        left, right = instruction.args
+        if left == dest and isinstance(right, int):
+            steps[dest] = (instruction, right if instruction.op == '+' else -right)
+        elif right == dest and isinstance(left, int) and instruction.op == '+':
+            steps[dest] = (instruction, left)
+
+    products = []
+    for block in function.blocks:
+        if block.label in loop.blocks:
+            for instruction in block.instructions:
+                if instruction.op == '*':
+                    left, right = instruction.args
+                    if right in steps and left not in steps:
+                        left, right = right, left
+                    if left in steps and (isinstance(right, int) or right not in defined):
+                        products.append((block, instruction, left, right))
+
+    if not products:
+        return False
+    # Each product takes a register for the whole loop, which only pays off
+    # while the values already live around the loop leave one spare.
+    spare = LOOP_REGISTERS - len(liveness(function)[loop.header])
+    reduced = {}
+    for block, instruction, variable, factor in products:
+        key = (variable, factor)
+        if key not in reduced and len(reduced) >= spare:
+            continue
+        if key not in reduced:
+            name = reduced[key] = f'{variable}*{factor}'
+            function.locals.append(name)
+            preheader.instructions.insert(-1, Instruction('*', name, [variable, factor]))
+            update, step = steps[variable]
+            if isinstance(factor, int):
+                advance = Instruction('+', name, [name, wrap(step * factor)])
+            else:
+                increment = new_temporary(function)
+                preheader.instructions.insert(-1, Instruction('*', increment, [factor, step]))
+                advance = Instruction('+', name, [name, increment])
+            for other in function.blocks:
+                if update in other.instructions:
+                    other.instructions.insert(other.instructions.index(update) + 1, advance)
+                    break
+        block.instructions[block.instructions.index(instruction)] = Instruction('copy', instruction.dest, [reduced[key]])
+    return bool(reduced)
+
+def new_temporary(function):
+    numbers = [operand.number for block in function.blocks for instruction in block.instructions
+               for operand in [instruction.dest] + instruction.args if isinstance(operand, Temp)]
+    return Temp(max(numbers, default=0) + 1)
@@ -0,0 +1,148 @@
+REGISTERS = ('EAX', 'EBX', 'ECX', 'EDX', 'ESI', 'EDI', 'R8D', 'R9D', 'R10D', 'R11D', 'R12D', 'R13D', 'R14D', 'R15D')
+
+RULES = []
+
+# Registers a rule for the default pass. A rule sees the last size emitted
+# instructions and returns their replacement, or None when it does not apply.
+def rule(size):
+    def register(function):
+        RULES.append((function.__name__, size, function))
+        return function
+    return register
+
+def parse(instruction):
+    mnemonic, _, operands = instruction.partition(' ')
+    return mnemonic, [operand.strip() for operand in operands.split(',')] if operands else []
+
+def is_label(instruction):
+    return instruction.endswith(':')
+
+def memory(operand):
+    operand = operand.removeprefix('DWORD ')
+    return operand if operand.startswith('[') else None
+
+def jump(instruction):
+    mnemonic, operands = parse(instruction)
+    if mnemonic.startswith('J') and len(operands) == 1:
+        return mnemonic, operands[0]
+    return None, None
+
+class Peephole:
+
+    def __init__(self, rules=None):
+        self.rules = list(RULES if rules is None else rules)
+        self.hits = {name: 0 for name, _, _ in self.rules}
+        self.jumps = {}
+
+    def register(self, function, size):
+        self.rules.append((function.__name__, size, function))
+        self.hits.setdefault(function.__name__, 0)
+
+    # Instructions move one at a time from pending to output, and every rule
+    # is tried on the tail of output. A replacement goes back onto pending,
+    # so it is matched again together with the code around it.
+    def run(self, instructions):
+        self.jumps = self._jumps(instructions)
+        pending = list(reversed(instructions))
+        output = []
+        while pending:
+            output.append(pending.pop())
+            for name, size, function in self.rules:
+                if len(output) < size:
+                    continue
+                replacement = function(output[-size:], self)
+                if replacement is not None:
+                    del output[-size:]
+                    pending.extend(reversed(replacement))
+                    self.hits[name] += 1
+                    break
+        return output
+
+    # Labels whose first instruction is an unconditional jump, and where to.
+    @staticmethod
+    def _jumps(instructions):
+        jumps = {}
+        labels = []
+        for instruction in instructions:
+            if is_label(instruction):
+                labels.append(instruction[:-1])
+                continue
+            mnemonic, target = jump(instruction)
+            if mnemonic == 'JMP':
+                jumps.update((label, target) for label in labels)
+            labels = []
+        return jumps
+
+    # Labels passed on the way are pointed straight at the end of the chain,
+    # so a chain is walked once rather than once for every jump into it. A
+    # chain that loops back on itself is left as it is.
+    def final_target(self, label):
+        path, seen = [label], {label}
+        while label in self.jumps and self.jumps[label] not in seen:
+            label = self.jumps[label]
+            path.append(label)
+            seen.add(label)
+        if label not in self.jumps:
+            for passed in path[:-1]:
+                self.jumps[passed] = label
+        return label
+
+@rule(2)
+def push_pop(window, peephole):
+    push, pop = (parse(instruction) for instruction in window)
+    if push[0] != 'PUSH' or pop[0] != 'POP' or any('ESP' in operand or 'RSP' in operand for operand in push[1] + pop[1]):
+        return None
+    source, destination = push[1][0], pop[1][0]
+    if source == destination:
+        return []
+    if destination in REGISTERS:
+        return [f"MOV {destination}, {source.removeprefix('DWORD ')}"]
+    if source in REGISTERS:
+        return [f'MOV {memory(destination)}, {source}']
+    return None
+
+@rule(2)
+def store_load(window, peephole):
+    store, load = (parse(instruction) for instruction in window)
+    if store[0] != 'MOV' or load[0] != 'MOV':
+        return None
+    address, register = store[1]
+    destination, source = load[1]
+    if memory(address) is None or memory(address) != memory(source) or register not in REGISTERS:
+        return None
+    if destination == register:
+        return window[:1]
+    if destination in REGISTERS:
+        return [window[0], f'MOV {destination}, {register}']
+    return None
+
+@rule(2)
+def unreachable(window, peephole):
+    mnemonic, _ = parse(window[0])
+    if mnemonic in ('JMP', 'RET') and not is_label(window[1]):
+        return window[:1]
+    return None
+
+@rule(2)
+def jump_to_next(window, peephole):
+    mnemonic, target = jump(window[0])
+    if mnemonic == 'JMP' and window[1] == f'{target}:':
+        return window[1:]
+    return None
+
+@rule(3)
+def jump_over_labels(window, peephole):
+    mnemonic, target = jump(window[0])
+    if mnemonic == 'JMP' and is_label(window[1]) and window[2] == f'{target}:':
+        return window[1:]
+    return None
+
+@rule(1)
+def jump_chain(window, peephole):
+    mnemonic, target = jump(window[0])
+    if mnemonic is None:
+        return None
+    final = peephole.final_target(target)
+    if final == target:
+        return None
+    return [f'{mnemonic} {final}']
@@ -1,6 +0,0 @@
-import re
-
-def filter(code):
-    pattern = r'--.*'
-    return re.sub(pattern, '', code)
-    
\ No newline at end of file
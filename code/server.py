@@ -0,0 +1,125 @@
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+
+from .driver import run
+
+def socket_path(path=None):
+    return path or os.environ.get('LUA_COMPILER_SOCKET', f'/tmp/lua-compiler-{os.getuid()}.sock')
+
+class Metrics:
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+        self.active = 0
+
+    def start(self):
+        with self.lock:
+            self.active += 1
+
+    def record(self, seconds, status):
+        with self.lock:
+            self.active -= 1
+            self.requests += 1
+            self.failures += status != 0
+            self.latencies.append(seconds * 1000)
+
+    # Percentiles cover the most recent requests only.
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            summary = {'requests': self.requests, 'failures': self.failures, 'active': self.active}
+        if latencies:
+            summary['mean_ms'] = round(sum(latencies) / len(latencies), 3)
+            for name, fraction in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+                summary[name] = round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 3)
+            summary['max_ms'] = round(latencies[-1], 3)
+        return summary
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = self.parse(line)
+        except (ValueError, KeyError, TypeError) as error:
+            # A request that cannot be read still gets an answer, so its
+            # client does not wait for one or find the connection closed.
+            reply = {'status': 2, 'log': f'main.py: error: malformed request: {type(error).__name__}: {error}\n', 'output': '', 'milliseconds': 0.0}
+        else:
+            if request.get('metrics'):
+                reply = self.server.metrics.summary()
+            else:
+                reply = self.compile(request['argv'], request['cwd'])
+        self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+    # A request is a JSON object asking for the metrics, or with the command
+    # line as a list of strings and the directory it was given in.
+    def parse(self, line):
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise TypeError(f'expected an object, not {type(request).__name__}')
+        if request.get('metrics'):
+            return request
+        argv, cwd = request['argv'], request['cwd']
+        if not isinstance(argv, list) or not all(isinstance(argument, str) for argument in argv):
+            raise TypeError('argv must be a list of strings')
+        if cwd is not None and not isinstance(cwd, str):
+            raise TypeError('cwd must be a string')
+        return request
+
+    # Each request gets its own log and compilation state; a failing request
+    # is reported to its client and does not affect the others. Programs
+    # run with --run get no input and send their output back with the log.
+    def compile(self, argv, cwd):
+        log, output = io.StringIO(), io.StringIO()
+        self.server.metrics.start()
+        start = time.perf_counter()
+        try:
+            status = run(argv, cwd, log, io.StringIO(), output)
+        except SystemExit as error:
+            status = error.code if isinstance(error.code, int) else 2
+        except Exception as error:
+            print(f'{type(error).__name__}: {error}', file=log)
+            status = 1
+        elapsed = time.perf_counter() - start
+        self.server.metrics.record(elapsed, status)
+        print(f"{elapsed * 1000:8.2f} ms  status {status}  {' '.join(argv)}", file=sys.stderr)
+        return {'status': status, 'log': log.getvalue(), 'output': output.getvalue(), 'milliseconds': elapsed * 1000}
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+def serve(path=None):
+    path = socket_path(path)
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX) as probe:
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.remove(path)
+            else:
+                raise RuntimeError(f'A compiler daemon is already listening on {path}.')
+    with Server(path, Handler) as server:
+        server.metrics = Metrics()
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print(f'listening on {path}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
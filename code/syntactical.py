@@ -1,5 +1,9 @@
-from .tokenizer import Tokenizer
-from .preprocessing import filter
+from .tokenizer import (
+    Tokenizer, TOKEN_TYPES, EOF, NEWLINE, COMMA, OPEN_PAR, CLOSE_PAR, BIGGER,
+    LOWER, MINUS, PLUS, MULT, DIV, CONCAT, EQUAL, ASSING, STRING, INT,
+    IDENTIFIER, PRINT, AND, OR, NOT, READ, IF, THEN, ELSE, WHILE, DO, END,
+    LOCAL, FUNCTION, RETURN
+)
 from .nodes import (
     BinOpNode, IntValNode, UnOpNode, PrintNode, AssigmentNode, BlockNode,
     IdentifierNode, NoOpNode, ReadNode, IfNode, WhileNode, StringNode,
@@ -10,271 +14,295 @@ class Parser:
 
     def __init__(self):
         self.tokenizer = None
+        self.position = 0
+        self.type = EOF
 
-    def run(self, raw_source):
-        source = filter(raw_source)
+    def run(self, source):
         self.tokenizer = Tokenizer(source)
-        self.tokenizer.select_next()
+        self.position = 0
+        self.type = self.tokenizer.types[0]
         ast_root = self._parse_block()
         return ast_root
-    
+
+    # Yields the top-level statements one at a time. Only the tokens of the
+    # statement being parsed are held, so a caller that drops each
+    # statement before asking for the next keeps memory flat.
+    def statements(self, source):
+        self.tokenizer = Tokenizer(source, statements=True)
+        while self.tokenizer.tokenize():
+            self.position = 0
+            self.type = self.tokenizer.types[0]
+            yield from self._parse_block().children
+        self.tokenizer = None
+
+    def _advance(self):
+        if self.type != EOF:
+            self.position += 1
+            self.type = self.tokenizer.types[self.position]
+
+    def _value(self):
+        return self.tokenizer.value(self.position)
+
     def _select_and_check_unexpected_token(self, select, *expected_tokens):
         if select:
-            self.tokenizer.select_next()
-        if self.tokenizer.next.type not in expected_tokens:
-            raise ValueError(f'Expected one of {expected_tokens} token types, got: {self.tokenizer.next.type}')
-
+            self._advance()
+        if self.type not in expected_tokens:
+            expected_names = tuple(TOKEN_TYPES[token] for token in expected_tokens)
+            raise ValueError(f'Expected one of {expected_names} token types, got: {TOKEN_TYPES[self.type]}')
+
+    # Statements that open a block are parsed up to their body and then
+    # wait on a stack for their END instead of recursing, so how deeply
+    # blocks nest is limited only by memory.
     def _parse_block(self):
 
         block_node = BlockNode()
+        block = block_node
+        # Each open if, while or function with the block taking statements.
+        opened = []
+
+        while True:
+            token = self.type
+            if not opened:
+                if token == EOF:
+                    return block_node
+            elif token == END:
+                statement, _ = opened.pop()
+                block = opened[-1][1] if opened else block_node
+                if not isinstance(statement, FuncDecNode):
+                    self._select_and_check_unexpected_token(True, NEWLINE, EOF)
+                self._advance()
+                continue
+            elif token == ELSE and isinstance(opened[-1][0], IfNode) and block is opened[-1][0].block:
+                self._select_and_check_unexpected_token(True, NEWLINE)
+                self._advance()
+                block = opened[-1][0].else_block
+                opened[-1] = (opened[-1][0], block)
+                continue
 
-        while self.tokenizer.next.type != 'EOF':
             statement = self._parse_statement()
-            block_node.children.append(statement)
-            self.tokenizer.select_next()
-
-        return block_node
+            block.children.append(statement)
+            if isinstance(statement, FuncDecNode):
+                block = statement.children[-1]
+                opened.append((statement, block))
+            elif isinstance(statement, (WhileNode, IfNode)):
+                block = statement.block
+                opened.append((statement, block))
+            else:
+                self._advance()
 
+    # Simple statements are parsed up to their NEWLINE. An if, while or
+    # function is parsed up to the first token of its body and returned
+    # with its blocks empty, for _parse_block to fill.
     def _parse_statement(self):
 
-        token = self.tokenizer.next
+        token = self.type
 
-        if token.type == 'IDENTIFIER':
+        if token == IDENTIFIER:
 
-            self.tokenizer.select_next()
-            if self.tokenizer.next.type == 'ASSING':
-                identifier_node = IdentifierNode(token.value)
-                assigment_node = AssigmentNode()
-                assigment_node.children.append(identifier_node)
+            value = self._value()
+            self._advance()
+            if self.type == ASSING:
+                identifier_node = IdentifierNode(value)
 
-                self.tokenizer.select_next()
+                self._advance()
                 bool_expression = self._parse_bool_expression()
-                assigment_node.children.append(bool_expression)
+                assigment_node = AssigmentNode(identifier_node, bool_expression)
 
-                self._select_and_check_unexpected_token(False, 'NEWLINE')
+                self._select_and_check_unexpected_token(False, NEWLINE)
                 return assigment_node
-            elif self.tokenizer.next.type == 'OPEN_PAR':
-                func_call_node = FuncCallNode(token.value)
-                self.tokenizer.select_next()
-                while self.tokenizer.next.type != 'CLOSE_PAR':
+            elif self.type == OPEN_PAR:
+                func_call_node = FuncCallNode(value)
+                self._advance()
+                while self.type != CLOSE_PAR:
                     bool_expression = self._parse_bool_expression()
                     func_call_node.children.append(bool_expression)
-                    if self.tokenizer.next.type == 'COMMA':
-                        self.tokenizer.select_next()
+                    if self.type == COMMA:
+                        self._advance()
 
-                self._select_and_check_unexpected_token(True, 'NEWLINE')
+                self._select_and_check_unexpected_token(True, NEWLINE)
 
                 return func_call_node
             else:
-                raise ValueError(f'Unexpected token: {self.tokenizer.next.type}')
+                raise ValueError(f'Unexpected token: {TOKEN_TYPES[self.type]}')
 
-        elif token.type == 'LOCAL':
-            var_dec_node = VarDecNode()
+        elif token == LOCAL:
+            self._select_and_check_unexpected_token(True, IDENTIFIER)
 
-            self._select_and_check_unexpected_token(True, 'IDENTIFIER')
+            identifier_node = IdentifierNode(self._value())
+            var_dec_node = VarDecNode(identifier_node)
 
-            identifier_node = IdentifierNode(self.tokenizer.next.value)
-            var_dec_node.children.append(identifier_node)
+            self._advance()
+            if self.type == ASSING:
+                self._advance()
+                var_dec_node.expression = self._parse_bool_expression()
 
-            self.tokenizer.select_next()
-            if self.tokenizer.next.type == 'ASSING':
-                self.tokenizer.select_next()
-                bool_expression = self._parse_bool_expression()
-                var_dec_node.children.append(bool_expression)
-            
-            self._select_and_check_unexpected_token(False, 'NEWLINE')
+            self._select_and_check_unexpected_token(False, NEWLINE)
             return var_dec_node
 
-        elif token.type == 'FUNCTION':
+        elif token == FUNCTION:
             func_dec_node = FuncDecNode()
 
-            self._select_and_check_unexpected_token(True, 'IDENTIFIER')
+            self._select_and_check_unexpected_token(True, IDENTIFIER)
 
-            identifier_node = IdentifierNode(self.tokenizer.next.value)
+            identifier_node = IdentifierNode(self._value())
             func_dec_node.children.append(identifier_node)
 
-            self._select_and_check_unexpected_token(True, 'OPEN_PAR')
+            self._select_and_check_unexpected_token(True, OPEN_PAR)
 
-            self.tokenizer.select_next()
-            while self.tokenizer.next.type == 'IDENTIFIER':
-                identifier_node = IdentifierNode(self.tokenizer.next.value)
-                var_dec_node = VarDecNode()
-                var_dec_node.children.append(identifier_node)
+            self._advance()
+            while self.type == IDENTIFIER:
+                identifier_node = IdentifierNode(self._value())
+                var_dec_node = VarDecNode(identifier_node)
                 func_dec_node.children.append(var_dec_node)
-                self.tokenizer.select_next()
-                if self.tokenizer.next.type == 'COMMA':
-                    self.tokenizer.select_next()
-            
-            self._select_and_check_unexpected_token(False, 'CLOSE_PAR')
-            self._select_and_check_unexpected_token(True, 'NEWLINE')
-
-            block_node = BlockNode()
-
-            self.tokenizer.select_next()
-            while self.tokenizer.next.type != 'END':
-                statement = self._parse_statement()
-                block_node.children.append(statement)
-                self.tokenizer.select_next()
+                self._advance()
+                if self.type == COMMA:
+                    self._advance()
 
-            func_dec_node.children.append(block_node)
+            self._select_and_check_unexpected_token(False, CLOSE_PAR)
+            self._select_and_check_unexpected_token(True, NEWLINE)
 
+            self._advance()
+            func_dec_node.children.append(BlockNode())
             return func_dec_node
 
-        elif token.type == 'RETURN':
-            ret_node = ReturnNode()
-            self.tokenizer.select_next()
+        elif token == RETURN:
+            self._advance()
             bool_expression = self._parse_bool_expression()
-            ret_node.children.append(bool_expression)
-            self._select_and_check_unexpected_token(False, 'NEWLINE')
+            ret_node = ReturnNode(bool_expression)
+            self._select_and_check_unexpected_token(False, NEWLINE)
             return ret_node
 
-        elif token.type == 'PRINT':
-            print_node = PrintNode()
+        elif token == PRINT:
+            self._select_and_check_unexpected_token(True, OPEN_PAR)
 
-            self._select_and_check_unexpected_token(True, 'OPEN_PAR')
-
-            self.tokenizer.select_next()
+            self._advance()
             bool_expression = self._parse_bool_expression()
-            print_node.children.append(bool_expression)
+            print_node = PrintNode(bool_expression)
 
-            self._select_and_check_unexpected_token(False, 'CLOSE_PAR')
-            self._select_and_check_unexpected_token(True, 'NEWLINE', 'EOF')
+            self._select_and_check_unexpected_token(False, CLOSE_PAR)
+            self._select_and_check_unexpected_token(True, NEWLINE, EOF)
             return print_node
 
-        elif token.type == 'WHILE':
-            while_node = WhileNode()
-
-            self.tokenizer.select_next()
+        elif token == WHILE:
+            self._advance()
             bool_expression = self._parse_bool_expression()
-            while_node.children.append(bool_expression)
 
-            self._select_and_check_unexpected_token(False, 'DO')
-            self._select_and_check_unexpected_token(True, 'NEWLINE')
-            
-            block_node = BlockNode()
-            
-            self.tokenizer.select_next()
-            while self.tokenizer.next.type != 'END':
-                statement = self._parse_statement()
-                block_node.children.append(statement)
-                self.tokenizer.select_next()
+            self._select_and_check_unexpected_token(False, DO)
+            self._select_and_check_unexpected_token(True, NEWLINE)
 
-            while_node.children.append(block_node)
+            self._advance()
+            return WhileNode(bool_expression, BlockNode())
 
-            self._select_and_check_unexpected_token(True, 'NEWLINE', 'EOF')
-            return while_node
-
-        elif token.type == 'IF':
-            if_node = IfNode()
-
-            self.tokenizer.select_next()
+        elif token == IF:
+            self._advance()
             bool_expression = self._parse_bool_expression()
-            if_node.children.append(bool_expression)
-
-            self._select_and_check_unexpected_token(False, 'THEN')
-            self._select_and_check_unexpected_token(True, 'NEWLINE')
-            
-            block_node = BlockNode()
-            
-            self.tokenizer.select_next()
-            while self.tokenizer.next.type not in ('END', 'ELSE'):
-                statement = self._parse_statement()
-                block_node.children.append(statement)
-                self.tokenizer.select_next()
-
-            if_node.children.append(block_node)
 
-            if (has_else:=self.tokenizer.next.type == 'ELSE'):
-                self._select_and_check_unexpected_token(True, 'NEWLINE')
-                self.tokenizer.select_next()
+            self._select_and_check_unexpected_token(False, THEN)
+            self._select_and_check_unexpected_token(True, NEWLINE)
 
-            else_block_node = BlockNode()
+            self._advance()
+            return IfNode(bool_expression, BlockNode(), BlockNode())
 
-            while self.tokenizer.next.type != 'END' and has_else:
-                statement = self._parse_statement()
-                else_block_node.children.append(statement)
-                self.tokenizer.select_next()
-
-            if_node.children.append(else_block_node)
-
-            self._select_and_check_unexpected_token(True, 'NEWLINE', 'EOF')
-            return if_node
-
-        self._select_and_check_unexpected_token(False, 'NEWLINE')
+        self._select_and_check_unexpected_token(False, NEWLINE)
 
         return NoOpNode()
-    
-    def _binop_parse_template(self, parsing_func, binop_types):
-        node = parsing_func()
-        result = node
-        token = self.tokenizer.next
-
-        while token.type in binop_types:
-            binop = BinOpNode(token.value)
-            binop.children.append(result)
-
-            self.tokenizer.select_next()
-            node = parsing_func()
-            binop.children.append(node)
-
-            token = self.tokenizer.next
-            result = binop
-
-        return result
 
+    # Binary operators by precedence, loosest first; all are left
+    # associative. Entries on the pending stack of _parse_bool_expression
+    # are binary operators with their precedence, or one of the kinds
+    # below.
+    precedences = {
+        OR      : 1,
+        AND     : 2,
+        BIGGER  : 3,
+        LOWER   : 3,
+        EQUAL   : 3,
+        PLUS    : 4,
+        MINUS   : 4,
+        CONCAT  : 4,
+        MULT    : 5,
+        DIV     : 5,
+    }
+    CALL, PARENTHESIS, UNARY = -1, 0, 6
+
+    # Operator precedence parsing with explicit stacks in place of a
+    # recursive method per precedence level: operands holds the parsed
+    # subexpressions, and pending the operators, open parentheses and calls
+    # that still wait for theirs, so nesting is limited only by memory.
     def _parse_bool_expression(self):
-        return self._binop_parse_template(self._parse_bool_term, {'OR'})
-
-    def _parse_bool_term(self):
-        return self._binop_parse_template(self._parse_relational_expression, {'AND'})
-
-    def _parse_relational_expression(self):
-        return self._binop_parse_template(self._parse_expression, {'BIGGER', 'LOWER', 'EQUAL'})
-
-    def _parse_expression(self):
-        return self._binop_parse_template(self._parse_term, {'PLUS', 'MINUS', 'CONCAT'})
-
-    def _parse_term(self):
-        return self._binop_parse_template(self._parse_factor, {'MULT', 'DIV'})
-
-    def _parse_factor(self):
-
-        token = self.tokenizer.next
-
-        if token.type == 'IDENTIFIER':
-            self.tokenizer.select_next()
-            if self.tokenizer.next.type == 'OPEN_PAR':
-                func_call_node = FuncCallNode(token.value)
-                self.tokenizer.select_next()
-                while self.tokenizer.next.type != 'CLOSE_PAR':
-                    bool_expression = self._parse_bool_expression()
-                    func_call_node.children.append(bool_expression)
-                    if self.tokenizer.next.type == 'COMMA':
-                        self.tokenizer.select_next()
-                self.tokenizer.select_next()
-                return func_call_node
+        precedences = self.precedences
+        operands = []
+        pending = []
+
+        while True:
+            token = self.type
+            if token in (PLUS, MINUS, NOT):
+                pending.append((self.UNARY, self._value()))
+                self._advance()
+                continue
+            if token == OPEN_PAR:
+                pending.append((self.PARENTHESIS, None))
+                self._advance()
+                continue
+
+            if token == IDENTIFIER:
+                value = self._value()
+                self._advance()
+                if self.type == OPEN_PAR:
+                    operand = FuncCallNode(value)
+                    self._advance()
+                    if self.type != CLOSE_PAR:
+                        pending.append((self.CALL, operand))
+                        continue
+                    self._advance()
+                else:
+                    operand = IdentifierNode(value)
+            elif token == STRING:
+                operand = StringNode(self._value())
+                self._advance()
+            elif token == INT:
+                operand = IntValNode(int(self._value()))
+                self._advance()
+            elif token == READ:
+                self._select_and_check_unexpected_token(True, OPEN_PAR)
+                self._select_and_check_unexpected_token(True, CLOSE_PAR)
+                self._advance()
+                operand = ReadNode()
             else:
-                return IdentifierNode(token.value)
-        elif token.type == 'STRING':
-            self.tokenizer.select_next()
-            return StringNode(token.value)
-        elif token.type == 'INT':
-            self.tokenizer.select_next()
-            return IntValNode(token.value)
-        elif token.type in ('PLUS', 'MINUS', 'NOT'):
-            self.tokenizer.select_next()
-            factor = self._parse_factor()
-            unop = UnOpNode(token.value)
-            unop.children.append(factor)
-            return unop
-        elif token.type == 'OPEN_PAR':
-            self.tokenizer.select_next()
-            expression = self._parse_bool_expression()
-            self._select_and_check_unexpected_token(False, 'CLOSE_PAR')
-            self.tokenizer.select_next()
-            return expression
-        elif token.type == 'READ':
-            self._select_and_check_unexpected_token(True, 'OPEN_PAR')
-            self._select_and_check_unexpected_token(True, 'CLOSE_PAR')
-            self.tokenizer.select_next()
-            return ReadNode()
+                raise ValueError(f'Unexpected token: {TOKEN_TYPES[token]}')
+
+            # With an operand complete, close what it completes until the
+            # next token is a binary operator or ends the expression.
+            while True:
+                while pending and pending[-1][0] == self.UNARY:
+                    operand = UnOpNode(pending.pop()[1], operand)
+                operands.append(operand)
+
+                precedence = precedences.get(self.type)
+                if precedence is not None:
+                    while pending and pending[-1][0] >= precedence:
+                        right = operands.pop()
+                        operands[-1] = BinOpNode(pending.pop()[1], operands[-1], right)
+                    pending.append((precedence, self._value()))
+                    self._advance()
+                    break
+
+                while pending and pending[-1][0] > self.PARENTHESIS:
+                    right = operands.pop()
+                    operands[-1] = BinOpNode(pending.pop()[1], operands[-1], right)
+                if not pending:
+                    return operands.pop()
+
+                kind, call = pending[-1]
+                if kind == self.CALL:
+                    self._select_and_check_unexpected_token(False, COMMA, CLOSE_PAR)
+                    call.children.append(operands.pop())
+                    if self.type == COMMA:
+                        self._advance()
+                        break
+                    operand = call
+                else:
+                    self._select_and_check_unexpected_token(False, CLOSE_PAR)
+                    operand = operands.pop()
+                self._advance()
+                pending.pop()
@@ -1,32 +1,60 @@
+# Maps names to EBP offsets: positive for locals at [EBP-offset], negative
+# for parameters at [EBP+offset]. Every block opens a scope; leaving it
+# frees its slots for the blocks that follow, so the frame only needs as
+# many slots as the deepest nesting of live locals, which Node.frame
+# computes before the body is generated. Each name also keeps the stack of
+# its addresses in the scopes open, so a lookup does not depend on how
+# deeply blocks nest.
 class SymbolTable:
 
     def __init__(self):
-        self.table = {}
+        self.scopes = [{}]
+        self.visible = {}
         self.address = 4
+        self.parameters = 8
+
+    def enter(self):
+        self.scopes.append({})
+
+    def leave(self):
+        scope = self.scopes.pop()
+        for key in scope:
+            self.visible[key].pop()
+        self.address -= 4 * sum(1 for address in scope.values() if address > 0)
 
-    def create(self, key, shift=0, sign=1):
-        if key in self.table:
+    def create(self, key):
+        scope = self.scopes[-1]
+        if key in scope:
             raise RuntimeError(f'Key {key} already created.')
-        self.table[key] = (self.address + shift) * sign
+        scope[key] = self.address
+        self.visible.setdefault(key, []).append(self.address)
         self.address += 4
 
+    # Parameters are created before the body opens its scopes.
+    def create_parameter(self, key):
+        scope = self.scopes[0]
+        if key in scope:
+            raise RuntimeError(f'Key {key} already created.')
+        scope[key] = -self.parameters
+        self.visible.setdefault(key, []).append(-self.parameters)
+        self.parameters += 4
+
     def get(self, key):
-        return self.table[key]
-
-    def set(self, key, address):
-        if key in self.table:
-            self.table[key] = address
-        else:
-            raise RuntimeError(f'Key {key} does not exist.')
-        
+        addresses = self.visible.get(key)
+        if addresses:
+            return addresses[-1]
+        raise RuntimeError(f'Key {key} does not exist.')
+
+    def get_parameter(self, key):
+        return self.scopes[0][key]
+
 class FuncTable:
 
-    table = {}
+    def __init__(self):
+        self.table = {}
 
-    @staticmethod
-    def set(key, value):
-        FuncTable.table[key] = value
+    def set(self, key, value):
+        self.table[key] = value
 
-    @staticmethod
-    def get(key):
-        return FuncTable.table.get(key)
+    def get(self, key):
+        return self.table.get(key)
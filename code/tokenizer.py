@@ -1,122 +1,180 @@
+import mmap
 import re
+from array import array
 
-class Token:
+TOKEN_TYPES = (
+    'EOF', 'NEWLINE', 'COMMA', 'OPEN_PAR', 'CLOSE_PAR', 'BIGGER', 'LOWER',
+    'MINUS', 'PLUS', 'MULT', 'DIV', 'CONCAT', 'EQUAL', 'ASSING', 'STRING',
+    'INT', 'IDENTIFIER', 'PRINT', 'AND', 'OR', 'NOT', 'READ', 'IF', 'THEN',
+    'ELSE', 'WHILE', 'DO', 'END', 'LOCAL', 'FUNCTION', 'RETURN',
+)
 
-    def __init__(self, type:str, value:str):
-        self.type: str = type
-        self.value: str = value
+(
+    EOF, NEWLINE, COMMA, OPEN_PAR, CLOSE_PAR, BIGGER, LOWER,
+    MINUS, PLUS, MULT, DIV, CONCAT, EQUAL, ASSING, STRING,
+    INT, IDENTIFIER, PRINT, AND, OR, NOT, READ, IF, THEN,
+    ELSE, WHILE, DO, END, LOCAL, FUNCTION, RETURN,
+) = range(len(TOKEN_TYPES))
+
+# Statements that open a block closed by END.
+BLOCKS = (IF, WHILE, FUNCTION)
+# Pages of a memory-mapped source are handed back to the system in steps
+# of this many bytes once the statements in them are tokenized.
+RELEASE_SIZE = 16 * 1024 * 1024
 
 class Tokenizer:
 
-    def __init__(self, source:str):
-        self.source: str = source
-        self.position: int = 0
-        self.next: Token = None
-        self.reserved_words_types = {
-            'print'     : 'PRINT',
-            'and'       : 'AND',
-            'or'        : 'OR',
-            'not'       : 'NOT',
-            'read'      : 'READ',
-            'if'        : 'IF',
-            'then'      : 'THEN',
-            'else'      : 'ELSE',
-            'while'     : 'WHILE',
-            'do'        : 'DO',
-            'end'       : 'END',
-            'local'     : 'LOCAL',
-            'function'  : 'FUNCTION',
-            'return'    : 'RETURN',
-        }
-
-    def select_next(self):
-
-        value = self._define_value()
-        while value in (' ', '\t'):
-            self.position += 1
-            value = self._define_value()
-
-        if self._end_of_file():
-            ctype = 'EOF'
-        elif value == '\n':
-            ctype = 'NEWLINE'
-        elif value == ',':
-            ctype = 'COMMA'
-        elif value == '(':
-            ctype = 'OPEN_PAR'
-        elif value == ')':
-            ctype = 'CLOSE_PAR'
-        elif value == '>':
-            ctype = 'BIGGER'
-        elif value == '<':
-            ctype = 'LOWER'
-        elif value == '-':
-            ctype = 'MINUS'
-        elif value == '+':
-            ctype = 'PLUS'
-        elif value == '*':
-            ctype = 'MULT'
-        elif value == '/':
-            ctype = 'DIV'
-        elif value == '.':
-            self.position += 1
-            if self._define_value() == '.':
-                value += self._define_value()
-            else:
-                raise SyntaxError('Not a valid operator: ' + value)
-            ctype = 'CONCAT'
-        elif value == '=':
-            self.position += 1
-            if self._define_value() == '=':
-                value = '=='
-                ctype = 'EQUAL'
+    # Group order matters: tokenize() dispatches on match.lastindex.
+    # Comments are skipped here rather than removed beforehand, so a -- in
+    # a string stays part of it.
+    pattern = re.compile(r'''
+          (?P<SKIP>[ \t]+|--[^\n]*)
+        | (?P<NEWLINE>\n)
+        | (?P<INT>[0-9]+)
+        | (?P<NAME>[A-Za-z_][A-Za-z0-9_]*)
+        | (?P<STRING>"[^"]*")
+        | (?P<OPERATOR>==|\.\.|[,()<>\-+*/=])
+        | (?P<UNCLOSED>")
+        | (?P<ERROR>.)
+    ''', re.VERBOSE | re.DOTALL)
+    # The same tokens in a bytes source, such as a memory-mapped file.
+    binary_pattern = re.compile(pattern.pattern.encode(), re.VERBOSE | re.DOTALL)
+
+    reserved_words_types = {
+        'print'     : PRINT,
+        'and'       : AND,
+        'or'        : OR,
+        'not'       : NOT,
+        'read'      : READ,
+        'if'        : IF,
+        'then'      : THEN,
+        'else'      : ELSE,
+        'while'     : WHILE,
+        'do'        : DO,
+        'end'       : END,
+        'local'     : LOCAL,
+        'function'  : FUNCTION,
+        'return'    : RETURN,
+    }
+
+    operators_types = {
+        ','     : COMMA,
+        '('     : OPEN_PAR,
+        ')'     : CLOSE_PAR,
+        '>'     : BIGGER,
+        '<'     : LOWER,
+        '-'     : MINUS,
+        '+'     : PLUS,
+        '*'     : MULT,
+        '/'     : DIV,
+        '..'    : CONCAT,
+        '=='    : EQUAL,
+        '='     : ASSING,
+    }
+
+    # Bytes sources match bytes, so both tables take both kinds of key.
+    reserved_words_types.update({word.encode(): ctype for word, ctype in reserved_words_types.items()})
+    operators_types.update({operator.encode(): ctype for operator, ctype in operators_types.items()})
+
+    # With statements set, the source is not tokenized up front: each
+    # tokenize() call reads the tokens of the next top-level statement.
+    def __init__(self, source, statements=False):
+        self.source = source
+        self.text: bool = isinstance(source, str)
+        self.statements: bool = statements
+        self.matches = (self.pattern if self.text else self.binary_pattern).finditer(source)
+        self.line: int = 1
+        self.released: int = 0
+        self.types: array = array('B')
+        self.starts: array = array('L')
+        self.ends: array = array('L')
+        self.lines: array = array('L')
+        if not statements:
+            self.tokenize()
+
+    # Fills the token arrays, ended by an EOF token, with the rest of the
+    # source or, with statements set, up to the newline that ends the next
+    # top-level statement. Returns False once there is nothing left.
+    def tokenize(self):
+        types, starts, ends, lines = self.types, self.starts, self.ends, self.lines
+        reserved_words_types = self.reserved_words_types
+        operators_types = self.operators_types
+        newline = '\n' if self.text else b'\n'
+        statements = self.statements
+        line = self.line
+        depth = 0
+        end = len(self.source)
+
+        if statements:
+            del types[:], starts[:], ends[:], lines[:]
+
+        for match in self.matches:
+            group = match.lastindex
+            if group == 1:
+                continue
+            elif group == 2:
+                ctype = NEWLINE
+            elif group == 3:
+                ctype = INT
+            elif group == 4:
+                ctype = reserved_words_types.get(match.group(), IDENTIFIER)
+                if ctype != IDENTIFIER:
+                    if ctype in BLOCKS:
+                        depth += 1
+                    elif ctype == END:
+                        depth -= 1
+            elif group == 5:
+                ctype = STRING
+            elif group == 6:
+                ctype = operators_types[match.group()]
+            elif group == 7:
+                raise SyntaxError('Quotation mark is not closed.')
+            elif match.group() in ('.', b'.'):
+                raise SyntaxError('Not a valid operator: .')
             else:
-                self.position -= 1
-                ctype = 'ASSING'
-        elif value == '"':
-            value = ''
-            while self.source[self.position+1] != '"':
-                self.position += 1
-                value += self._define_value(
-                    fallback=[SyntaxError, 'Quotation mark is not closed.']
-                )
-            self.position += 1
-            ctype = 'STRING'
-        elif value.isdigit():
-            while value.isdigit():
-                self.position += 1
-                value += self._define_value(fallback=' ')
-            value = value[:-1]
-            ctype = 'INT'
-            self.position -= 1
-        elif value.isalpha() or value == '_':
-            while self._is_valid_variable(value):
-                self.position += 1
-                value += self._define_value(fallback=' ')
-            value = value[:-1]
-            self.position -= 1
-            is_reserved_word = value in self.reserved_words_types
-            ctype = (
-                self.reserved_words_types[value]
-                if is_reserved_word
-                else 'IDENTIFIER'
-            )
+                character = match.group()
+                raise ValueError('Not a valid character: ' + (character if self.text else character.decode(errors='replace')))
+
+            types.append(ctype)
+            starts.append(match.start())
+            ends.append(match.end())
+            lines.append(line)
+
+            if ctype == NEWLINE:
+                line += 1
+                # Blank lines stay with the statement that follows them.
+                if statements and depth <= 0 and len(types) > 1 and types[-2] != NEWLINE:
+                    end = match.end()
+                    break
+            elif ctype == STRING:
+                line += match.group().count(newline)
+        else:
+            if statements and not types:
+                return False
+
+        types.append(EOF)
+        starts.append(end)
+        ends.append(end)
+        lines.append(line)
+        self.line = line
+        if statements:
+            self._release(starts[0])
+        return True
+
+    # Drops the pages of a memory-mapped source before offset from the
+    # resident set, so reading a large file does not keep all of it in
+    # memory. They are read again from the file if touched.
+    def _release(self, offset):
+        if not isinstance(self.source, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        offset -= offset % mmap.PAGESIZE
+        if offset - self.released >= RELEASE_SIZE:
+            self.source.madvise(mmap.MADV_DONTNEED, self.released, offset - self.released)
+            self.released = offset
+
+    def value(self, index):
+        if self.types[index] == STRING:
+            value = self.source[self.starts[index] + 1:self.ends[index] - 1]
         else:
-            raise ValueError('Not a valid character: ' + value)
-
-        self.position += 1
-
-        self.next = Token(ctype, value)
-    
-    def _end_of_file(self):
-        return self.position >= len(self.source)
-    
-    def _define_value(self, fallback=''):
-        if isinstance(fallback, list) and self._end_of_file():
-            raise fallback[0](fallback[1])
-        return fallback if self._end_of_file() else self.source[self.position]
-
-    @staticmethod
-    def _is_valid_variable(value):
-        pattern = r'^[a-zA-Z0-9_]+$'
-        return bool(re.match(pattern, repr(value)[1:-1]))
+            value = self.source[self.starts[index]:self.ends[index]]
+        return value if self.text else value.decode()
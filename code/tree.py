@@ -0,0 +1,94 @@
+from .nodes import (
+    BinOpNode, UnOpNode, PrintNode, AssigmentNode, BlockNode, ReadNode,
+    IfNode, WhileNode, VarDecNode, ReturnNode, FuncDecNode, FuncCallNode,
+    IntValNode
+)
+
+# Keyed by exact type: isinstance against the abstract Node classes is slow
+# enough to dominate the passes that walk the whole tree.
+CHILDREN = {
+    BlockNode: lambda node: node.children,
+    FuncDecNode: lambda node: node.children,
+    FuncCallNode: lambda node: node.children,
+    BinOpNode: lambda node: [node.left, node.right],
+    UnOpNode: lambda node: [node.expression],
+    PrintNode: lambda node: [node.expression],
+    ReturnNode: lambda node: [node.expression],
+    VarDecNode: lambda node: [node.identifier] if node.expression is None else [node.identifier, node.expression],
+    AssigmentNode: lambda node: [node.identifier] if node.expression is None else [node.identifier, node.expression],
+    WhileNode: lambda node: [node.condition, node.block],
+    IfNode: lambda node: [node.condition, node.block, node.else_block],
+}
+
+def children(node):
+    get = CHILDREN.get(type(node))
+    return [] if get is None else get(node)
+
+def walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(children(node)))
+
+# Runs a recursive pass written as generators without the Python stack: a
+# generator yields the generator of each call it would make, is sent back
+# its result, and returns its own.
+def trampoline(generator):
+    stack, value = [generator], None
+    while stack:
+        try:
+            call = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+        else:
+            stack.append(call)
+            value = None
+    return value
+
+def is_call_to(node, name):
+    return isinstance(node, FuncCallNode) and node.value == name
+
+# Whether evaluating an expression has no effect but its value, so it may
+# be dropped or moved. A division can trap unless its divisor is a literal
+# other than 0 and -1.
+def is_pure(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ReadNode, FuncCallNode)):
+            return False
+        if isinstance(node, BinOpNode):
+            if node.value == '/' and not (isinstance(node.right, IntValNode) and node.right.value not in (0, -1)):
+                return False
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, UnOpNode):
+            stack.append(node.expression)
+    return True
+
+# and/or short-circuit when an if or while branches on them directly, so a
+# rewrite must not strip the operation that keeps them in value context.
+def exposes_short_circuit(node):
+    while isinstance(node, UnOpNode):
+        node = node.expression
+    return isinstance(node, BinOpNode) and node.value in ('and', 'or')
+
+# Raises, as the code generators do, for a local declared twice in one
+# block or a parameter named twice. Dead code removal may drop such a
+# declaration, so the front end checks first and --stream, which skips
+# that pass, rejects the same programs.
+def check_declarations(node):
+    for node in walk(node):
+        if type(node) is BlockNode:
+            names = [child.identifier.value for child in node.children if type(child) is VarDecNode]
+        elif type(node) is FuncDecNode:
+            names = [child.identifier.value for child in node.children[1:-1]]
+        else:
+            continue
+        seen = set()
+        for name in names:
+            if name in seen:
+                raise RuntimeError(f'Key {name} already created.')
+            seen.add(name)
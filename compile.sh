@@ -3,10 +3,12 @@
 filename=$(basename -- "$1")
 extension="${filename##*.}"
 filename="${filename%.*}"
-# Compile the Lua file
-python3 main.py "$1"
-# Assemble with NASM
-nasm -f elf -o "$filename.o" "$filename.asm"
+# Compile the Lua file and assemble it with NASM (both cached), through the
+# daemon started with 'python3 main.py --serve' when one is running
+python3 -S client.py --object "$filename.o" "$1"
+if [ $? -eq 75 ]; then
+    python3 main.py --object "$filename.o" "$1"
+fi
 # Link with GCC
 gcc -m32 -no-pie -o "$filename" "$filename.o"
 # Run the executable
@@ -1,19 +1,13 @@
 import sys
 
-from code.syntactical import Parser
-from code.asm import ASM
-from code.table import SymbolTable
+from code.driver import argument_parser, run
 
 
 if __name__ == "__main__":
-    filename = sys.argv[1]
-
-    with open(filename, 'r') as file:
-        code = file.read()
-
-    parser = Parser()
-    symbol_table = SymbolTable()
-    asm_file = filename.split('.')[0] + '.asm'
-    ASM.initialize(asm_file)
-    parser.run(code).evaluate(symbol_table)
-    ASM.end()
+    argv = sys.argv[1:]
+    args, _ = argument_parser().parse_known_args(argv)
+    if args.serve:
+        from code.server import serve
+        serve(args.socket)
+    else:
+        sys.exit(run(argv))
@@ -0,0 +1,33 @@
+local a = 2 and 1
+print(a)
+if 2 and 1 then
+print(10)
+else
+print(11)
+end
+if 2 or 1 then
+print(12)
+end
+if 1 and 3 then
+print(13)
+else
+print(14)
+end
+if (3 > 1) and 2 then
+print(15)
+else
+print(16)
+end
+if not (2 and 1) then
+print(17)
+end
+if -(2 and 1) then
+print(18)
+else
+print(19)
+end
+local i = 0
+while (i < 3) and 5 do
+i = i + 1
+end
+print(i)
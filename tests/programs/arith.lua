@@ -0,0 +1,15 @@
+local x = 7
+local y = 3
+print(x + y)
+print(x - y)
+print(x * y)
+print(x * 2 + y * 4 - 1)
+print((x + y) * (x - y))
+print(x - y - 1)
+print(100 - 3 * (4 + 5) - 2)
+print(x > y)
+print(x < y)
+print(x == 7)
+print(x > y and y > 1)
+print(x < y or y == 3)
+print(1 + 2 * 3)
@@ -0,0 +1,58 @@
+function t(x)
+    print(x)
+    return x
+end
+local a = 3
+local b = 0
+if a > 2 and b == 0 then
+    print(1)
+end
+if a > 5 and t(100) then
+    print(2)
+end
+if a < 5 or t(200) then
+    print(3)
+end
+if b or a == 4 then
+    print(4)
+else
+    print(5)
+end
+if not b then
+    print(6)
+end
+if not (a > 1 and a < 3) then
+    print(7)
+end
+if 1 then
+    print(8)
+end
+if 0 then
+    print(9)
+else
+    print(10)
+end
+if (a > 1 or b > 1) and (a < 1 or b < 1) then
+    print(11)
+end
+if t(a) > t(b) then
+    print(12)
+end
+local i = 0
+while i < 3 and a > 0 do
+    i = i + 1
+    a = a - 1
+end
+print(i)
+print(a)
+while 0 do
+    print(13)
+end
+if -a then
+    print(14)
+else
+    print(15)
+end
+print(a == 0)
+print(not a)
+print(b < a)
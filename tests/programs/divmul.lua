@@ -0,0 +1,49 @@
+function check(x)
+    print(x / 2)
+    print(x / -2)
+    print(x / 3)
+    print(x / 7)
+    print(x / -7)
+    print(x / 8)
+    print(x / -16)
+    print(x / 10)
+    print(x / 1000)
+    print(x / 641)
+    print(x / 1)
+    print(x / -1)
+    print(x * 3)
+    print(x * 10)
+    print(x * -12)
+    print(x * 7)
+    print(x * 64)
+    print(x * 0)
+    print(x * -1)
+    print(x / (x + 1000000000))
+    print((x + 3) / (0 - 5))
+    return 0
+end
+local values = 0
+check(0)
+check(1)
+check(-1)
+check(7)
+check(-7)
+check(100)
+check(-100)
+check(2147483647)
+check(0 - 2147483647 - 1 + 1)
+check(123456789)
+check(-987654321)
+local a = 1000
+local b = 0 - 9
+local i = 0
+local t = 0
+while i < 10 do
+    t = t + (a / 3) + (b / 2) + (a * 5) / 7 - (b * 9) / 16
+    a = a - 157
+    b = b * 3
+    i = i + 1
+end
+print(t)
+print(read() / 3)
+print(read() / -4)
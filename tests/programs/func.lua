@@ -0,0 +1,39 @@
+function add(a, b)
+    return a + b
+end
+
+function fib(n)
+    if n < 2 then
+        return n
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+
+function sum(n)
+    if n == 0 then
+        return 0
+    end
+    return n + sum(n - 1)
+end
+
+function fact(n)
+    if n == 0 then
+        return 1
+    else
+        return n * fact(n - 1)
+    end
+end
+
+function show(a, b, c)
+    print(a)
+    print(b)
+    print(c)
+end
+
+print(add(2, 3))
+print(fib(15))
+print(sum(100))
+print(fact(10))
+show(1, add(1, 1), 3)
+local z = add(add(1, 2), add(3, 4)) * 2
+print(z)
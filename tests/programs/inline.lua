@@ -0,0 +1,44 @@
+function square(x)
+    return x * x
+end
+
+function add3(a, b, c)
+    return a + b + c
+end
+
+function show(a, b)
+    print(a)
+    print(b)
+end
+
+function bump(n)
+    n = n + 1
+    print(n)
+end
+
+function twice(x)
+    return square(x) + square(x)
+end
+
+function withlocal(v)
+    local w = v * 2
+    print(w)
+end
+
+local i = 0
+local s = 0
+while i < 5 do
+    s = s + square(i) + add3(i, 1, 2)
+    show(i, s)
+    i = i + 1
+end
+print(s)
+print(square(3))
+print(square(i + 1))
+print(twice(4))
+bump(i)
+bump(i * 2)
+print(i)
+withlocal(7)
+print(add3(read(), 1, 1))
+print(square(read()))
@@ -0,0 +1,37 @@
+function scale(n, k)
+    local i = 0
+    local s = 0
+    while i < n do
+        s = s + i * k + (k * 3 - 1)
+        i = i + 1
+    end
+    return s
+end
+local n = 10
+local i = 0
+local total = 0
+while i < n do
+    local j = 0
+    while j < n do
+        total = total + i * 7 + j * n + (n * n - 3)
+        j = j + 2
+    end
+    i = i + 1
+end
+print(total)
+print(scale(20, 5))
+local k = 0
+local x = 0
+while k < 5 do
+    x = k * 3
+    k = k + 1
+end
+print(x)
+print(k)
+function down(n, acc)
+    if n < 1 then
+        return acc
+    end
+    return down(n - 1, acc + n * 4)
+end
+print(down(30, 0))
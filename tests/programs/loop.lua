@@ -0,0 +1,17 @@
+local i = 0
+local s = 0
+while i < 10 do
+    s = s + i * i
+    i = i + 1
+end
+print(s)
+print(i)
+local k = 5
+while k > 0 do
+    if k == 3 then
+        print(333)
+    else
+        print(k)
+    end
+    k = k - 1
+end
@@ -0,0 +1,18 @@
+local i = 0
+local c = 0
+while i < 5 do
+    local j = 0
+    j = 0
+    while j < 5 do
+        if i == j then
+            c = c + 10
+        else
+            if i > j then
+                c = c + 1
+            end
+        end
+        j = j + 1
+    end
+    i = i + 1
+end
+print(c)
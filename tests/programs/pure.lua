@@ -0,0 +1,40 @@
+function fib(n)
+    if n < 2 then
+        return n
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+function spin(n)
+    while 1 do
+        n = n + 1
+    end
+    return n
+end
+function sum(n, step)
+    local total = 0
+    local i = 0
+    while i < n do
+        local square = i * i
+        total = total + square / step
+        i = i + 1
+    end
+    return total
+end
+function shout(x)
+    print(x)
+    return x
+end
+function twice(x)
+    return shout(x) + shout(x)
+end
+print(fib(18))
+print(fib(18) + fib(17))
+print(sum(100, 3))
+print(sum(1500, 100))
+print(twice(4))
+local k = 5
+print(fib(k))
+if 0 and spin(0) > 0 then
+    print(1)
+end
+print(fib(20) / 2)
@@ -0,0 +1,74 @@
+function f(x)
+    return x + 1
+end
+function g(x, y)
+    return x * y - 1
+end
+local a = 1
+local b = -5
+local c = 3
+local d = -8
+local e = -7
+local f = 8
+local g = -6
+local h = 2
+print(1)
+print((g - b))
+print(-(-(1)))
+print((b + 19))
+print(g((h > d), (e + 10)))
+print(-(((((17 < (f > 18)) * ((b - e) - (g == f(h)))) * -(e)) - (e == (((12 > f(c)) - (c + a)) < 19)))))
+print(((h == f(h)) > (f * 15)))
+print(g(f(4), ((((((16 + d) * (f(f(7)) + h)) - ((d - 11) + (f(d) > h))) - (-((f(b) == f(g))) + f(14))) - ((((f(h) == 11) + g(a, 20)) * 4) - ((d + (g > f(f))) + -(g(c, 16))))) + (((g((f(d) - b), g(b, d)) > ((7 == 8) == (f(b) + f))) - b) == (((f(f(b)) > (d == g)) * ((b + 0) < (a == e))) - (f(b) - c))))))
+print(((g(f(10), a) - (b * a)) < (f(b) - (f(e) > 1))))
+print(((e - g(((a * f(a)) - g(f(7), f(g))), g((f(d) < f(c)), (f(f(e)) > a)))) - f(f(9))))
+print((e - ((g((f(f) + f), (d == a)) > f(a)) - ((f(f(g)) + (c == g)) - g(16, (f(20) + a))))))
+print(b)
+print(g(d, ((g(f(b), 15) - (f(d) - h)) + (f(a) < (c + e)))))
+print(((((g(h, b) == g(b, f(h))) - 14) == ((e + (20 * 3)) < ((c == h) + (c < g)))) + (12 > f(9))))
+print((-(f(1)) < ((13 > f(f(17))) > (g - c))))
+print((f(h) == (((g((c - h), (f(f(c)) == 7)) + b) - (-((13 + d)) > 20)) - (f(h) + ((h + (g == f(f(14)))) - ((b + f(20)) + (a == c)))))))
+print(((f(16) - 3) + d))
+print(-(14))
+print((((e < 16) < d) + ((e + h) + (a + f(g)))))
+print(-(a))
+print((((g(1, g) > (b > e)) - b) > (((h < h) - (15 > g)) + (b < (b + f(e))))))
+print(-(10))
+print(((a == ((((-(d) == (15 - 10)) > ((b - g) < (c == d))) * ((-(e) - (c * d)) - ((7 + 3) < (h + f(h))))) - ((d + ((e * 0) > 19)) + ((f(d) * (f > e)) + h)))) - ((((((f(13) < f(f)) < (f(f(d)) + g)) - ((b * f) + (a * 20))) * (11 < (c * (d - a)))) < (-((5 < (19 + f(f(d))))) == d)) - 1)))
+print(((((((h > a) < (h == 14)) - ((g - h) == (c + f))) - g(12, (b * (c == 7)))) == e) - -((15 == (((g + e) + (e < a)) - ((18 == 3) > g(12, 11)))))))
+print(c)
+print((6 - g))
+print(g((((((5 == (a - e)) < ((16 < f(d)) - 5)) + (((g > d) + g(a, f(d))) + ((2 < 5) - b))) == (((20 + a) * 11) * g(((d < a) - f(f(20))), (d == (a > e))))) - 10), -((((((6 + 2) - (a - 9)) + (h + (f(16) * c))) + (((f(15) - 17) + (g > f(f(13)))) + ((c - d) + (19 * 11)))) - g((((8 == 4) > (8 + c)) == (-(5) + (b - c))), (((3 - g) < (g + 16)) - ((g * d) - (18 < 13))))))))
+print((((11 - e) == (f + 4)) - ((6 + f(8)) > -(d))))
+print((g(-(f(e)), (3 == 8)) + (g(h, f(7)) * g(0, f))))
+print(((((f - 0) < f) == ((4 == g) - (f > d))) == (g(f, (e < f(d))) > ((4 > 20) - f(g)))))
+print(((f(a) + g(-(19), a)) < (((g(9, a) * (18 < f(a))) + ((a < 19) < (g * 2))) - (((3 + f(f(b))) + d) + ((4 > 2) * g(14, 8))))))
+print((b + e))
+print(((-((((c - 13) * (f(18) == e)) == f(19))) > ((((14 + 8) + (14 + 17)) + (-(8) - (d + e))) == -(g((h + b), (4 == a))))) == ((((14 + (f(3) - 2)) * -((f(12) - c))) > (g((c == a), (14 - 3)) + ((g - d) > (d + 5)))) - (11 + (((f(14) < f(d)) - (d > 5)) * g((f(g) == a), (c - b)))))))
+print((f(d) == (11 - (f(f(e)) - c))))
+print((a - f))
+print(e)
+print(((c + c) + (6 + 2)))
+print(((((16 + (11 + h)) + h) * 7) - (18 > (((d - f(f(g))) == (b + f(a))) + g(b, (e * a))))))
+print(6)
+print(18)
+print((f(1) == (g((g - f(7)), (14 * 5)) == ((19 < f(12)) + (10 + f)))))
+print(-((g(11, ((g(f, a) + (f(14) < 1)) < 8)) > -(g(((a - a) + (c - e)), 4)))))
+print((-(f(9)) - (-((d > f(g))) < g(g(13, 16), (f < f)))))
+print(((g(g(f(d), f(h)), -(b)) - (g(e, 16) - (16 < d))) - ((-(a) + (17 - e)) + ((h + 18) - g(4, 13)))))
+print(b)
+print(h)
+print(((-(((18 * g) + g)) + ((((-(h) < (f(f(14)) * 11)) > ((b + 2) < (12 - c))) + (((b + f) * (e - e)) < 9)) == (((11 * (14 + g)) * ((d - 1) - -(d))) == (((16 + g) * -(a)) + -((f(1) + 6)))))) < -((((((6 == c) > (e + c)) < ((f(f) + d) + (h * 7))) > ((9 == 18) + ((5 - 4) > (f(d) == e)))) - a))))
+print((f(h) == f))
+print((h - 18))
+print(g)
+print(g((((2 - a) - c) > (g(f(f(e)), 10) * (f > f))), ((f(f(f(a))) + (c == f(20))) - 5)))
+print((h < (0 + g)))
+print(((f(a) < 5) + (a * f)))
+print((g(g((-(1) * (13 - f(c))), ((f(h) + 4) > (13 > d))), (((3 + e) + (8 + 7)) < ((18 - 13) + (b == 16)))) - f(c)))
+print((1 - (a + 6)))
+print(((((f > f(0)) + (f - 1)) - (19 > f(8))) * (f(a) == ((e * f(4)) - (8 - f(f))))))
+print(((g + f(f(14))) == -(11)))
+print(-(((10 > 12) + (h > a))))
+print(3)
+print((((((((16 > f(g)) - (15 > 7)) * ((h + g) > (f(4) - e))) + -((b > (14 - g)))) - -(g(((f(2) + f) + (a + 0)), ((12 + 10) > (2 < 10))))) - g((((h - f(f(d))) > (-(a) - (f * 5))) == (((h + f) > (f < 0)) * 2)), ((13 > ((a + g) < (g > 9))) < (-((f(f(c)) == f(f))) == -((6 + f(1))))))) < ((f + g) * g)))
@@ -0,0 +1,11 @@
+local a = read()
+local b = read()
+print(a + b)
+print(a * b)
+local n = read()
+local t = 0
+while n > 0 do
+    t = t + read()
+    n = n - 1
+end
+print(t)
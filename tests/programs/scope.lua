@@ -0,0 +1,40 @@
+function f(n)
+    local total = 0
+    local i = 0
+    while i < n do
+        local sq = i * i
+        if sq > 10 then
+            local big = sq - 10
+            total = total + big
+        else
+            local small = sq + 1
+            total = total + small
+        end
+        i = i + 1
+    end
+    return total
+end
+local x = 1
+local k = 0
+while k < 1000 do
+    local t = k + x
+    local u = t * 2
+    k = k + 1
+end
+if x == 1 then
+    local x = 5
+    print(x)
+    local y = x + 1
+    print(y)
+end
+print(x)
+print(f(10))
+print(k)
+function g(a)
+    if a < 1 then
+        return 0
+    end
+    local a = a - 1
+    return a + g(a)
+end
+print(g(5))
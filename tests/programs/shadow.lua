@@ -0,0 +1,29 @@
+function redeclare(p)
+    local p = 3
+    print(p)
+end
+function nested(p)
+    if p then
+        local p = 2
+        print(p)
+    end
+    print(p)
+end
+function loop(p, n)
+    local i = 0
+    while i < n do
+        local p = p + i
+        print(p)
+        i = i + 1
+    end
+    print(p)
+end
+redeclare(7)
+nested(7)
+nested(0)
+local q = 9
+nested(q)
+redeclare(q)
+loop(10, 3)
+loop(q, 2)
+print(q)
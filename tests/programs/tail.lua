@@ -0,0 +1,43 @@
+function fact(n)
+    if n == 0 then
+        return 1
+    else
+        return n * fact(n - 1)
+    end
+end
+
+function sum(n)
+    if n == 0 then
+        return 0
+    end
+    return sum(n - 1) + n
+end
+
+function count(n, c)
+    if n == 0 then
+        return c
+    end
+    return count(n - 1, c + 1)
+end
+
+function gcd(a, b)
+    if b == 0 then
+        return a
+    end
+    local r = a - (a / b) * b
+    return gcd(b, r)
+end
+
+function fib(n)
+    if n < 2 then
+        return n
+    end
+    return fib(n - 1) + fib(n - 2)
+end
+
+print(fact(10))
+print(fact(12))
+print(count(30000, 0))
+print(gcd(1071, 462))
+print(fib(20))
+print(sum(100))
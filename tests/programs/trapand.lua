@@ -0,0 +1,4 @@
+local z = read()
+print(1)
+print((7 / z) and 0)
+print(0 * (z / z))
@@ -0,0 +1,17 @@
+local x = 5
+print(-x)
+print(not x)
+print(not 0)
+print(-(x - 8))
+print(- -x)
+print(+x)
+print(2 * 3 + 4 * 5 - 6)
+print(x * 1 + 0)
+print(0 + x * 0)
+print(1 * x - 0)
+print(-3 * 4)
+print(10 > 3)
+print(1 == 2 or 3 == 3)
+print(not (x > 2))
+print(100 / 7)
+print(x / 1)
@@ -0,0 +1,65 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+
+from code.closures import execute
+from code.compiler import frontend, Options
+from code.encoder import Assembler
+
+PROGRAMS = os.path.join(os.path.dirname(__file__), 'programs')
+
+# Assembling and linking the generated code with nasm needs gcc as well,
+# able to link 32-bit programs.
+NASM = bool(shutil.which('nasm') and shutil.which('gcc'))
+# The runtime only makes system calls, so without nasm 32-bit code still
+# runs through the built-in encoder and ld.
+NATIVE = NASM or bool(shutil.which('ld'))
+
+# The sample programs, as (name, source, stdin), with the input read from
+# a .in file next to the source where there is one.
+def programs():
+    for name in sorted(os.listdir(PROGRAMS)):
+        if not name.endswith('.lua'):
+            continue
+        path = os.path.join(PROGRAMS, name)
+        with open(path) as file:
+            source = file.read()
+        stdin = ''
+        if os.path.exists(path[:-4] + '.in'):
+            with open(path[:-4] + '.in') as file:
+                stdin = file.read()
+        yield name[:-4], source, stdin
+
+# Runs a program with the Python backend and returns its exit status and
+# output.
+def interpret(source, options=None, stdin=''):
+    stdout = io.StringIO()
+    tree = frontend(source, options or Options(), io.StringIO())
+    status = execute(tree, io.StringIO(stdin), stdout, io.StringIO())
+    return status, stdout.getvalue()
+
+# Assembles, links and runs generated assembly, with nasm or the built-in
+# encoder, and returns the exit status, as a shell reports it, and output.
+# Without nasm the built-in encoder assembles and ld links.
+def run_native(assembly, stdin='', target='x86', assembler=None):
+    assembler = assembler or ('nasm' if NASM else 'builtin')
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'program.asm')
+        obj = os.path.join(directory, 'program.o')
+        executable = os.path.join(directory, 'program')
+        with open(source, 'w') as file:
+            file.write(assembly)
+        if assembler == 'builtin':
+            with open(obj, 'wb') as file:
+                file.write(Assembler().run(assembly))
+        else:
+            subprocess.run(['nasm', '-f', 'elf64' if target == 'x86-64' else 'elf', '-o', obj, source], check=True)
+        if NASM:
+            subprocess.run(['gcc'] + (['-m32', '-no-pie'] if target == 'x86' else []) + ['-o', executable, obj], check=True)
+        else:
+            subprocess.run(['ld', '-m', 'elf_i386', '-e', 'main', '-o', executable, obj], check=True)
+        process = subprocess.run([executable], input=stdin, capture_output=True, text=True)
+    status = process.returncode if process.returncode >= 0 else 128 - process.returncode
+    return status, process.stdout
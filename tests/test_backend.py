@@ -0,0 +1,95 @@
+import io
+import unittest
+
+from code.asm import ASM
+from code.backend import Backend
+from code.ir import Instruction, Program, Temp
+from tests.test_passes import build
+
+# The assembly the --ir backend writes for a main function built from
+# (label, instructions) pairs and the other functions given.
+def generate(*blocks, locals=(), functions=()):
+    main = build(*blocks, locals=locals)
+    main.name = 'main'
+    asm = ASM(io.StringIO())
+    Backend(asm).run(Program(main, list(functions)))
+    return asm.instructions
+
+class BackendTest(unittest.TestCase):
+
+    # The branch falls through to the block after it, and so does the jump.
+    def test_blocks_that_follow_are_fallen_into(self):
+        self.assertEqual(generate(
+            ('A', [Instruction('read', 'c'), Instruction('branch', None, ['>', 'c', 0, 'B', 'C'])]),
+            ('B', [Instruction('print', None, ['c']), Instruction('jump', None, ['C'])]),
+            ('C', [Instruction('exit')]),
+            locals=['c'],
+        ), [
+            'A:', 'CALL READ_INT', 'MOV EBX, EAX', 'CMP EBX, 0', 'JLE C',
+            'B:', 'MOV EAX, EBX', 'CALL PRINT_INT',
+            'C:', 'JMP END_MAIN',
+            'END_MAIN:',
+        ])
+
+    def test_a_loop_counter_stays_in_a_register(self):
+        self.assertEqual(generate(
+            ('A', [Instruction('read', 'i'), Instruction('jump', None, ['T'])]),
+            ('L', [Instruction('print', None, ['i']), Instruction('-', 'i', ['i', 1]), Instruction('jump', None, ['T'])]),
+            ('T', [Instruction('branch', None, ['>', 'i', 0, 'L', 'X'])]),
+            ('X', [Instruction('exit')]),
+            locals=['i'],
+        ), [
+            'A:', 'CALL READ_INT', 'MOV EBX, EAX', 'JMP T',
+            'L:', 'MOV EAX, EBX', 'CALL PRINT_INT', 'SUB EBX, 1',
+            'T:', 'CMP EBX, 0', 'JG L',
+            'X:', 'JMP END_MAIN',
+            'END_MAIN:',
+        ])
+
+    # Only a division by a variable needs IDIV; one by a constant multiplies.
+    def test_division(self):
+        quotient = Temp(1)
+        instructions = generate(('A', [
+            Instruction('read', 'c'),
+            Instruction('/', quotient, ['c', 3]),
+            Instruction('print', None, [quotient]),
+            Instruction('/', 'd', [7, 'c']),
+            Instruction('print', None, ['d']),
+            Instruction('exit'),
+        ]), locals=['c', 'd'])
+        self.assertEqual(instructions.count('IDIV EBX'), 1)
+        self.assertIn('MOV EAX, 1431655766', instructions)
+        self.assertLess(instructions.index('MOV EAX, 1431655766'), instructions.index('MOV EAX, 7'))
+
+    # Arguments are pushed last first, and the caller keeps the registers
+    # live across the call.
+    def test_calls(self):
+        total = Temp(1)
+        function = build(('F', [Instruction('+', total, ['a', 'b']), Instruction('return', None, [total])]), parameters=['a', 'b'])
+        instructions = generate(
+            ('A', [
+                Instruction('read', 'c'),
+                Instruction('call', 'd', ['f', 'c', 2]),
+                Instruction('+', 'e', ['d', 'c']),
+                Instruction('print', None, ['e']),
+                Instruction('exit'),
+            ]),
+            locals=['c', 'd', 'e'],
+            functions=[function],
+        )
+        call = instructions.index('CALL f')
+        self.assertEqual(instructions[call - 2:call + 2], ['PUSH 2', 'PUSH EBX', 'CALL f', 'ADD ESP, 8'])
+        self.assertIn('PUSH EBX', instructions[:call - 2])
+        self.assertIn('POP EBX', instructions[call:])
+        self.assertEqual(instructions[instructions.index('f:'):], [
+            'f:', 'PUSH EBP', 'MOV EBP, ESP', 'MOV EBX, [EBP+8]', 'MOV ESI, [EBP+12]',
+            'F:', 'MOV EDI, EBX', 'ADD EDI, ESI', 'MOV EAX, EDI', 'MOV ESP, EBP', 'POP EBP', 'RET',
+            'END_MAIN:',
+        ])
+
+    def test_an_unknown_operation_is_an_error(self):
+        with self.assertRaisesRegex(ValueError, 'IR operation frob'):
+            generate(('A', [Instruction('frob', 'x', [1]), Instruction('exit')]), locals=['x'])
+
+if __name__ == '__main__':
+    unittest.main()
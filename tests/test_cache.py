@@ -0,0 +1,25 @@
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from code.cache import Cache
+
+def miss(directory, times=50):
+    cache = Cache(directory)
+    for _ in range(times):
+        cache.load('absent')
+
+class CacheTest(unittest.TestCase):
+
+    def test_counts_from_processes_and_threads_add_up(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with ProcessPoolExecutor(max_workers=4) as processes, ThreadPoolExecutor(max_workers=4) as threads:
+                futures = [processes.submit(miss, directory) for _ in range(4)]
+                futures += [threads.submit(miss, directory) for _ in range(4)]
+                for future in futures:
+                    future.result()
+            stats = Cache(directory).stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (0, 400, 0))
+
+if __name__ == '__main__':
+    unittest.main()
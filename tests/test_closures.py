@@ -0,0 +1,59 @@
+import io
+import threading
+import unittest
+
+from code.compiler import compile, Options
+from tests.support import NATIVE, interpret, run_native
+
+# Each program prints before it divides, and the native program killed by
+# SIGFPE never flushes what it printed.
+DIVISIONS = {
+    'zero': ('print(1)\nlocal z = 0\nprint(5 / z)\n', (136, '')),
+    'literal zero': ('print(1)\nprint(5 / 0)\n', (136, '')),
+    'overflow': ('local m = -2147483647 - 1\nlocal d = -1\nprint(7)\nprint(m / d)\n', (136, '')),
+}
+
+# -1 is a negation until -O folds it into a literal, which divides by
+# negating and so wraps.
+MINUS_ONE = 'local m = -2147483647 - 1\nprint(m / -1)\n'
+MINUS_ONE_RESULTS = {'': (136, ''), '-O': (0, '-2147483648\n')}
+OPTIONS = {'': Options(), '-O': Options(optimize=True)}
+
+class ClosuresTest(unittest.TestCase):
+
+    def test_division_traps_like_idiv(self):
+        for name, (source, expected) in DIVISIONS.items():
+            with self.subTest(program=name):
+                self.assertEqual(interpret(source), expected)
+
+    def test_literal_minus_one_divisor_wraps_once_folded(self):
+        for flags, expected in MINUS_ONE_RESULTS.items():
+            with self.subTest(flags=flags):
+                self.assertEqual(interpret(MINUS_ONE, OPTIONS[flags]), expected)
+
+    def test_output_is_flushed_before_reading(self):
+        source = 'print(1)\nlocal x = read()\nprint(x / 0)\n'
+        self.assertEqual(interpret(source, stdin='4\n'), (136, '1\n'))
+
+    # The stack size each run sets is shared by the whole process.
+    def test_concurrent_runs(self):
+        source = 'function f(n)\nif n == 0 then\nreturn 0\nend\nreturn f(n - 1) + 1\nend\nprint(f(20000))\n'
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(interpret(source))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [(0, '20000\n')] * 8)
+
+    @unittest.skipUnless(NATIVE, 'neither nasm and gcc nor ld found')
+    def test_native_division_matches(self):
+        for name, (source, expected) in DIVISIONS.items():
+            with self.subTest(program=name):
+                self.assertEqual(run_native(compile(source, Options(), io.StringIO())), expected)
+        for flags, expected in MINUS_ONE_RESULTS.items():
+            with self.subTest(program='literal minus one', flags=flags):
+                self.assertEqual(run_native(compile(MINUS_ONE, OPTIONS[flags], io.StringIO())), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import io
+import unittest
+
+from code.compiler import compile, Options
+from code.deadcode import DeadCode
+from code.nodes import VarDecNode, AssigmentNode
+from code.syntactical import Parser
+from tests.support import NATIVE, interpret, run_native
+
+# Stores nothing reads, of a division that traps when z is 0.
+PROGRAMS = {
+    'declaration': 'local z = read()\nlocal x = 7 / z\nprint(1)\n',
+    'assignment': 'local z = read()\nlocal x = 0\nx = 7 / z\nprint(1)\n',
+    'overflow': 'local z = read()\nlocal x = (-2147483647 - 1) / (z - 1)\nprint(1)\n',
+}
+
+CONFIGURATIONS = {
+    '': Options(),
+    '-O': Options(optimize=True),
+    '--ir': Options(ir=True),
+    '--ir -O': Options(optimize=True, ir=True),
+}
+
+class DeadCodeTest(unittest.TestCase):
+
+    # DeadCode runs on every build, so dropping the store removed the trap
+    # even without -O.
+    def test_dead_store_of_a_trapping_division_stays(self):
+        for name, source in PROGRAMS.items():
+            with self.subTest(program=name):
+                tree = DeadCode().run(Parser().run(source))
+                stores = [node for node in tree.children if isinstance(node, (VarDecNode, AssigmentNode)) and node.identifier.value == 'x']
+                self.assertTrue(stores and stores[-1].expression is not None)
+
+    def test_dead_trapping_division_exits_136(self):
+        for name, source in PROGRAMS.items():
+            for flags, options in CONFIGURATIONS.items():
+                with self.subTest(program=name, flags=flags):
+                    self.assertEqual(interpret(source, options, '0\n'), (136, ''))
+
+    @unittest.skipUnless(NATIVE, 'neither nasm and gcc nor ld found')
+    def test_native_dead_trapping_division_exits_136(self):
+        for name, source in PROGRAMS.items():
+            for flags, options in CONFIGURATIONS.items():
+                with self.subTest(program=name, flags=flags):
+                    self.assertEqual(run_native(compile(source, options, io.StringIO()), '0\n'), (136, ''))
+
+if __name__ == '__main__':
+    unittest.main()
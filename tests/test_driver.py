@@ -0,0 +1,43 @@
+import io
+import os
+import tempfile
+import unittest
+
+from code.driver import run
+
+SOURCES = {
+    'a.lua': 'print(1)\n',
+    'b.lua': 'print(2)\n',
+    os.path.join('sub', 'c.lua'): 'print(3)\n',
+    os.path.join('v1.2', 'd.lua'): 'print(4)\n',
+}
+
+class DriverTest(unittest.TestCase):
+
+    # The .asm name was cut at the first dot of the whole path, so ./a.lua
+    # and every other input became ./.asm.
+    def test_batch_writes_each_asm_next_to_its_source(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in SOURCES.items():
+                os.makedirs(os.path.join(directory, os.path.dirname(name)), exist_ok=True)
+                with open(os.path.join(directory, name), 'w') as file:
+                    file.write(source)
+            log = io.StringIO()
+            self.assertEqual(run(['--no-cache', '-j', '2', '.'], cwd=directory, log=log), 0, log.getvalue())
+            for name, source in SOURCES.items():
+                with self.subTest(source=name):
+                    with open(os.path.join(directory, name[:-4] + '.asm')) as file:
+                        self.assertIn(f'MOV EAX, {source[6]}\nCALL PRINT_INT', file.read())
+            self.assertFalse(os.path.exists(os.path.join(directory, '.asm')))
+
+    def test_stream_writes_the_asm_next_to_its_source(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, 'v1.2'))
+            with open(os.path.join(directory, 'v1.2', 'd.lua'), 'w') as file:
+                file.write('print(4)\n')
+            log = io.StringIO()
+            self.assertEqual(run(['--stream', os.path.join('.', 'v1.2', 'd.lua')], cwd=directory, log=log), 0, log.getvalue())
+            self.assertEqual(sorted(os.listdir(os.path.join(directory, 'v1.2'))), ['d.asm', 'd.lua'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import io
+import unittest
+
+from code.compiler import compile, Options
+from tests.support import NASM, programs, run_native
+
+CONFIGURATIONS = {
+    '': Options(),
+    '-O': Options(optimize=True),
+    '--ir -O': Options(optimize=True, ir=True),
+}
+
+# An object from the built-in encoder, linked with gcc, must run the same as
+# one nasm assembled from the same source.
+class EncoderTest(unittest.TestCase):
+
+    @unittest.skipUnless(NASM, 'nasm or gcc not found')
+    def test_encoded_programs_run_like_nasm(self):
+        for name, source, stdin in programs():
+            for flags, options in CONFIGURATIONS.items():
+                with self.subTest(program=name, flags=flags):
+                    assembly = compile(source, options, io.StringIO())
+                    self.assertEqual(run_native(assembly, stdin, assembler='builtin'), run_native(assembly, stdin))
+
+if __name__ == '__main__':
+    unittest.main()
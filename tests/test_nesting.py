@@ -0,0 +1,48 @@
+import io
+import unittest
+
+from code.compiler import compile, Options
+from tests.support import NASM, NATIVE, interpret, run_native
+
+DEPTH = 5000
+
+PROGRAMS = {
+    'expression': ('local x = 1\nprint(' + '(' * DEPTH + 'x' + ' + 1)' * DEPTH + ')\n', '5001\n'),
+    'if': ('local x = 1\n' + 'if x > 0 then\n' * DEPTH + 'print(x)\n' + 'end\n' * DEPTH, '1\n'),
+    'and': ('local x = 1\nif ' + ' and '.join(['x > 0'] * DEPTH) + ' then\nprint(7)\nend\n', '7\n'),
+    'function': ('function f(x)\n' + 'if x > 0 then\n' * DEPTH + 'x = x + 1\n' + 'end\n' * DEPTH + 'return ' + '(' * DEPTH + 'x' + ' - 1)' * DEPTH + '\nend\nprint(f(1))\n', '-4998\n'),
+}
+
+CONFIGURATIONS = {
+    '-O': Options(optimize=True),
+    '--ir': Options(ir=True),
+    '--ir -O': Options(optimize=True, ir=True),
+    '--target x86-64 -O': Options(optimize=True, target='x86-64'),
+}
+
+# Every pass walks the tree without recursing, so nesting is limited only
+# by memory, with or without -O and --ir.
+class NestingTest(unittest.TestCase):
+
+    def test_deep_programs_compile(self):
+        for name, (source, _) in PROGRAMS.items():
+            for flags, options in CONFIGURATIONS.items():
+                with self.subTest(program=name, flags=flags):
+                    self.assertIn('main:', compile(source, options, io.StringIO()))
+
+    def test_deep_programs_run_optimised(self):
+        for name, (source, output) in PROGRAMS.items():
+            with self.subTest(program=name):
+                self.assertEqual(interpret(source, Options(optimize=True)), (0, output))
+
+    @unittest.skipUnless(NATIVE, 'neither nasm and gcc nor ld found')
+    def test_native_deep_programs(self):
+        for name, (source, output) in PROGRAMS.items():
+            for flags, options in CONFIGURATIONS.items():
+                with self.subTest(program=name, flags=flags):
+                    if options.target != 'x86' and not NASM:
+                        self.skipTest('the built-in encoder only assembles 32-bit code')
+                    self.assertEqual(run_native(compile(source, options, io.StringIO()), target=options.target), (0, output))
+
+if __name__ == '__main__':
+    unittest.main()
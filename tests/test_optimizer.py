@@ -0,0 +1,53 @@
+import io
+import unittest
+
+from code.compiler import compile, Options
+from tests.support import NATIVE, interpret, programs, run_native
+
+CONFIGURATIONS = {
+    '-O': Options(optimize=True),
+    '--ir': Options(ir=True),
+    '--ir -O': Options(optimize=True, ir=True),
+}
+
+# -O must not change what a program prints or its exit status. The Python
+# backend runs the plain and the optimised tree, and with nasm and gcc, or
+# the built-in encoder and ld, the assembly from each configuration runs
+# natively as well.
+class OptimizerTest(unittest.TestCase):
+
+    def test_optimised_programs_print_the_same(self):
+        for name, source, stdin in programs():
+            with self.subTest(program=name):
+                self.assertEqual(interpret(source, Options(optimize=True), stdin), interpret(source, Options(), stdin))
+
+    def test_every_configuration_compiles(self):
+        for name, source, _ in programs():
+            for flags, options in CONFIGURATIONS.items():
+                with self.subTest(program=name, flags=flags):
+                    self.assertIn('main:', compile(source, options, io.StringIO()))
+
+    # The procedure inliner substituted the argument for every use of the
+    # parameter's name, the local's declaration and reads included.
+    def test_inlined_procedure_keeps_a_local_shadowing_its_parameter(self):
+        source = 'function g(p)\nlocal p = 3\nprint(p)\nend\ng(7)\nfunction h(p)\nif p then\nlocal p = 2\nprint(p)\nend\nprint(p)\nend\nh(7)\n'
+        for options in (Options(), Options(optimize=True)):
+            self.assertEqual(interpret(source, options), (0, '3\n2\n7\n'))
+
+    # and/or of operands other than 0 and 1 are bitwise in a condition too,
+    # so 2 and 1 is false wherever it appears.
+    def test_and_or_of_non_boolean_operands_mean_the_same_in_conditions(self):
+        source = dict((name, source) for name, source, _ in programs())['andor']
+        for options in (Options(), Options(optimize=True)):
+            self.assertEqual(interpret(source, options), (0, '0\n11\n12\n13\n16\n17\n19\n3\n'))
+
+    @unittest.skipUnless(NATIVE, 'neither nasm and gcc nor ld found')
+    def test_native_programs_print_the_same(self):
+        for name, source, stdin in programs():
+            expected = interpret(source, Options(), stdin)
+            for flags, options in {'': Options(), **CONFIGURATIONS}.items():
+                with self.subTest(program=name, flags=flags):
+                    self.assertEqual(run_native(compile(source, options, io.StringIO()), stdin), expected)
+
+if __name__ == '__main__':
+    unittest.main()
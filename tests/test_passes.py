@@ -0,0 +1,324 @@
+import textwrap
+import unittest
+
+from code import passes
+from code.ir import Block, Function, Instruction, Temp
+from code.loops import Dominators, find_loops
+from code.lowering import Lowering
+from code.syntactical import Parser
+
+# The IR of a program's top-level block, lowered straight from the parse
+# tree so no AST pass runs first.
+def lower(source):
+    return Lowering().run(Parser().run(source)).main
+
+def operations(function):
+    return [(instruction.op, instruction.args) for block in function.blocks for instruction in block.instructions]
+
+# A function built from (label, instructions) pairs, the first the entry.
+def build(*blocks, parameters=(), locals=()):
+    function = Function('f', list(parameters))
+    function.locals = list(locals)
+    for label, instructions in blocks:
+        block = Block(label)
+        block.instructions = list(instructions)
+        function.blocks.append(block)
+    return function
+
+def lines(function):
+    return [repr(instruction) for block in function.blocks for instruction in block.instructions]
+
+def listing(text):
+    return textwrap.dedent(text).strip()
+
+class LoweringTest(unittest.TestCase):
+
+    def test_while_puts_the_condition_after_the_body(self):
+        self.assertEqual(repr(lower('local x = read()\nwhile x > 0 do\nx = x - 1\nend\n')), listing('''
+            function main()
+              locals x
+            BEGIN_MAIN:
+                %1 = read
+                x = %1
+                jump TEST_WHILE_1
+            LOOP_WHILE_1:
+                %2 = x - 1
+                x = %2
+                jump TEST_WHILE_1
+            TEST_WHILE_1:
+                if x > 0 goto LOOP_WHILE_1 else EXIT_WHILE_1
+            EXIT_WHILE_1:
+                exit
+        '''))
+
+    def test_and_in_a_condition_branches_on_each_comparison(self):
+        self.assertEqual(repr(lower('local x = read()\nif x > 1 and x < 5 then\nprint(x)\nend\n')), listing('''
+            function main()
+              locals x
+            BEGIN_MAIN:
+                %1 = read
+                x = %1
+                if x > 1 goto SKIP_2 else ELSE_IF_1
+            SKIP_2:
+                if x < 5 goto THEN_IF_1 else ELSE_IF_1
+            THEN_IF_1:
+                print x
+                jump END_IF_1
+            ELSE_IF_1:
+                jump END_IF_1
+            END_IF_1:
+                exit
+        '''))
+
+    def test_functions_lower_separately_from_main(self):
+        program = Lowering().run(Parser().run('function f(a, b)\nreturn a / b\nend\nprint(f(6, 3))\n'))
+        self.assertEqual([function.name for function in program.functions], ['f'])
+        self.assertEqual(operations(program.functions[0]), [('/', ['a', 'b']), ('return', [program.functions[0].blocks[0].instructions[0].dest])])
+        self.assertEqual(operations(program.main)[0], ('call', ['f', 6, 3]))
+
+class DeadCodeTest(unittest.TestCase):
+
+    # A division whose result is unused still has to trap.
+    def test_unused_division_that_can_trap_stays(self):
+        for division in ('7 / z', 'z / 0', 'z / -1'):
+            with self.subTest(division=division):
+                function = lower(f'local z = read()\nlocal x = {division}\nprint(1)\n')
+                passes.simplify(function)
+                self.assertIn('/', [op for op, _ in operations(function)])
+
+    def test_unused_division_by_another_constant_goes(self):
+        function = lower('local z = read()\nlocal x = z / 3\nprint(1)\n')
+        passes.simplify(function)
+        self.assertEqual(operations(function), [('read', []), ('print', [1]), ('exit', [])])
+
+class PropagationTest(unittest.TestCase):
+
+    def test_copies_are_propagated_and_folded_in_a_block(self):
+        one, two = Temp(1), Temp(2)
+        function = build(('A', [
+            Instruction('copy', 'x', [5]),
+            Instruction('+', one, ['x', 2]),
+            Instruction('copy', 'y', [one]),
+            Instruction('*', two, ['y', 'z']),
+            Instruction('print', None, [two]),
+            Instruction('exit'),
+        ]), locals=['x', 'y', 'z'])
+        self.assertTrue(passes.propagate_copies(function))
+        self.assertEqual(lines(function), ['x = 5', '%1 = 7', 'y = 7', '%2 = 7 * z', 'print %2', 'exit'])
+
+    # x is copied before y is redefined, so it keeps y's first value.
+    def test_a_copy_dies_with_its_source(self):
+        function = build(('A', [
+            Instruction('copy', 'x', ['y']),
+            Instruction('read', 'y'),
+            Instruction('print', None, ['x']),
+            Instruction('exit'),
+        ]), locals=['x', 'y'])
+        passes.propagate_copies(function)
+        self.assertEqual(lines(function), ['x = y', 'y = read', 'print x', 'exit'])
+
+    def test_a_computed_temporary_copied_once_is_computed_into_the_copy(self):
+        one = Temp(1)
+        function = build(('A', [
+            Instruction('+', one, ['a', 'b']),
+            Instruction('copy', 'x', [one]),
+            Instruction('print', None, ['x']),
+            Instruction('exit'),
+        ]), parameters=['a', 'b'], locals=['x'])
+        self.assertTrue(passes.coalesce(function))
+        self.assertEqual(lines(function), ['x = a + b', 'print x', 'exit'])
+
+    def test_constants_reach_the_blocks_their_definition_dominates(self):
+        function = build(
+            ('A', [Instruction('copy', 'x', [3]), Instruction('read', 'c'), Instruction('branch', None, ['>', 'c', 0, 'B', 'C'])]),
+            ('B', [Instruction('print', None, ['x']), Instruction('copy', 'y', [4]), Instruction('jump', None, ['D'])]),
+            ('C', [Instruction('jump', None, ['D'])]),
+            ('D', [Instruction('print', None, ['x']), Instruction('print', None, ['y']), Instruction('exit')]),
+            locals=['x', 'y', 'c'],
+        )
+        self.assertTrue(passes.propagate_constants(function))
+        # y is only set on the path through B.
+        self.assertEqual(lines(function)[3:], ['print 3', 'y = 4', 'jump D', 'jump D', 'print 3', 'print y', 'exit'])
+
+    def test_a_parameter_is_never_a_constant(self):
+        function = build(('A', [Instruction('copy', 'a', [1]), Instruction('return', None, ['a'])]), parameters=['a'])
+        self.assertFalse(passes.propagate_constants(function))
+
+    def test_a_variable_assigned_twice_is_not_a_constant(self):
+        function = build(
+            ('A', [Instruction('copy', 'x', [1]), Instruction('jump', None, ['B'])]),
+            ('B', [Instruction('copy', 'x', [2]), Instruction('print', None, ['x']), Instruction('exit')]),
+            locals=['x'],
+        )
+        self.assertFalse(passes.propagate_constants(function))
+
+class ControlFlowTest(unittest.TestCase):
+
+    def test_jumps_through_empty_blocks_go_to_the_end_of_the_chain(self):
+        function = build(
+            ('A', [Instruction('read', 'c'), Instruction('branch', None, ['>', 'c', 0, 'B', 'E'])]),
+            ('B', [Instruction('jump', None, ['C'])]),
+            ('C', [Instruction('jump', None, ['D'])]),
+            ('D', [Instruction('print', None, ['c']), Instruction('jump', None, ['E'])]),
+            ('E', [Instruction('exit')]),
+            locals=['c'],
+        )
+        self.assertTrue(passes.thread_jumps(function))
+        self.assertEqual(function.blocks[0].terminator.args[3:], ['D', 'E'])
+
+    # The chain never ends, so threading has to stop going round it.
+    def test_a_loop_of_empty_blocks_stays_a_loop(self):
+        function = build(
+            ('A', [Instruction('jump', None, ['B'])]),
+            ('B', [Instruction('jump', None, ['C'])]),
+            ('C', [Instruction('jump', None, ['B'])]),
+        )
+        passes.thread_jumps(function)
+        self.assertEqual([block.label for block in function.blocks], ['A', 'B', 'C'])
+        self.assertEqual(lines(function), ['jump C', 'jump B', 'jump C'])
+
+    def test_a_block_reached_by_one_jump_is_merged_into_it(self):
+        function = build(
+            ('A', [Instruction('read', 'c'), Instruction('jump', None, ['B'])]),
+            ('B', [Instruction('print', None, ['c']), Instruction('exit')]),
+            locals=['c'],
+        )
+        self.assertTrue(passes.thread_jumps(function))
+        self.assertEqual([block.label for block in function.blocks], ['A'])
+        self.assertEqual(operations(function), [('read', []), ('print', ['c']), ('exit', [])])
+
+    def test_a_branch_on_constants_becomes_a_jump(self):
+        function = build(
+            ('A', [Instruction('read', 'c'), Instruction('branch', None, ['<', 1, 2, 'B', 'C'])]),
+            ('B', [Instruction('print', None, ['c']), Instruction('exit')]),
+            ('C', [Instruction('exit')]),
+            locals=['c'],
+        )
+        passes.thread_jumps(function)
+        passes.eliminate_dead_code(function)
+        self.assertEqual(operations(function), [('read', []), ('print', ['c']), ('exit', [])])
+
+    def test_a_block_reached_by_one_jump_is_laid_out_after_it(self):
+        function = build(
+            ('A', [Instruction('read', 'c'), Instruction('branch', None, ['>', 'c', 0, 'B', 'C'])]),
+            ('D', [Instruction('exit')]),
+            ('C', [Instruction('print', None, [2]), Instruction('jump', None, ['D'])]),
+            ('B', [Instruction('print', None, [1]), Instruction('jump', None, ['D'])]),
+            locals=['c'],
+        )
+        passes.reorder_blocks(function)
+        self.assertEqual([block.label for block in function.blocks], ['A', 'B', 'D', 'C'])
+
+class LoopTest(unittest.TestCase):
+
+    # i counts down from n; the loop adds n / 2 * 3, which is invariant, and
+    # prints 8 * i.
+    def loop(self, division='/', divisor=2):
+        one, two, three = Temp(1), Temp(2), Temp(3)
+        return build(
+            ('A', [Instruction('read', 'n'), Instruction('copy', 'i', ['n']), Instruction('copy', 's', [0]), Instruction('jump', None, ['T'])]),
+            ('L', [
+                Instruction(division, one, ['n', divisor]),
+                Instruction('*', two, [one, 3]),
+                Instruction('+', 's', ['s', two]),
+                Instruction('*', three, ['i', 8]),
+                Instruction('print', None, [three]),
+                Instruction('-', 'i', ['i', 1]),
+                Instruction('jump', None, ['T']),
+            ]),
+            ('T', [Instruction('branch', None, ['>', 'i', 0, 'L', 'X'])]),
+            ('X', [Instruction('print', None, ['s']), Instruction('exit')]),
+            locals=['n', 'i', 's'],
+        )
+
+    def test_dominators(self):
+        function = self.loop()
+        dominance = Dominators(function)
+        self.assertTrue(all(dominance.dominates('A', label) for label in 'ALTX'))
+        self.assertTrue(dominance.dominates('T', 'L') and dominance.dominates('T', 'X'))
+        self.assertFalse(dominance.dominates('L', 'T') or dominance.dominates('L', 'X'))
+
+    def test_the_back_edge_makes_the_loop(self):
+        [loop] = find_loops(self.loop())
+        self.assertEqual((loop.header, loop.blocks), ('T', {'T', 'L'}))
+
+    def test_invariants_move_to_the_preheader(self):
+        function = self.loop()
+        [loop] = find_loops(function)
+        preheader = passes.insert_preheader(function, loop)
+        self.assertEqual(preheader.label, 'A')
+        self.assertTrue(passes.hoist_invariants(function, loop, preheader))
+        self.assertEqual([instruction.op for instruction in preheader.instructions], ['read', 'copy', 'copy', '/', '*', 'jump'])
+        self.assertEqual([instruction.op for instruction in function.block_map()['L'].instructions], ['+', '*', 'print', '-', 'jump'])
+
+    def test_a_division_that_can_trap_stays_in_the_loop(self):
+        for divisor in ('n', 0, -1):
+            with self.subTest(divisor=divisor):
+                function = self.loop(divisor=divisor)
+                [loop] = find_loops(function)
+                preheader = passes.insert_preheader(function, loop)
+                passes.hoist_invariants(function, loop, preheader)
+                self.assertEqual(function.block_map()['L'].instructions[0].op, '/')
+
+    def test_a_header_with_several_entries_gets_a_new_preheader(self):
+        function = build(
+            ('A', [Instruction('read', 'i'), Instruction('branch', None, ['>', 'i', 5, 'B', 'T'])]),
+            ('B', [Instruction('copy', 'i', [5]), Instruction('jump', None, ['T'])]),
+            ('L', [Instruction('-', 'i', ['i', 1]), Instruction('jump', None, ['T'])]),
+            ('T', [Instruction('branch', None, ['>', 'i', 0, 'L', 'X'])]),
+            ('X', [Instruction('exit')]),
+            locals=['i'],
+        )
+        [loop] = find_loops(function)
+        preheader = passes.insert_preheader(function, loop)
+        self.assertEqual(preheader.label, 'PRE_T')
+        self.assertEqual(function.predecessors()['PRE_T'], ['A', 'B'])
+        self.assertEqual(function.predecessors()['T'], ['PRE_T', 'L'])
+
+    # i counts down from what is read, printing i * 8 and i * k.
+    def counter(self):
+        one, two = Temp(1), Temp(2)
+        return build(
+            ('A', [Instruction('read', 'i'), Instruction('read', 'k'), Instruction('jump', None, ['T'])]),
+            ('L', [
+                Instruction('*', one, ['i', 8]),
+                Instruction('print', None, [one]),
+                Instruction('*', two, ['k', 'i']),
+                Instruction('print', None, [two]),
+                Instruction('-', 'i', ['i', 1]),
+                Instruction('jump', None, ['T']),
+            ]),
+            ('T', [Instruction('branch', None, ['>', 'i', 0, 'L', 'X'])]),
+            ('X', [Instruction('exit')]),
+            locals=['i', 'k'],
+        )
+
+    # Each reduced product holds a register across the loop, so with i and
+    # k live around it only the first is reduced.
+    def test_a_product_with_the_induction_variable_becomes_an_addition(self):
+        function = self.counter()
+        [loop] = find_loops(function)
+        preheader = passes.insert_preheader(function, loop)
+        self.assertTrue(passes.reduce_strength(function, loop, preheader))
+        self.assertEqual(function.locals, ['i', 'k', 'i*8'])
+        self.assertEqual(lines(function), [
+            'i = read', 'k = read', 'i*8 = i * 8', 'jump T',
+            '%1 = i*8', 'print %1', '%2 = k * i', 'print %2', 'i = i - 1', 'i*8 = i*8 + -8', 'jump T',
+            'if i > 0 goto L else X',
+            'exit',
+        ])
+
+    # The step of a product by a variable the loop leaves alone is computed
+    # in the preheader.
+    def test_a_product_by_an_invariant_steps_by_a_product_computed_up_front(self):
+        function = self.counter()
+        del function.blocks[1].instructions[:2]
+        [loop] = find_loops(function)
+        preheader = passes.insert_preheader(function, loop)
+        self.assertTrue(passes.reduce_strength(function, loop, preheader))
+        self.assertEqual(lines(function)[2:9], [
+            'i*k = i * k', '%3 = k * -1', 'jump T', '%2 = i*k', 'print %2', 'i = i - 1', 'i*k = i*k + %3',
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from code.server import Handler, Metrics, Server
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'compiler.sock')
+        self.server = Server(self.path, Handler)
+        self.server.metrics = Metrics()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.directory.cleanup()
+
+    def send(self, line):
+        with socket.socket(socket.AF_UNIX) as connection:
+            connection.connect(self.path)
+            connection.sendall(line)
+            return json.loads(connection.makefile('rb').readline())
+
+    def test_malformed_requests_get_an_error_reply(self):
+        for line in (b'{"argv": ["x.lua"\n', b'not json\n', b'[1, 2]\n', b'{"cwd": "/"}\n', b'{"argv": "x.lua", "cwd": "/"}\n', b'{"argv": [1], "cwd": "/"}\n'):
+            with self.subTest(line=line):
+                reply = self.send(line)
+                self.assertEqual(reply['status'], 2)
+                self.assertIn('malformed request', reply['log'])
+
+    def test_requests_are_answered_after_a_malformed_one(self):
+        self.send(b'{}\n')
+        source = os.path.join(self.directory.name, 'program.lua')
+        with open(source, 'w') as file:
+            file.write('print(6 * 7)\n')
+        reply = self.send(json.dumps({'argv': ['--run', 'program.lua'], 'cwd': self.directory.name}).encode() + b'\n')
+        self.assertEqual((reply['status'], reply['output']), (0, '42\n'))
+        self.assertEqual(self.send(b'{"metrics": true}\n')['requests'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import io
+import os
+import tempfile
+import unittest
+
+from benchmarks import streaming
+from code.compiler import compile, compile_stream, Options
+
+# Megabytes of resident memory --stream may use, whatever the source size.
+CEILING = 64
+# The full-size run takes minutes, so it only runs when asked for.
+SLOW = bool(os.environ.get('LUA_COMPILER_SLOW_TESTS'))
+
+DUPLICATES = {
+    'unread local': 'local x = 1\nlocal x = 2\nprint(1)\n',
+    'after return': 'function f()\nreturn 1\nlocal y = 1\nlocal y = 2\nend\nprint(f())\n',
+    'uncalled function': 'function g(a, a)\nreturn a\nend\nprint(1)\n',
+}
+
+class StreamingTest(unittest.TestCase):
+
+    # Dead code removal, which --stream skips, used to drop the duplicate
+    # before the code generator could reject it.
+    def test_duplicate_declarations_fail_on_every_path(self):
+        for name, source in DUPLICATES.items():
+            with self.subTest(program=name):
+                for options in (Options(), Options(optimize=True), Options(ir=True)):
+                    with self.assertRaisesRegex(RuntimeError, 'already created'):
+                        compile(source, options, io.StringIO())
+                with self.assertRaisesRegex(RuntimeError, 'already created'):
+                    compile_stream(source.encode(), io.StringIO())
+
+    def test_declarations_in_separate_blocks_compile(self):
+        source = 'local x = 1\nif x then\nlocal x = 2\nprint(x)\nend\nfunction f(x)\nlocal x = 3\nreturn x\nend\nprint(f(x))\n'
+        sink = io.StringIO()
+        compile_stream(source.encode(), sink)
+        self.assertIn('main:', sink.getvalue())
+        self.assertIn('main:', compile(source, Options(), io.StringIO()))
+
+    def _peak(self, megabytes):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.lua')
+            streaming.generate(path, megabytes)
+            _, peak = streaming.compile(path)
+        return peak
+
+    def test_small_source_stays_under_the_ceiling(self):
+        self.assertLessEqual(self._peak(2), CEILING)
+
+    @unittest.skipUnless(SLOW, 'set LUA_COMPILER_SLOW_TESTS to compile a 500 MB source')
+    def test_large_source_stays_under_the_ceiling(self):
+        self.assertLessEqual(self._peak(500), CEILING)
+
+if __name__ == '__main__':
+    unittest.main()